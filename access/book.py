@@ -2,7 +2,18 @@ import os
 import sqlite3 as sqlite
 import random
 import base64
+import hashlib
+import logging
+import time
 import simplejson as json
+from collections import OrderedDict
+from urllib.request import pathname2url
+
+# 只读模式下的 mmap 大小与页缓存大小（KiB），多个进程通过 OS 页缓存共享同一文件
+MMAP_SIZE = 1 << 30
+CACHE_SIZE_KIB = 64 * 1024
+# 图片 base64 编码结果的 LRU 缓存条目数（按图片内容的哈希）
+PICTURE_CACHE_SIZE = 1024
 
 
 class Book:
@@ -29,8 +40,18 @@ class Book:
         self.pictures = []
 
 
+BOOK_COLUMNS = (
+    "SELECT id, title, author, "
+    "publisher, original_title, "
+    "translator, pub_year, pages, "
+    "price, currency_unit, binding, "
+    "isbn, author_intro, book_intro, "
+    "content, tags, picture FROM book "
+)
+
+
 class BookDB:
-    def __init__(self, large: bool = False):
+    def __init__(self, large: bool = False, read_only: bool = None):
         parent_path = os.path.dirname(os.path.dirname(__file__))
         self.db_s = os.path.join(parent_path, "data/book.db")
         self.db_l = os.path.join(parent_path, "data/book_lx.db")
@@ -38,10 +59,45 @@ class BookDB:
             self.book_db = self.db_l
         else:
             self.book_db = self.db_s
-        self._ensure_db_initialized()
+        # 大库在测试和 bench 中只读，已存在时默认以不可变只读模式打开；
+        # 小库或尚不存在的库需要初始化，默认读写
+        if read_only is None:
+            read_only = large and os.path.exists(self.book_db)
+        self.read_only = read_only
+        self.read_time = 0.0
+        self.read_rows = 0
+        before = time.time()
+        # 整个 BookDB 生命周期内复用同一个连接
+        if self.read_only:
+            self.conn = self._connect_read_only()
+        else:
+            self.conn = sqlite.connect(self.book_db, check_same_thread=False)
+        # 顺序分页时记住上一页结束的位置 (下一页的 start, 上一页最后的 id)，
+        # 使下一页可以按 id 直接定位而不必 OFFSET 扫描
+        self._next_page = None
+        self._picture_cache = OrderedDict()
+        self.picture_cache_hits = 0
+        self.picture_cache_misses = 0
+        if not self.read_only:
+            self._ensure_db_initialized()
+        self.open_time = time.time() - before
+        logging.info(
+            "book db {} opened in {:.4f}s (read_only={})".format(
+                self.book_db, self.open_time, self.read_only
+            )
+        )
+
+    def _connect_read_only(self):
+        # immutable=1 告诉 SQLite 文件不会被修改，读取时不加文件锁、不检查变更
+        uri = "file:{}?mode=ro&immutable=1".format(pathname2url(self.book_db))
+        conn = sqlite.connect(uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute("PRAGMA mmap_size = {}".format(MMAP_SIZE))
+        conn.execute("PRAGMA cache_size = -{}".format(CACHE_SIZE_KIB))
+        return conn
 
     def _ensure_db_initialized(self):
-        conn = sqlite.connect(self.book_db)
+        conn = self.conn
         conn.execute(
             "CREATE TABLE IF NOT EXISTS book "
             "(id TEXT primary key, title TEXT, author TEXT, publisher TEXT, "
@@ -98,61 +154,114 @@ class BookDB:
                 sample,
             )
         conn.commit()
-        conn.close()
+
+    def close(self):
+        self.conn.close()
+
+    def report(self):
+        logging.info(
+            "book db open {:.4f}s, read {} rows in {:.4f}s, "
+            "picture cache {} hits / {} misses".format(
+                self.open_time,
+                self.read_rows,
+                self.read_time,
+                self.picture_cache_hits,
+                self.picture_cache_misses,
+            )
+        )
 
     def get_book_count(self):
-        conn = sqlite.connect(self.book_db)
-        cursor = conn.execute("SELECT count(id) FROM book")
+        cursor = self.conn.execute("SELECT count(id) FROM book")
         row = cursor.fetchone()
         return row[0]
 
     def get_book_info(self, start, size) -> [Book]:
-        books = []
-        conn = sqlite.connect(self.book_db)
-        cursor = conn.execute(
-            "SELECT id, title, author, "
-            "publisher, original_title, "
-            "translator, pub_year, pages, "
-            "price, currency_unit, binding, "
-            "isbn, author_intro, book_intro, "
-            "content, tags, picture FROM book ORDER BY id "
-            "LIMIT ? OFFSET ?",
-            (size, start),
-        )
-        for row in cursor:
-            book = Book()
-            book.id = row[0]
-            book.title = row[1]
-            book.author = row[2]
-            book.publisher = row[3]
-            book.original_title = row[4]
-            book.translator = row[5]
-            book.pub_year = row[6]
-            book.pages = row[7]
-            book.price = row[8]
-
-            book.currency_unit = row[9]
-            book.binding = row[10]
-            book.isbn = row[11]
-            book.author_intro = row[12]
-            book.book_intro = row[13]
-            book.content = row[14]
-            tags = row[15]
-
-            picture = row[16]
-
-            for tag in tags.split("\n"):
-                if tag.strip() != "":
-                    book.tags.append(tag)
-            for i in range(0, random.randint(0, 9)):
-                if picture is not None:
-                    encode_str = base64.b64encode(picture).decode("utf-8")
-                    book.pictures.append(encode_str)
-            books.append(book)
-            # print(tags.decode('utf-8'))
-
-            # print(book.tags, len(book.picture))
-            # print(book)
-            # print(tags)
-
+        before = time.time()
+        if self._next_page is not None and self._next_page[0] == start:
+            cursor = self.conn.execute(
+                BOOK_COLUMNS + "WHERE id > ? ORDER BY id LIMIT ?",
+                (self._next_page[1], size),
+            )
+        else:
+            cursor = self.conn.execute(
+                BOOK_COLUMNS + "ORDER BY id LIMIT ? OFFSET ?", (size, start)
+            )
+        books = [self._to_book(row) for row in cursor]
+        self.read_time = self.read_time + time.time() - before
+        self.read_rows = self.read_rows + len(books)
+        if len(books) > 0:
+            self._next_page = (start + len(books), books[-1].id)
         return books
+
+    def iter_books(self, batch_size: int = 1000, limit: int = None):
+        # 按 id 键集分批读取，每批用 fetchmany 流式取出，耗时与数据量成线性、内存占用恒定
+        last_id = ""
+        n = 0
+        while limit is None or n < limit:
+            size = batch_size if limit is None else min(batch_size, limit - n)
+            cursor = self.conn.execute(
+                BOOK_COLUMNS + "WHERE id > ? ORDER BY id LIMIT ?", (last_id, size)
+            )
+            fetched = 0
+            while True:
+                before = time.time()
+                rows = cursor.fetchmany(256)
+                if len(rows) == 0:
+                    break
+                books = [self._to_book(row) for row in rows]
+                self.read_time = self.read_time + time.time() - before
+                self.read_rows = self.read_rows + len(rows)
+                for book in books:
+                    yield book
+                fetched = fetched + len(rows)
+                last_id = rows[-1][0]
+            n = n + fetched
+            if fetched < size:
+                break
+
+    def _to_book(self, row) -> Book:
+        book = Book()
+        book.id = row[0]
+        book.title = row[1]
+        book.author = row[2]
+        book.publisher = row[3]
+        book.original_title = row[4]
+        book.translator = row[5]
+        book.pub_year = row[6]
+        book.pages = row[7]
+        book.price = row[8]
+
+        book.currency_unit = row[9]
+        book.binding = row[10]
+        book.isbn = row[11]
+        book.author_intro = row[12]
+        book.book_intro = row[13]
+        book.content = row[14]
+        tags = row[15]
+
+        picture = row[16]
+
+        for tag in tags.split("\n"):
+            if tag.strip() != "":
+                book.tags.append(tag)
+        n = random.randint(0, 9)
+        if picture is not None and n > 0:
+            # 同一张图片只编码一次，重复的图片共用同一个字符串对象
+            encode_str = self._encode_picture(picture)
+            book.pictures = [encode_str] * n
+        return book
+
+    def _encode_picture(self, picture: bytes) -> str:
+        # 按内容缓存：图片更新后不会返回旧的编码，不同书籍的相同图片也共用一份
+        key = hashlib.sha1(picture).digest()
+        encode_str = self._picture_cache.get(key)
+        if encode_str is not None:
+            self.picture_cache_hits = self.picture_cache_hits + 1
+            self._picture_cache.move_to_end(key)
+            return encode_str
+        self.picture_cache_misses = self.picture_cache_misses + 1
+        encode_str = base64.b64encode(picture).decode("utf-8")
+        self._picture_cache[key] = encode_str
+        if len(self._picture_cache) > PICTURE_CACHE_SIZE:
+            self._picture_cache.popitem(last=False)
+        return encode_str
@@ -1,12 +1,19 @@
+from fe.access import transport
+import random
+import time
+import uuid
 import requests
-import simplejson
 from urllib.parse import urljoin
+from fe import conf
 from fe.access.auth import Auth
 
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
 
 class Buyer:
     def __init__(self, url_prefix, user_id, password):
         self.url_prefix = urljoin(url_prefix, "buyer/")
+        self.book_url_prefix = urljoin(url_prefix, "book/")
         self.user_id = user_id
         self.password = password
         self.token = ""
@@ -14,28 +21,51 @@ class Buyer:
         self.auth = Auth(url_prefix)
         code, self.token = self.auth.login(self.user_id, self.password, self.terminal)
         assert code == 200
+        # new_order / payment 超时、连接失败或同键请求仍在执行（409）时的重试次数
+        self.max_retry = getattr(conf, "Request_Retry", 2)
+        # 单次请求的超时（秒）；不设置时服务端卡住会一直等待，无法重试
+        self.timeout = getattr(conf, "Request_Timeout", 10)
+
+    def _post_idempotent(self, url, json, idempotency_key: str = None):
+        # 重试使用同一个幂等键，服务端对已完成的请求直接重放原响应，不会重复下单或扣款
+        headers = {
+            "token": self.token,
+            IDEMPOTENCY_HEADER: idempotency_key or uuid.uuid4().hex,
+        }
+        for attempt in range(0, self.max_retry + 1):
+            try:
+                r = transport.post(url, headers=headers, json=json, timeout=self.timeout)
+                if r.status_code != 409 or attempt == self.max_retry:
+                    return r
+            except (requests.Timeout, requests.ConnectionError):
+                if attempt == self.max_retry:
+                    raise
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
 
-    def new_order(self, store_id: str, book_id_and_count: [(str, int)]) -> (int, str):
+    def new_order(
+        self,
+        store_id: str,
+        book_id_and_count: [(str, int)],
+        idempotency_key: str = None,
+    ) -> (int, str):
         books = []
         for id_count_pair in book_id_and_count:
             books.append({"id": id_count_pair[0], "count": id_count_pair[1]})
         json = {"user_id": self.user_id, "store_id": store_id, "books": books}
         # print(simplejson.dumps(json))
         url = urljoin(self.url_prefix, "new_order")
-        headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = self._post_idempotent(url, json, idempotency_key)
         response_json = r.json()
         return r.status_code, response_json.get("order_id")
 
-    def payment(self, order_id: str):
+    def payment(self, order_id: str, idempotency_key: str = None):
         json = {
             "user_id": self.user_id,
             "password": self.password,
             "order_id": order_id,
         }
         url = urljoin(self.url_prefix, "payment")
-        headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = self._post_idempotent(url, json, idempotency_key)
         return r.status_code
 
     def add_funds(self, add_value: str) -> int:
@@ -46,33 +76,40 @@ class Buyer:
         }
         url = urljoin(self.url_prefix, "add_funds")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = transport.post(url, headers=headers, json=json)
         return r.status_code
 
     def cancel_order(self, order_id: str) -> int:
         json = {"user_id": self.user_id, "order_id": order_id}
         url = urljoin(self.url_prefix, "cancel")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = transport.post(url, headers=headers, json=json)
         return r.status_code
 
     def receive_order(self, order_id: str) -> int:
         json = {"user_id": self.user_id, "order_id": order_id}
         url = urljoin(self.url_prefix, "receive")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = transport.post(url, headers=headers, json=json)
         return r.status_code
 
-    def list_orders(self, status: str = None, page: int = 1, page_size: int = 10):
+    def list_orders(
+        self,
+        status: str = None,
+        page: int = 1,
+        page_size: int = 10,
+        with_items: bool = False,
+    ):
         json = {
             "user_id": self.user_id,
             "status": status,
             "page": page,
             "page_size": page_size,
+            "with_items": with_items,
         }
         url = urljoin(self.url_prefix, "orders")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = transport.post(url, headers=headers, json=json)
         return r.status_code, r.json().get("orders")
 
     def search(
@@ -92,5 +129,13 @@ class Buyer:
         }
         url = urljoin(self.url_prefix, "search")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = transport.post(url, headers=headers, json=json)
         return r.status_code, r.json().get("books")
+
+    def get_picture(self, picture_id: str, etag: str = None) -> (int, bytes, str):
+        url = urljoin(self.book_url_prefix, "picture/" + picture_id)
+        headers = {}
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        r = transport.get(url, headers=headers)
+        return r.status_code, r.content, r.headers.get("ETag")
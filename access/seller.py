@@ -1,4 +1,4 @@
-import requests
+from fe.access import transport
 from urllib.parse import urljoin
 from fe.access import book
 from fe.access.auth import Auth
@@ -22,7 +22,7 @@ class Seller:
         # print(simplejson.dumps(json))
         url = urljoin(self.url_prefix, "create_store")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = transport.post(url, headers=headers, json=json)
         return r.status_code
 
     def add_book(self, store_id: str, stock_level: int, book_info: book.Book) -> int:
@@ -35,7 +35,20 @@ class Seller:
         # print(simplejson.dumps(json))
         url = urljoin(self.url_prefix, "add_book")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = transport.post(url, headers=headers, json=json)
+        return r.status_code
+
+    def add_books(self, store_id: str, stock_level: int, books: [book.Book]) -> int:
+        json = {
+            "user_id": self.seller_id,
+            "store_id": store_id,
+            "books": [
+                {"book_info": bk.__dict__, "stock_level": stock_level} for bk in books
+            ],
+        }
+        url = urljoin(self.url_prefix, "add_books")
+        headers = {"token": self.token}
+        r = transport.post(url, headers=headers, json=json)
         return r.status_code
 
     def add_stock_level(
@@ -50,12 +63,45 @@ class Seller:
         # print(simplejson.dumps(json))
         url = urljoin(self.url_prefix, "add_stock_level")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = transport.post(url, headers=headers, json=json)
         return r.status_code
 
     def ship_order(self, store_id: str, order_id: str) -> int:
         json = {"user_id": self.seller_id, "store_id": store_id, "order_id": order_id}
         url = urljoin(self.url_prefix, "ship_order")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = transport.post(url, headers=headers, json=json)
         return r.status_code
+
+    def ship_orders(self, store_id: str, order_ids: [str]):
+        # 返回 (状态码, 每个订单的结果列表)
+        json = {"user_id": self.seller_id, "store_id": store_id, "order_ids": order_ids}
+        url = urljoin(self.url_prefix, "ship_orders")
+        headers = {"token": self.token}
+        r = transport.post(url, headers=headers, json=json)
+        return r.status_code, r.json().get("results")
+
+    def list_orders(
+        self,
+        store_id: str,
+        status: str = None,
+        start_time: float = None,
+        end_time: float = None,
+        after: dict = None,
+        limit: int = 20,
+    ):
+        # 返回 (状态码, 订单列表, 下一页的 after)；after 为 None 表示没有更多
+        json = {
+            "user_id": self.seller_id,
+            "store_id": store_id,
+            "status": status,
+            "start_time": start_time,
+            "end_time": end_time,
+            "after": after,
+            "limit": limit,
+        }
+        url = urljoin(self.url_prefix, "orders")
+        headers = {"token": self.token}
+        r = transport.post(url, headers=headers, json=json)
+        body = r.json()
+        return r.status_code, body.get("orders"), body.get("next")
@@ -0,0 +1,144 @@
+import json
+import threading
+import zlib
+import requests
+from urllib.parse import urlparse
+from fe import conf
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# conf.Transport 为 "http"（默认）时通过 requests 访问 conf.URL 上运行的服务；
+# 为 "flask" 时在本进程内创建 app，经 Flask 测试客户端调用，不经过网络
+_app = None
+_app_lock = threading.Lock()
+_local = threading.local()
+
+# conf.Response_Format 为 "msgpack" 时通过 Accept 请求 MessagePack 响应；
+# 无论服务端返回哪种格式，json() 都按 Content-Type 解码
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def decode(content_type: str, content: bytes):
+    mimetype = (content_type or "").split(";")[0].strip()
+    if mimetype in MSGPACK_MIMETYPES:
+        return msgpack.unpackb(content, raw=False)
+    return json.loads(content)
+
+
+def _headers(headers):
+    if getattr(conf, "Response_Format", "json") == "msgpack" and msgpack is not None:
+        headers = dict(headers or {})
+        headers.setdefault("Accept", MSGPACK_MIMETYPES[0])
+    return headers
+
+
+# 客户端能解压的编码；requests 会自行协商并解压，测试客户端需要在这里处理
+_decompressors = {"gzip": lambda data: zlib.decompress(data, 47)}
+if brotli is not None:
+    _decompressors["br"] = brotli.decompress
+if zstandard is not None:
+    _decompressors["zstd"] = (
+        lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    )
+ACCEPT_ENCODING = ", ".join(_decompressors)
+
+
+def decompress(content_encoding: str, content: bytes) -> bytes:
+    if not content_encoding or content_encoding == "identity":
+        return content
+    return _decompressors[content_encoding](content)
+
+
+def received() -> (int, int):
+    # 当前线程累计收到的响应字节数：(线路上的字节, 解压后的字节)
+    return getattr(_local, "wire_bytes", 0), getattr(_local, "body_bytes", 0)
+
+
+def _count(wire: int, body: int):
+    _local.wire_bytes = getattr(_local, "wire_bytes", 0) + wire
+    _local.body_bytes = getattr(_local, "body_bytes", 0) + body
+
+
+class _Response:
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return decode(self.headers.get("Content-Type"), self.content)
+
+
+def _from_flask(response) -> _Response:
+    raw = response.get_data()
+    content = decompress(response.headers.get("Content-Encoding"), raw)
+    _count(len(raw), len(content))
+    return _Response(response.status_code, response.headers, content)
+
+
+def _from_requests(response) -> _Response:
+    content = response.content
+    # urllib3 的 tell() 为从连接读到的（压缩的）字节数
+    try:
+        wire = response.raw.tell()
+    except (AttributeError, ValueError):
+        wire = len(content)
+    _count(wire or len(content), len(content))
+    return _Response(response.status_code, response.headers, content)
+
+
+def _get_client():
+    global _app
+    client = getattr(_local, "client", None)
+    if client is None:
+        with _app_lock:
+            if _app is None:
+                from be import serve
+
+                _app = serve.be_init()
+        # 测试客户端保存 cookie 等状态，每个线程使用独立的实例
+        client = _app.test_client()
+        _local.client = client
+    return client
+
+
+def _flask_headers(headers):
+    headers = dict(headers or {})
+    headers.setdefault("Accept-Encoding", ACCEPT_ENCODING)
+    return headers
+
+
+def get(url, headers=None):
+    headers = _headers(headers)
+    if getattr(conf, "Transport", "http") == "flask":
+        headers = _flask_headers(headers)
+        parsed = urlparse(url)
+        r = _get_client().get(parsed.path, query_string=parsed.query, headers=headers)
+        return _from_flask(r)
+    return _from_requests(requests.get(url, headers=headers))
+
+
+def post(url, headers=None, json=None, timeout=None):
+    # timeout（秒）只对 HTTP 传输生效
+    headers = _headers(headers)
+    if getattr(conf, "Transport", "http") == "flask":
+        headers = _flask_headers(headers)
+        path = urlparse(url).path
+        r = _get_client().post(path, headers=headers, json=json)
+        return _from_flask(r)
+    return _from_requests(
+        requests.post(url, headers=headers, json=json, timeout=timeout)
+    )
@@ -0,0 +1,165 @@
+import os
+import zlib
+
+# 按 Accept-Encoding 协商压缩响应体：装有 brotli / zstandard 时优先使用，否则 gzip。
+# 小于 MIN_SIZE 的响应不压缩；不小于 STREAM_SIZE 的响应按块流式压缩输出，不再整体缓存一份压缩结果
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ENABLED = os.environ.get("BOOKSTORE_COMPRESS", "1") != "0"
+MIN_SIZE = int(os.environ.get("BOOKSTORE_COMPRESS_MIN_SIZE", "1024"))
+STREAM_SIZE = int(os.environ.get("BOOKSTORE_COMPRESS_STREAM_SIZE", str(256 * 1024)))
+CHUNK_SIZE = 64 * 1024
+LEVELS = {
+    "br": int(os.environ.get("BOOKSTORE_BROTLI_QUALITY", "4")),
+    "zstd": int(os.environ.get("BOOKSTORE_ZSTD_LEVEL", "3")),
+    "gzip": int(os.environ.get("BOOKSTORE_GZIP_LEVEL", "6")),
+}
+COMPRESSIBLE_MIMETYPES = (
+    "application/json",
+    "application/msgpack",
+    "text/plain",
+    "text/html",
+    "text/csv",
+    "application/x-ndjson",
+)
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        self.obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self.obj.flush()
+
+
+class _Brotli:
+    def __init__(self, level: int):
+        self.obj = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        # brotli 与 brotlicffi 的方法名不同
+        process = getattr(self.obj, "process", None) or self.obj.compress
+        return process(data)
+
+    def flush(self) -> bytes:
+        return self.obj.finish()
+
+
+class _Zstd:
+    def __init__(self, level: int):
+        self.obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self.obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self.obj.flush()
+
+
+# 编码名 -> 压缩器；顺序即 q 值相同时的优先级
+compressors = {}
+if brotli is not None:
+    compressors["br"] = _Brotli
+if zstandard is not None:
+    compressors["zstd"] = _Zstd
+compressors["gzip"] = _Gzip
+
+
+def negotiate(accept_encoding: str) -> str:
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        parts = item.strip().split(";")
+        name = parts[0].strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    best, best_q = None, 0.0
+    for name in compressors:
+        q = accepted.get(name, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    c = compressors[encoding](LEVELS[encoding])
+    return c.compress(data) + c.flush()
+
+
+def compress_stream(chunks, encoding: str):
+    c = compressors[encoding](LEVELS[encoding])
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        out = c.compress(chunk)
+        if out:
+            yield out
+    out = c.flush()
+    if out:
+        yield out
+
+
+def _chunks(data: bytes):
+    view = memoryview(data)
+    for i in range(0, len(view), CHUNK_SIZE):
+        yield view[i:i + CHUNK_SIZE].tobytes()
+
+
+def compress_response(response, accept_encoding: str):
+    response.vary.add("Accept-Encoding")
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 304)
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+    encoding = negotiate(accept_encoding)
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        # 流式响应（如导出）长度未知，边生成边压缩
+        response.response = compress_stream(response.response, encoding)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+        if len(data) >= STREAM_SIZE:
+            response.response = compress_stream(_chunks(data), encoding)
+        else:
+            response.set_data(compress(data, encoding))
+    if response.is_streamed:
+        response.headers.pop("Content-Length", None)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app):
+    from flask import request
+
+    if not ENABLED:
+        return
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, request.headers.get("Accept-Encoding"))
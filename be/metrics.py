@@ -0,0 +1,227 @@
+import bisect
+import threading
+import time
+
+# 简单的进程内指标，按 Prometheus 文本格式输出；所有更新只做加锁后的加法，开销很小
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if len(pairs) == 0:
+        return ""
+    return "{" + ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in pairs
+    ) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def header(self) -> [str]:
+        return [
+            "# HELP {} {}".format(self.name, self.documentation),
+            "# TYPE {} {}".format(self.name, self.kind),
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, *labels) -> float:
+        return self.values.get(labels, 0)
+
+    def render(self) -> [str]:
+        lines = self.header()
+        with self.lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            lines.append(
+                "{}{} {}".format(self.name, _format_labels(self.labelnames, labels), value)
+            )
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self.lock:
+            self.values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        _Metric.__init__(self, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(labels)
+            if state is None:
+                # [各桶计数（最后一个为 +Inf）, 总和, 总数]
+                state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self.values[labels] = state
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> [str]:
+        lines = self.header()
+        with self.lock:
+            items = sorted(
+                (labels, (list(s[0]), s[1], s[2])) for labels, s in self.values.items()
+            )
+        for labels, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative = cumulative + count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    "{}_bucket{} {}".format(
+                        self.name,
+                        _format_labels(self.labelnames, labels, ("le", le)),
+                        cumulative,
+                    )
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append("{}_sum{} {}".format(self.name, label_text, total))
+            lines.append("{}_count{} {}".format(self.name, label_text, n))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests by route and status code.",
+        ("method", "route", "status"),
+    )
+)
+http_request_duration_seconds = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by route.",
+        ("method", "route"),
+    )
+)
+http_requests_in_flight = registry.register(
+    Gauge("http_requests_in_flight", "HTTP requests being handled.")
+)
+db_connections_total = registry.register(
+    Counter("db_connections_total", "Database connections opened.")
+)
+db_connections_open = registry.register(
+    Gauge("db_connections_open", "Database connections not yet closed.")
+)
+db_txn_retries_total = registry.register(
+    Counter(
+        "db_txn_retries_total",
+        "Transactions retried after a deadlock or lock wait timeout.",
+        ("txn", "error"),
+    )
+)
+db_txn_retry_exhausted_total = registry.register(
+    Counter(
+        "db_txn_retry_exhausted_total",
+        "Transactions that still failed after all retries.",
+        ("txn",),
+    )
+)
+cache_requests_total = registry.register(
+    Counter(
+        "cache_requests_total",
+        "Server-side cache lookups by cache and result.",
+        ("cache", "result"),
+    )
+)
+# 客户端条件请求（If-None-Match）的结果，不是服务端缓存
+conditional_get_total = registry.register(
+    Counter(
+        "conditional_get_total",
+        "Conditional GETs by route and result (not_modified or full).",
+        ("route", "result"),
+    )
+)
+
+
+def cache_hit(cache: str):
+    cache_requests_total.inc(cache, "hit")
+
+
+def cache_miss(cache: str):
+    cache_requests_total.inc(cache, "miss")
+
+
+def init_app(app):
+    from flask import g
+    from flask import request
+
+    @app.before_request
+    def _metrics_before():
+        g.metrics_start = time.perf_counter()
+        http_requests_in_flight.inc()
+
+    @app.after_request
+    def _metrics_after(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            http_requests_in_flight.dec()
+            # 用路由模板而不是实际路径作为标签，避免标签数量随参数增长
+            rule = request.url_rule
+            route = rule.rule if rule is not None else "unmatched"
+            http_requests_total.inc(request.method, route, str(response.status_code))
+            http_request_duration_seconds.observe(
+                request.method, route, value=time.perf_counter() - start
+            )
+        return response
+
+    @app.teardown_request
+    def _metrics_teardown(exc):
+        # 视图抛出异常时 after_request 不会执行，在这里补上计数
+        if g.pop("metrics_start", None) is not None:
+            http_requests_in_flight.dec()
+            rule = request.url_rule
+            route = rule.rule if rule is not None else "unmatched"
+            http_requests_total.inc(request.method, route, "500")
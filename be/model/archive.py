@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# 订单归档：把已收货 / 已取消且下单时间早于保留期的订单分批移入按月分区的
+# orders_archive / orders_detail_archive，热表 orders / orders_detail 只保留近期与未完结的订单
+import argparse
+import logging
+import os
+import sys
+import time
+import pymysql
+from be.model import store
+
+# 不会再变化的订单状态
+TERMINAL_STATUSES = ("received", "cancelled")
+RETENTION_DAYS = 90
+BATCH_SIZE = 500
+ARCHIVE_TABLES = ("orders_archive", "orders_detail_archive")
+ORDER_COLUMNS = (
+    "order_id, user_id, store_id, status, created_at, paid_at, "
+    "shipped_at, received_at, cancel_reason, total_price, item_count"
+)
+
+
+def month_of(timestamp: float) -> int:
+    # 分区键 YYYYMM，按 UTC 计算
+    t = time.gmtime(timestamp or 0)
+    return t.tm_year * 100 + t.tm_mon
+
+
+def _next_month(month: int) -> int:
+    if month % 100 == 12:
+        return (month // 100 + 1) * 100 + 1
+    return month + 1
+
+
+def _max_bound(cursor, table: str) -> int:
+    # 已有月份分区的最大上界，只有 pmax 时为 0
+    cursor.execute(
+        "SELECT partition_description FROM information_schema.partitions "
+        "WHERE table_schema = DATABASE() AND table_name = %s",
+        (table,),
+    )
+    bounds = [int(row[0]) for row in cursor.fetchall() if row[0] and row[0].isdigit()]
+    return max(bounds) if bounds else 0
+
+
+def ensure_partitions(cursor, month: int):
+    # 从 pmax 中拆出到 month 为止的月份分区；更早的月份落在最小的分区中。
+    # ALTER TABLE 会隐式提交，必须在归档事务之外调用
+    for table in ARCHIVE_TABLES:
+        bound = _max_bound(cursor, table)
+        m = month if bound == 0 else bound
+        while bound <= month:
+            upper = _next_month(m)
+            cursor.execute(
+                "ALTER TABLE {} REORGANIZE PARTITION pmax INTO ("
+                "PARTITION p{} VALUES LESS THAN ({}), "
+                "PARTITION pmax VALUES LESS THAN MAXVALUE)".format(table, m, upper)
+            )
+            bound = upper
+            m = upper
+
+
+def archive_batch(
+    conn, cutoff: float, batch_size: int = BATCH_SIZE, store_id: str = None
+) -> int:
+    # 归档一批订单，返回本批订单数；store_id 不为空时只归档该店铺的订单
+    cursor = conn.cursor()
+    where = "status IN ({}) AND created_at < %s".format(
+        ", ".join(["%s"] * len(TERMINAL_STATUSES))
+    )
+    params = TERMINAL_STATUSES + (cutoff,)
+    if store_id:
+        where += " AND store_id = %s"
+        params = params + (store_id,)
+    cursor.execute(
+        "SELECT order_id, created_at FROM orders WHERE {} "
+        "ORDER BY created_at LIMIT %s".format(where),
+        params + (batch_size,),
+    )
+    rows = cursor.fetchall()
+    conn.commit()
+    if len(rows) == 0:
+        return 0
+    months = {}
+    for order_id, created_at in rows:
+        months.setdefault(month_of(created_at), []).append(order_id)
+    ensure_partitions(cursor, max(months))
+
+    try:
+        for month, order_ids in sorted(months.items()):
+            in_list = ", ".join(["%s"] * len(order_ids))
+            ids = tuple(order_ids)
+            cursor.execute(
+                "INSERT INTO orders_archive({0}, archive_month) "
+                "SELECT {0}, %s FROM orders WHERE order_id IN ({1})".format(
+                    ORDER_COLUMNS, in_list
+                ),
+                (month,) + ids,
+            )
+            cursor.execute(
+                "INSERT INTO orders_detail_archive"
+                "(order_id, book_id, count, price, archive_month) "
+                "SELECT order_id, book_id, count, price, %s FROM orders_detail "
+                "WHERE order_id IN ({})".format(in_list),
+                (month,) + ids,
+            )
+            cursor.execute(
+                "DELETE FROM orders_detail WHERE order_id IN ({})".format(in_list), ids
+            )
+            cursor.execute("DELETE FROM orders WHERE order_id IN ({})".format(in_list), ids)
+        conn.commit()
+    except pymysql.Error:
+        conn.rollback()
+        raise
+    return len(rows)
+
+
+def archive_orders(
+    conn,
+    retention_days: float = RETENTION_DAYS,
+    batch_size: int = BATCH_SIZE,
+    store_id: str = None,
+) -> int:
+    # 逐批归档直到没有符合条件的订单，每批一个事务，返回归档的订单总数
+    cutoff = time.time() - retention_days * 24 * 3600
+    total = 0
+    while True:
+        n = archive_batch(conn, cutoff, batch_size, store_id)
+        if n == 0:
+            break
+        total = total + n
+        logging.info("archived {} orders".format(total))
+    return total
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="move old finished orders to archive")
+    parser.add_argument("--days", type=float, default=RETENTION_DAYS)
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE)
+    parser.add_argument("--store", default=None, help="only archive this store")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store.init_database(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    conn = store.get_db_conn()
+    try:
+        archive_orders(conn, args.days, args.batch, args.store)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
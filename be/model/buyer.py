@@ -3,10 +3,13 @@ import uuid
 import json
 import logging
 import time
+from be.model import archive
 from be.model import db_conn
+from be import tracing
 from be.model import error
 
 
+@tracing.trace_methods
 class Buyer(db_conn.DBConn):
     auto_cancel_seconds = 300  # 未支付超时自动取消（秒），测试可在实例上修改
 
@@ -22,222 +25,239 @@ class Buyer(db_conn.DBConn):
                 return error.error_non_exist_user_id(user_id) + (order_id,)
             if not self.store_id_exist(store_id):
                 return error.error_non_exist_store_id(store_id) + (order_id,)
-            uid = "{}_{}_{}".format(user_id, store_id, str(uuid.uuid1()))
-            created_at = time.time()
+            return self.run_txn(
+                "new_order", self._new_order, user_id, store_id, id_and_count
+            )
+        except pymysql.Error as e:
+            logging.info("528, {}".format(str(e)))
+            return 528, "{}".format(str(e)), ""
+        except BaseException as e:
+            logging.info("530, {}".format(str(e)))
+            return 530, "{}".format(str(e)), ""
 
-            # 获取游标
-            cursor = self.conn.cursor()
+    def _new_order(self, user_id: str, store_id: str, id_and_count: [(str, int)]):
+        order_id = ""
+        uid = "{}_{}_{}".format(user_id, store_id, str(uuid.uuid1()))
+        created_at = time.time()
 
-            for book_id, count in id_and_count:
-                cursor.execute(
-                    "SELECT book_id, stock_level, book_info FROM store "
-                    "WHERE store_id = %s AND book_id = %s;",
-                    (store_id, book_id),
-                )
-                row = cursor.fetchone()
-                if row is None:
-                    return error.error_non_exist_book_id(book_id) + (order_id,)
+        # 获取游标
+        cursor = self.conn.cursor()
 
-                stock_level = row[1]
-                book_info = row[2]
-                book_info_json = json.loads(book_info)
-                price = book_info_json.get("price")
+        # 订单总价与书籍总数在下单时算好存入 orders，付款与列表不再汇总明细
+        total_price = 0
+        item_count = 0
 
-                if stock_level < count:
-                    return error.error_stock_level_low(book_id) + (order_id,)
+        # 按 book_id 顺序扣减库存，所有事务以相同顺序加行锁，避免交叉死锁
+        for book_id, count in sorted(id_and_count, key=lambda item: item[0]):
+            cursor.execute(
+                "SELECT book_id, stock_level, price FROM store "
+                "WHERE store_id = %s AND book_id = %s;",
+                (store_id, book_id),
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return error.error_non_exist_book_id(book_id) + (order_id,)
 
-                cursor.execute(
-                    "UPDATE store set stock_level = stock_level - %s "
-                    "WHERE store_id = %s and book_id = %s and stock_level >= %s; ",
-                    (count, store_id, book_id, count),
-                )
-                if cursor.rowcount == 0:
-                    return error.error_stock_level_low(book_id) + (order_id,)
+            stock_level = row[1]
+            price = row[2]
 
-                cursor.execute(
-                    "INSERT INTO new_order_detail(order_id, book_id, count, price) "
-                    "VALUES(%s, %s, %s, %s);",
-                    (uid, book_id, count, price),
-                )
-                cursor.execute(
-                    "INSERT INTO orders_detail(order_id, book_id, count, price) "
-                    "VALUES(%s, %s, %s, %s);",
-                    (uid, book_id, count, price),
-                )
+            if stock_level < count:
+                return error.error_stock_level_low(book_id) + (order_id,)
 
             cursor.execute(
-                "INSERT INTO new_order(order_id, store_id, user_id, created_at) "
+                "UPDATE store set stock_level = stock_level - %s "
+                "WHERE store_id = %s and book_id = %s and stock_level >= %s; ",
+                (count, store_id, book_id, count),
+            )
+            if cursor.rowcount == 0:
+                return error.error_stock_level_low(book_id) + (order_id,)
+            total_price = total_price + price * count
+            item_count = item_count + count
+
+            cursor.execute(
+                "INSERT INTO new_order_detail(order_id, book_id, count, price) "
                 "VALUES(%s, %s, %s, %s);",
-                (uid, store_id, user_id, created_at),
+                (uid, book_id, count, price),
             )
             cursor.execute(
-                "INSERT INTO orders(order_id, store_id, user_id, status, created_at) "
-                "VALUES(%s, %s, %s, %s, %s);",
-                (uid, store_id, user_id, "pending", created_at),
+                "INSERT INTO orders_detail(order_id, book_id, count, price) "
+                "VALUES(%s, %s, %s, %s);",
+                (uid, book_id, count, price),
             )
-            self.conn.commit()
-            order_id = uid
-        except pymysql.Error as e:
-            logging.info("528, {}".format(str(e)))
-            return 528, "{}".format(str(e)), ""
-        except BaseException as e:
-            logging.info("530, {}".format(str(e)))
-            return 530, "{}".format(str(e)), ""
 
-        return 200, "ok", order_id
+        cursor.execute(
+            "INSERT INTO new_order(order_id, store_id, user_id, created_at) "
+            "VALUES(%s, %s, %s, %s);",
+            (uid, store_id, user_id, created_at),
+        )
+        cursor.execute(
+            "INSERT INTO orders(order_id, store_id, user_id, status, created_at, "
+            "total_price, item_count) VALUES(%s, %s, %s, %s, %s, %s, %s);",
+            (uid, store_id, user_id, "pending", created_at, total_price, item_count),
+        )
+        self.conn.commit()
+        return 200, "ok", uid
 
-    def _get_order_info(self, order_id: str):
+    def _get_order_info(self, order_id: str, for_update: bool = False):
+        # 修改订单的事务先锁订单行，再按 book_id / user_id 顺序锁库存和余额行
         cursor = self.conn.cursor()
         cursor.execute(
-            "SELECT order_id, user_id, store_id, status, created_at, paid_at, shipped_at, received_at "
-            "FROM orders WHERE order_id = %s;",
+            "SELECT order_id, user_id, store_id, status, created_at, paid_at, shipped_at, received_at, "
+            "total_price FROM orders WHERE order_id = %s" + (" FOR UPDATE;" if for_update else ";"),
             (order_id,),
         )
         return cursor.fetchone()
 
     def _auto_cancel_if_needed(self, order_row):
+        # 在调用方的事务中取消超时未付款的订单（order_row 已加锁）；
+        # 取消会提交当前事务，调用方之后不能再修改数据，应直接返回
         if order_row is None:
             return False
         status = order_row[3]
         created_at = order_row[4]
         if status == "pending" and created_at is not None:
             if time.time() - created_at > self.auto_cancel_seconds:
-                self.cancel_order(order_row[1], order_row[0], auto=True)
+                self._cancel_order(order_row[1], order_row[0], True)
                 return True
         return False
 
     def cancel_order(self, user_id: str, order_id: str, auto: bool = False):
         try:
-            order_row = self._get_order_info(order_id)
-            if order_row is None:
-                return error.error_invalid_order_id(order_id)
-            buyer_id = order_row[1]
-            store_id = order_row[2]
-            status = order_row[3]
-            if buyer_id != user_id:
-                return error.error_authorization_fail()
-            if status != "pending":
-                return error.error_invalid_order_id(order_id)
-
-            cursor = self.conn.cursor()
-            cursor.execute(
-                "SELECT book_id, count FROM orders_detail WHERE order_id = %s;",
-                (order_id,),
-            )
-            # 关键修改：一次性取出所有数据，防止后续 UPDATE 时 cursor 冲突
-            details = cursor.fetchall()
-
-            # 使用新的 cursor 进行更新操作
-            update_cursor = self.conn.cursor()
-            for book_id, count in details:
-                update_cursor.execute(
-                    "UPDATE store SET stock_level = stock_level + %s "
-                    "WHERE store_id = %s AND book_id = %s;",
-                    (count, store_id, book_id),
-                )
-
-            update_cursor.execute(
-                "UPDATE orders SET status = %s, cancel_reason = %s WHERE order_id = %s;",
-                ("cancelled", "auto" if auto else "user_cancel", order_id),
-            )
-            update_cursor.execute("DELETE FROM new_order WHERE order_id = %s;", (order_id,))
-            update_cursor.execute(
-                "DELETE FROM new_order_detail WHERE order_id = %s;", (order_id,)
-            )
-            self.conn.commit()
+            return self.run_txn("cancel_order", self._cancel_order, user_id, order_id, auto)
         except pymysql.Error as e:
             return 528, "{}".format(str(e))
         except BaseException as e:
             return 530, "{}".format(str(e))
-        return 200, "ok"
 
-    def payment(self, user_id: str, password: str, order_id: str) -> (int, str):
-        conn = self.conn
-        try:
-            order_row = self._get_order_info(order_id)
-            if order_row is None:
-                return error.error_invalid_order_id(order_id)
+    def _cancel_order(self, user_id: str, order_id: str, auto: bool):
+        order_row = self._get_order_info(order_id, for_update=True)
+        if order_row is None:
+            return error.error_invalid_order_id(order_id)
+        buyer_id = order_row[1]
+        store_id = order_row[2]
+        status = order_row[3]
+        if buyer_id != user_id:
+            return error.error_authorization_fail()
+        if status != "pending":
+            return error.error_invalid_order_id(order_id)
 
-            buyer_id = order_row[1]
-            store_id = order_row[2]
-            if self._auto_cancel_if_needed(order_row):
-                return error.error_invalid_order_id(order_id)
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT book_id, count FROM orders_detail WHERE order_id = %s "
+            "ORDER BY book_id;",
+            (order_id,),
+        )
+        # 关键修改：一次性取出所有数据，防止后续 UPDATE 时 cursor 冲突
+        details = cursor.fetchall()
 
-            if order_row[3] != "pending":
-                return error.error_invalid_order_id(order_id)
+        # 使用新的 cursor 进行更新操作；按 book_id 顺序归还库存，与 new_order 的加锁顺序一致
+        update_cursor = self.conn.cursor()
+        for book_id, count in details:
+            update_cursor.execute(
+                "UPDATE store SET stock_level = stock_level + %s "
+                "WHERE store_id = %s AND book_id = %s;",
+                (count, store_id, book_id),
+            )
 
-            if buyer_id != user_id:
-                return error.error_authorization_fail()
+        update_cursor.execute(
+            "UPDATE orders SET status = %s, cancel_reason = %s WHERE order_id = %s;",
+            ("cancelled", "auto" if auto else "user_cancel", order_id),
+        )
+        update_cursor.execute("DELETE FROM new_order WHERE order_id = %s;", (order_id,))
+        update_cursor.execute(
+            "DELETE FROM new_order_detail WHERE order_id = %s;", (order_id,)
+        )
+        self.conn.commit()
+        return 200, "ok"
 
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT balance, password FROM user WHERE user_id = %s;", (buyer_id,)
-            )
-            row = cursor.fetchone()
-            if row is None:
-                return error.error_non_exist_user_id(buyer_id)
-            balance = row[0]
-            if password != row[1]:
-                return error.error_authorization_fail()
+    def payment(self, user_id: str, password: str, order_id: str) -> (int, str):
+        try:
+            return self.run_txn("payment", self._payment, user_id, password, order_id)
+        except pymysql.Error as e:
+            return 528, "{}".format(str(e))
 
-            cursor.execute(
-                "SELECT store_id, user_id FROM user_store WHERE store_id = %s;",
-                (store_id,),
-            )
-            row = cursor.fetchone()
-            if row is None:
-                return error.error_non_exist_store_id(store_id)
+        except BaseException as e:
+            return 530, "{}".format(str(e))
 
-            seller_id = row[1]
+    def _payment(self, user_id: str, password: str, order_id: str) -> (int, str):
+        conn = self.conn
+        order_row = self._get_order_info(order_id, for_update=True)
+        if order_row is None:
+            return error.error_invalid_order_id(order_id)
 
-            if not self.user_id_exist(seller_id):
-                return error.error_non_exist_user_id(seller_id)
+        buyer_id = order_row[1]
+        store_id = order_row[2]
+        if self._auto_cancel_if_needed(order_row):
+            return error.error_invalid_order_id(order_id)
 
-            cursor.execute(
-                "SELECT book_id, count, price FROM new_order_detail WHERE order_id = %s;",
-                (order_id,),
-            )
-            total_price = 0
-            # 这里必须用 fetchall 算出总价
-            for row in cursor.fetchall():
-                count = row[1]
-                price = row[2]
-                total_price = total_price + price * count
+        if order_row[3] != "pending":
+            return error.error_invalid_order_id(order_id)
 
-            if balance < total_price:
-                return error.error_not_sufficient_funds(order_id)
+        if buyer_id != user_id:
+            return error.error_authorization_fail()
 
-            cursor.execute(
-                "UPDATE user set balance = balance - %s "
-                "WHERE user_id = %s AND balance >= %s",
-                (total_price, buyer_id, total_price),
-            )
-            if cursor.rowcount == 0:
-                return error.error_not_sufficient_funds(order_id)
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT balance, password FROM user WHERE user_id = %s;", (buyer_id,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return error.error_non_exist_user_id(buyer_id)
+        balance = row[0]
+        if password != row[1]:
+            return error.error_authorization_fail()
 
-            cursor.execute(
-                "UPDATE user set balance = balance + %s " "WHERE user_id = %s",
-                (total_price, seller_id),
-            )
+        cursor.execute(
+            "SELECT store_id, user_id FROM user_store WHERE store_id = %s;",
+            (store_id,),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return error.error_non_exist_store_id(store_id)
 
-            if cursor.rowcount == 0:
-                return error.error_non_exist_user_id(seller_id)
+        seller_id = row[1]
 
-            now = time.time()
-            cursor.execute(
-                "UPDATE orders SET status = %s, paid_at = %s WHERE order_id = %s",
-                ("paid", now, order_id),
+        if not self.user_id_exist(seller_id):
+            return error.error_non_exist_user_id(seller_id)
+
+        # 使用下单时保存的总价；尚未回填总价的旧订单不能按空值比较余额
+        total_price = order_row[8]
+        if total_price is None:
+            return error.error_and_message(
+                530, "total price of order {} is missing".format(order_id)
             )
-            cursor.execute("DELETE FROM new_order WHERE order_id = %s", (order_id,))
-            cursor.execute("DELETE FROM new_order_detail WHERE order_id = %s", (order_id,))
-            conn.commit()
 
-        except pymysql.Error as e:
-            return 528, "{}".format(str(e))
+        if balance < total_price:
+            return error.error_not_sufficient_funds(order_id)
 
-        except BaseException as e:
-            return 530, "{}".format(str(e))
+        # 买家扣款与卖家入账按 user_id 顺序执行，互为买卖双方的两笔支付不会交叉等锁
+        for _, is_buyer in sorted(
+            ((buyer_id, True), (seller_id, False)), key=lambda item: item[0]
+        ):
+            if is_buyer:
+                cursor.execute(
+                    "UPDATE user set balance = balance - %s "
+                    "WHERE user_id = %s AND balance >= %s",
+                    (total_price, buyer_id, total_price),
+                )
+                if cursor.rowcount == 0:
+                    return error.error_not_sufficient_funds(order_id)
+            else:
+                cursor.execute(
+                    "UPDATE user set balance = balance + %s " "WHERE user_id = %s",
+                    (total_price, seller_id),
+                )
+                if cursor.rowcount == 0:
+                    return error.error_non_exist_user_id(seller_id)
 
+        now = time.time()
+        cursor.execute(
+            "UPDATE orders SET status = %s, paid_at = %s WHERE order_id = %s",
+            ("paid", now, order_id),
+        )
+        cursor.execute("DELETE FROM new_order WHERE order_id = %s", (order_id,))
+        cursor.execute("DELETE FROM new_order_detail WHERE order_id = %s", (order_id,))
+        conn.commit()
         return 200, "ok"
 
     def receive_order(self, user_id: str, order_id: str):
@@ -292,16 +312,43 @@ class Buyer(db_conn.DBConn):
         return 200, "ok"
 
     def list_orders(
-            self, user_id: str, status: str = None, page: int = 1, page_size: int = 10
+            self,
+            user_id: str,
+            status: str = None,
+            page: int = 1,
+            page_size: int = 10,
+            with_items: bool = False,
     ):
         try:
             cursor = self.conn.cursor()
-            params = [user_id]
-            query = "SELECT order_id, store_id, status, created_at, paid_at, shipped_at, received_at, cancel_reason FROM orders WHERE user_id = %s"
+            columns = (
+                "order_id, store_id, status, created_at, paid_at, shipped_at, received_at, "
+                "cancel_reason, total_price, item_count"
+            )
+            where = " WHERE user_id = %s"
+            branch_params = [user_id]
             if status:
-                query += " AND status = %s"
-                params.append(status)
-            query += " ORDER BY created_at DESC LIMIT %s OFFSET %s"
+                where += " AND status = %s"
+                branch_params.append(status)
+            # 每个分支只需取前 offset + page_size 条，合并后再分页
+            n = page * page_size
+            branch = "(SELECT {} FROM {{}}{} ORDER BY created_at DESC LIMIT %s)".format(
+                columns, where
+            )
+            hot_only = bool(status) and status not in archive.TERMINAL_STATUSES
+            if hot_only:
+                # 未完结的订单不会被归档，只查热表
+                query = branch.format("orders")
+                params = branch_params + [n]
+            else:
+                # 已归档的订单与热表合并，对调用方透明
+                query = "{} UNION ALL {}".format(
+                    branch.format("orders"), branch.format("orders_archive")
+                )
+                params = branch_params + [n] + branch_params + [n]
+            query = "SELECT {} FROM ({}) t ORDER BY created_at DESC LIMIT %s OFFSET %s".format(
+                columns, query
+            )
             params.extend([page_size, (page - 1) * page_size])
 
             cursor.execute(query, tuple(params))
@@ -317,14 +364,42 @@ class Buyer(db_conn.DBConn):
                         "shipped_at": row[5],
                         "received_at": row[6],
                         "cancel_reason": row[7],
+                        "total_price": row[8],
+                        "item_count": row[9],
                     }
                 )
+            if with_items and len(orders) > 0:
+                self._attach_items(cursor, orders, hot_only)
         except pymysql.Error as e:
             return 528, "{}".format(str(e)), []
         except BaseException as e:
             return 530, "{}".format(str(e)), []
         return 200, "ok", orders
 
+    def _attach_items(self, cursor, orders: [dict], hot_only: bool):
+        # 一次查询取出本页所有订单的明细，而不是每个订单查一次
+        in_list = ", ".join(["%s"] * len(orders))
+        order_ids = tuple(o["order_id"] for o in orders)
+        query = (
+            "SELECT order_id, book_id, count, price FROM orders_detail "
+            "WHERE order_id IN ({})".format(in_list)
+        )
+        params = order_ids
+        if not hot_only:
+            query += (
+                " UNION ALL SELECT order_id, book_id, count, price "
+                "FROM orders_detail_archive WHERE order_id IN ({})".format(in_list)
+            )
+            params = order_ids + order_ids
+        cursor.execute(query, params)
+        items = {}
+        for order_id, book_id, count, price in cursor.fetchall():
+            items.setdefault(order_id, []).append(
+                {"book_id": book_id, "count": count, "price": price}
+            )
+        for o in orders:
+            o["items"] = sorted(items.get(o["order_id"], []), key=lambda i: i["book_id"])
+
     def search_book(
             self,
             keyword: str,
@@ -339,29 +414,32 @@ class Buyer(db_conn.DBConn):
             cursor = self.conn.cursor()
             params = []
             like_fields = [
-                "lower(title)",
-                "lower(author)",
-                "lower(publisher)",
-                "lower(original_title)",
-                "lower(translator)",
-                "lower(book_intro)",
-                "lower(content)",
-                "lower(catalog)",
-                "lower(tags_text)",
+                "lower(b.title)",
+                "lower(b.author)",
+                "lower(b.publisher)",
+                "lower(b.original_title)",
+                "lower(b.translator)",
+                "lower(b.book_intro)",
+                "lower(b.content)",
+                "lower(b.catalog)",
+                "lower(b.tags_text)",
             ]
             match_expr = " OR ".join([f"{f} LIKE %s" for f in like_fields])
             params.extend([keyword_lower] * len(like_fields))
 
+            # 每本书在 book_search 中只有一行，关联 store 得到在售的店铺
             query = (
-                "SELECT store_id, book_id, title, author, publisher, original_title, "
-                "translator, book_intro, content, catalog, tags_text "
-                "FROM book_search WHERE "
+                "SELECT s.store_id, b.book_id, b.title, b.author, b.publisher, "
+                "b.original_title, b.translator, b.book_intro, b.content, "
+                "b.catalog, b.tags_text "
+                "FROM book_search b JOIN store s ON s.book_id = b.book_id "
+                "WHERE s.status = 'on_sale' AND "
             )
             query += f"({match_expr})"
             if scope == "store" and store_id:
-                query += " AND store_id = %s"
+                query += " AND s.store_id = %s"
                 params.append(store_id)
-            query += " ORDER BY store_id, book_id LIMIT %s OFFSET %s"
+            query += " ORDER BY s.store_id, b.book_id LIMIT %s OFFSET %s"
             params.extend([page_size, (page - 1) * page_size])
 
             cursor.execute(query, tuple(params))
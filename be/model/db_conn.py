@@ -1,10 +1,49 @@
+import random
+import time
+import pymysql
+from be import metrics
 from be.model import store
 
+# 死锁（1213）与锁等待超时（1205）时 MySQL 已回滚该事务（或语句），整个事务可以安全重试
+RETRYABLE_ERRORS = (1213, 1205)
+TXN_MAX_RETRIES = 3
+# 退避时间在 [0, min(TXN_BACKOFF_MAX, TXN_BACKOFF_BASE * 2^n)] 内随机
+TXN_BACKOFF_BASE = 0.005
+TXN_BACKOFF_MAX = 0.1
+
+
+def retryable_error_code(e: BaseException) -> int:
+    if isinstance(e, pymysql.err.OperationalError) and len(e.args) > 0:
+        if e.args[0] in RETRYABLE_ERRORS:
+            return e.args[0]
+    return 0
+
 
 class DBConn:
     def __init__(self):
         self.conn = store.get_db_conn()
 
+    def run_txn(self, name: str, fn, *args):
+        # 执行一个事务函数：返回码不是 200 时回滚已做的修改；遇到死锁或锁等待超时时回滚并退避重试，
+        # 重试用尽后抛出原异常
+        for attempt in range(0, TXN_MAX_RETRIES + 1):
+            try:
+                result = fn(*args)
+                if result[0] != 200:
+                    self.conn.rollback()
+                return result
+            except pymysql.Error as e:
+                code = retryable_error_code(e)
+                self.conn.rollback()
+                if code == 0:
+                    raise
+                if attempt == TXN_MAX_RETRIES:
+                    metrics.db_txn_retry_exhausted_total.inc(name)
+                    raise
+                metrics.db_txn_retries_total.inc(name, str(code))
+                backoff = min(TXN_BACKOFF_MAX, TXN_BACKOFF_BASE * (2 ** attempt))
+                time.sleep(random.uniform(0, backoff))
+
     def user_id_exist(self, user_id):
         cursor = self.conn.cursor()
         cursor.execute(
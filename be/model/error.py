@@ -1,5 +1,8 @@
 error_code = {
     401: "authorization fail.",
+    404: "non exist picture id {}",
+    409: "idempotency key {} is in progress",
+    422: "idempotency key {} reused with a different request",
     511: "non exist user id {}",
     512: "exist user id {}",
     513: "non exist store id {}",
@@ -57,6 +60,18 @@ def error_not_sufficient_funds(order_id):
     return 519, error_code[519].format(order_id)
 
 
+def error_non_exist_picture_id(picture_id):
+    return 404, error_code[404].format(picture_id)
+
+
+def error_idempotency_in_progress(key):
+    return 409, error_code[409].format(key)
+
+
+def error_idempotency_mismatch(key):
+    return 422, error_code[422].format(key)
+
+
 def error_authorization_fail():
     return 401, error_code[401]
 
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# 订单（含明细）与店铺库存的流式导出：使用不缓存结果集的服务端游标逐行读取，
+# 按块生成 NDJSON 或 CSV，内存占用与表大小无关
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+from be.model import archive
+from be.model import sql_stats
+from be.model import store
+
+FORMATS = ("ndjson", "csv")
+MIMETYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# 每次产出的块大小（字节）
+CHUNK_SIZE = 64 * 1024
+# 导出可能持续较久，客户端读得慢时 MySQL 默认 60 秒的写超时会中断连接
+NET_WRITE_TIMEOUT = 600
+
+ORDER_FIELDS = (
+    "order_id", "user_id", "store_id", "status", "created_at", "paid_at",
+    "shipped_at", "received_at", "cancel_reason", "total_price", "item_count",
+)
+ITEM_FIELDS = ("book_id", "count", "price")
+INVENTORY_FIELDS = ("store_id", "book_id", "title", "stock_level", "price", "status")
+
+
+def _open():
+    conn = store.get_db_conn()
+    cursor = conn.cursor(sql_stats.InstrumentedSSCursor)
+    cursor.execute("SET SESSION net_write_timeout = %s", (NET_WRITE_TIMEOUT,))
+    # 热表与归档表在同一个快照中读取，导出期间被归档的订单不会重复或遗漏
+    cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+    return conn, cursor
+
+
+def _order_query(
+    orders: str, details: str, archived: bool, store_id, start_time, end_time
+):
+    # 按 (created_at, order_id) 排序，同一订单的明细行连续出现，可以逐个订单组装
+    where = []
+    params = []
+    if store_id:
+        where.append("o.store_id = %s")
+        params.append(store_id)
+    if start_time is not None:
+        where.append("o.created_at >= %s")
+        params.append(start_time)
+        if archived:
+            # 归档表按月分区，限定 archive_month 只扫描相关分区
+            where.append("o.archive_month >= %s")
+            params.append(archive.month_of(start_time))
+    if end_time is not None:
+        where.append("o.created_at < %s")
+        params.append(end_time)
+        if archived:
+            where.append("o.archive_month <= %s")
+            params.append(archive.month_of(end_time))
+    query = (
+        "SELECT {}, d.book_id, d.count, d.price FROM {} o "
+        "LEFT JOIN {} d ON d.order_id = o.order_id".format(
+            ", ".join("o." + f for f in ORDER_FIELDS), orders, details
+        )
+    )
+    if archived:
+        # 明细与订单在同一个月份分区，带上分区键后明细表只访问该分区
+        query += " AND d.archive_month = o.archive_month"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY o.created_at, o.order_id"
+    return query, tuple(params)
+
+
+def iter_orders(store_id: str = None, start_time: float = None, end_time: float = None):
+    # 逐个产出订单 dict，items 为明细列表；先热表后归档表
+    conn, cursor = _open()
+    try:
+        for orders, details, archived in (
+            ("orders", "orders_detail", False),
+            ("orders_archive", "orders_detail_archive", True),
+        ):
+            cursor.execute(
+                *_order_query(orders, details, archived, store_id, start_time, end_time)
+            )
+            current = None
+            for row in cursor:
+                if current is None or current["order_id"] != row[0]:
+                    if current is not None:
+                        yield current
+                    current = dict(zip(ORDER_FIELDS, row[: len(ORDER_FIELDS)]))
+                    current["archived"] = archived
+                    current["items"] = []
+                if row[len(ORDER_FIELDS)] is not None:
+                    current["items"].append(
+                        dict(zip(ITEM_FIELDS, row[len(ORDER_FIELDS):]))
+                    )
+            if current is not None:
+                yield current
+        conn.commit()
+    finally:
+        # 提前结束时直接关闭连接；关闭 SSCursor 会先读完剩余的结果集
+        conn.close()
+
+
+def iter_inventory(store_id: str = None):
+    conn, cursor = _open()
+    try:
+        query = (
+            "SELECT s.store_id, s.book_id, b.title, s.stock_level, s.price, s.status "
+            "FROM store s LEFT JOIN book_search b ON b.book_id = s.book_id"
+        )
+        params = ()
+        if store_id:
+            query += " WHERE s.store_id = %s"
+            params = (store_id,)
+        # 按主键顺序读取，不需要排序
+        query += " ORDER BY s.store_id, s.book_id"
+        cursor.execute(query, params)
+        for row in cursor:
+            yield dict(zip(INVENTORY_FIELDS, row))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _order_rows(orders):
+    # CSV 中每个明细一行，订单字段重复；没有明细的订单输出一行空明细
+    for order in orders:
+        head = [order[f] for f in ORDER_FIELDS] + [order["archived"]]
+        for item in order["items"] or [dict.fromkeys(ITEM_FIELDS)]:
+            yield head + [item[f] for f in ITEM_FIELDS]
+
+
+def encode(records, fmt: str, kind: str):
+    # 把记录编码为不小于 CHUNK_SIZE 的字节块
+    buf = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buf)
+        if kind == "orders":
+            writer.writerow(ORDER_FIELDS + ("archived",) + ITEM_FIELDS)
+            rows = _order_rows(records)
+        else:
+            writer.writerow(INVENTORY_FIELDS)
+            rows = ([r[f] for f in INVENTORY_FIELDS] for r in records)
+        for row in rows:
+            writer.writerow(row)
+            if buf.tell() >= CHUNK_SIZE:
+                yield buf.getvalue().encode("utf-8")
+                buf.seek(0)
+                buf.truncate()
+    else:
+        for record in records:
+            buf.write(json.dumps(record, ensure_ascii=False))
+            buf.write("\n")
+            if buf.tell() >= CHUNK_SIZE:
+                yield buf.getvalue().encode("utf-8")
+                buf.seek(0)
+                buf.truncate()
+    if buf.tell() > 0:
+        yield buf.getvalue().encode("utf-8")
+
+
+def export(kind: str, fmt: str = "ndjson", store_id=None, start_time=None, end_time=None):
+    if kind == "orders":
+        records = iter_orders(store_id, start_time, end_time)
+    else:
+        records = iter_inventory(store_id)
+    return encode(records, fmt, kind)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="stream orders or inventory")
+    parser.add_argument("kind", choices=("orders", "inventory"))
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--store", default=None)
+    parser.add_argument("--start", type=float, default=None, help="created_at >= start")
+    parser.add_argument("--end", type=float, default=None, help="created_at < end")
+    parser.add_argument("--out", default="-", help="output file, default stdout")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store.init_database(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    out = sys.stdout.buffer if args.out == "-" else open(args.out, "wb")
+    try:
+        for chunk in export(args.kind, args.format, args.store, args.start, args.end):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
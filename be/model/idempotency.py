@@ -0,0 +1,133 @@
+import json
+import random
+import time
+import pymysql
+from be.model import error
+from be.model import db_conn
+from be import tracing
+
+# 幂等键保留时间（秒）；超过后同一个键视为新请求
+IDEMPOTENCY_TTL = 24 * 3600
+# 占用后未写入结果（进程在执行中退出）的键，超过该时间（秒）后允许重新执行；
+# 必须远大于任何请求的执行时间，否则仍在执行的请求会被同一个键的重试再执行一次
+PENDING_TTL = 600
+# 每次占用键时以该概率顺带清理一批过期记录
+PURGE_PROBABILITY = 0.01
+PURGE_BATCH = 1000
+# 数据库错误（528/530）是暂时性的，不保存结果，客户端用同一个键重试时重新执行
+TRANSIENT_CODES = (528, 530)
+# 密码不参与请求摘要，鉴权失败（401）也不保存，改用正确的密码重试时重新执行
+UNSTORED_CODES = TRANSIENT_CODES + (401,)
+
+
+@tracing.trace_methods
+class Idempotency(db_conn.DBConn):
+    def __init__(self):
+        db_conn.DBConn.__init__(self)
+
+    def begin(
+        self, user_id: str, endpoint: str, key: str, request_hash: str
+    ) -> (int, str, tuple):
+        # 占用幂等键：返回 (200, "ok", None) 表示应执行请求；
+        # 返回 (200, "ok", (code, body)) 表示已执行过，直接重放原响应
+        try:
+            cursor = self.conn.cursor()
+            if random.random() < PURGE_PROBABILITY:
+                cursor.execute(
+                    "DELETE FROM idempotency_key WHERE expires_at < %s LIMIT %s",
+                    (time.time(), PURGE_BATCH),
+                )
+            # 先直接插入，主键冲突再读取已有记录，不用 SELECT ... FOR UPDATE 的间隙锁
+            for attempt in range(0, 2):
+                try:
+                    self._claim(cursor, user_id, endpoint, key, request_hash)
+                    return 200, "ok", None
+                except pymysql.IntegrityError:
+                    self.conn.rollback()
+                cursor.execute(
+                    "SELECT request_hash, status, code, response, expires_at "
+                    "FROM idempotency_key "
+                    "WHERE user_id = %s AND endpoint = %s AND idem_key = %s",
+                    (user_id, endpoint, key),
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    continue
+                if row[4] < time.time():
+                    # 已过期，删除后重新占用
+                    cursor.execute(
+                        "DELETE FROM idempotency_key "
+                        "WHERE user_id = %s AND endpoint = %s AND idem_key = %s "
+                        "AND expires_at = %s",
+                        (user_id, endpoint, key, row[4]),
+                    )
+                    self.conn.commit()
+                    continue
+                self.conn.commit()
+                if row[0] != request_hash:
+                    return error.error_idempotency_mismatch(key) + (None,)
+                if row[1] != "done":
+                    return error.error_idempotency_in_progress(key) + (None,)
+                return 200, "ok", (row[2], json.loads(row[3]))
+            return error.error_idempotency_in_progress(key) + (None,)
+        except pymysql.Error as e:
+            return 528, "{}".format(str(e)), None
+        except BaseException as e:
+            return 530, "{}".format(str(e)), None
+
+    def _claim(self, cursor, user_id, endpoint, key, request_hash):
+        cursor.execute(
+            "INSERT INTO idempotency_key"
+            "(user_id, endpoint, idem_key, request_hash, status, expires_at) "
+            "VALUES(%s, %s, %s, %s, %s, %s)",
+            (user_id, endpoint, key, request_hash, "pending", time.time() + PENDING_TTL),
+        )
+        self.conn.commit()
+
+    def finish(
+        self,
+        user_id: str,
+        endpoint: str,
+        key: str,
+        request_hash: str,
+        code: int,
+        body: dict,
+    ) -> (int, str):
+        try:
+            cursor = self.conn.cursor()
+            if code in UNSTORED_CODES:
+                cursor.execute(
+                    "DELETE FROM idempotency_key "
+                    "WHERE user_id = %s AND endpoint = %s AND idem_key = %s",
+                    (user_id, endpoint, key),
+                )
+            else:
+                cursor.execute(
+                    "UPDATE idempotency_key SET status = %s, code = %s, response = %s, "
+                    "expires_at = %s "
+                    "WHERE user_id = %s AND endpoint = %s AND idem_key = %s "
+                    "AND status = %s AND request_hash = %s",
+                    (
+                        "done",
+                        code,
+                        json.dumps(body),
+                        time.time() + IDEMPOTENCY_TTL,
+                        user_id,
+                        endpoint,
+                        key,
+                        "pending",
+                        request_hash,
+                    ),
+                )
+                if cursor.rowcount == 0:
+                    # 占用已过期并被其他请求接管，结果没有记录下来
+                    self.conn.rollback()
+                    return error.error_and_message(
+                        530, "idempotency key {} expired before finish".format(key)
+                    )
+            self.conn.commit()
+        except pymysql.Error as e:
+            return 528, "{}".format(str(e))
+        except BaseException as e:
+            return 530, "{}".format(str(e))
+        return 200, "ok"
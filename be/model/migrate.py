@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# 将旧的表结构（store.book_info 中为每个店铺保存一份书籍元数据，book_search 按店铺索引）
+# 迁移为全局书目 book + 店铺库存 store + 按书索引的 book_search；
+# 为旧的订单表补上下单时计算的 total_price / item_count
+import json
+import logging
+import os
+import time
+import pymysql
+from be.model import store
+from be.model import picture
+
+BATCH_SIZE = 500
+
+
+def _columns(cursor, table: str) -> [str]:
+    cursor.execute(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = %s",
+        (table,),
+    )
+    return [row[0].lower() for row in cursor.fetchall()]
+
+
+def _finished(cursor, name: str) -> bool:
+    cursor.execute("SELECT name FROM schema_migration WHERE name = %s", (name,))
+    return cursor.fetchone() is not None
+
+
+def _mark_finished(conn, cursor, name: str):
+    cursor.execute(
+        "INSERT IGNORE INTO schema_migration(name, finished_at) VALUES (%s, %s)",
+        (name, time.time()),
+    )
+    conn.commit()
+
+
+def migrate_catalog(conn):
+    try:
+        with conn.cursor() as cursor:
+            if "book_info" in _columns(cursor, "store"):
+                _migrate_store(conn, cursor)
+            if "store_id" in _columns(cursor, "book_search"):
+                _migrate_search(conn, cursor)
+        conn.commit()
+    except pymysql.Error as e:
+        logging.error("catalog migration failed: {}".format(e))
+        conn.rollback()
+
+
+def _migrate_store(conn, cursor):
+    logging.info("migrate store.book_info to book catalog")
+    # ALTER TABLE 会隐式提交，上次迁移中途失败时列可能已经加上；
+    # 之后的复制步骤可以重复执行，重新运行会从头补完
+    columns = _columns(cursor, "store")
+    if "price" not in columns:
+        cursor.execute("ALTER TABLE store ADD COLUMN price INTEGER")
+    if "status" not in columns:
+        cursor.execute(
+            "ALTER TABLE store ADD COLUMN status VARCHAR(20) NOT NULL DEFAULT 'on_sale'"
+        )
+    # 按主键分批读取，避免一次把所有 book_info 读入内存
+    read_cursor = conn.cursor()
+    last = ("", "")
+    while True:
+        read_cursor.execute(
+            "SELECT store_id, book_id, book_info FROM store "
+            "WHERE (store_id, book_id) > (%s, %s) "
+            "ORDER BY store_id, book_id LIMIT %s",
+            (last[0], last[1], BATCH_SIZE),
+        )
+        rows = read_cursor.fetchall()
+        if len(rows) == 0:
+            break
+        prices = []
+        books = {}
+        for store_id, book_id, book_info in rows:
+            info = json.loads(book_info) if book_info else {}
+            prices.append((info.get("price"), store_id, book_id))
+            if book_id not in books:
+                books[book_id] = info
+        cursor.execute(
+            "SELECT book_id FROM book WHERE book_id IN ({})".format(
+                ", ".join(["%s"] * len(books))
+            ),
+            tuple(books.keys()),
+        )
+        for row in cursor.fetchall():
+            books.pop(row[0], None)
+        if len(books) > 0:
+            picture.store_pictures(cursor, list(books.values()))
+            cursor.executemany(
+                "INSERT IGNORE INTO book(book_id, book_info) VALUES (%s, %s)",
+                [(book_id, json.dumps(info)) for book_id, info in books.items()],
+            )
+        cursor.executemany(
+            "UPDATE store SET price = %s WHERE store_id = %s AND book_id = %s",
+            prices,
+        )
+        conn.commit()
+        last = (rows[-1][0], rows[-1][1])
+    cursor.execute("ALTER TABLE store DROP COLUMN book_info")
+
+
+def _migrate_search(conn, cursor):
+    logging.info("rebuild book_search per book")
+    cursor.execute("DROP TABLE IF EXISTS book_search_new")
+    cursor.execute(store.SEARCH_TABLE_DDL.format("book_search_new"))
+    cursor.execute(
+        "INSERT IGNORE INTO book_search_new(book_id, title, author, publisher, "
+        "original_title, translator, book_intro, content, catalog, tags_text) "
+        "SELECT book_id, title, author, publisher, original_title, translator, "
+        "book_intro, content, catalog, tags_text FROM book_search"
+    )
+    # 一条 RENAME 原子地交换两张表，中途失败时 book_search 仍是旧表，可以重新迁移
+    cursor.execute("DROP TABLE IF EXISTS book_search_old")
+    cursor.execute(
+        "RENAME TABLE book_search TO book_search_old, book_search_new TO book_search"
+    )
+    cursor.execute("DROP TABLE book_search_old")
+    store.create_indexes(cursor)
+
+
+def migrate_order_totals(conn):
+    # 回填需要扫描整张订单表，全部完成后记入 schema_migration，之后启动不再执行
+    try:
+        with conn.cursor() as cursor:
+            if _finished(cursor, "order_totals"):
+                return
+            for orders, details in (
+                ("orders", "orders_detail"),
+                ("orders_archive", "orders_detail_archive"),
+            ):
+                _migrate_totals(conn, cursor, orders, details)
+            _mark_finished(conn, cursor, "order_totals")
+        conn.commit()
+    except pymysql.Error as e:
+        logging.error("order totals migration failed: {}".format(e))
+        conn.rollback()
+
+
+def _migrate_totals(conn, cursor, orders: str, details: str):
+    if "total_price" not in _columns(cursor, orders):
+        logging.info("add total_price and item_count to {}".format(orders))
+        cursor.execute(
+            "ALTER TABLE {} ADD COLUMN total_price BIGINT, "
+            "ADD COLUMN item_count INTEGER".format(orders)
+        )
+    # 以 total_price IS NULL 判断是否还需回填：ALTER 已隐式提交，回填中途失败时
+    # 下次启动从剩下的订单继续。按主键分批，每批一个事务；没有明细的订单总价为 0
+    last = ""
+    while True:
+        cursor.execute(
+            "SELECT order_id FROM {} WHERE total_price IS NULL AND order_id > %s "
+            "ORDER BY order_id LIMIT %s".format(orders),
+            (last, BATCH_SIZE),
+        )
+        order_ids = [row[0] for row in cursor.fetchall()]
+        if len(order_ids) == 0:
+            break
+        in_list = ", ".join(["%s"] * len(order_ids))
+        cursor.execute(
+            "UPDATE {0} o LEFT JOIN ("
+            "SELECT order_id, SUM(price * count) AS total, SUM(count) AS n "
+            "FROM {1} WHERE order_id IN ({2}) GROUP BY order_id"
+            ") d ON d.order_id = o.order_id "
+            "SET o.total_price = COALESCE(d.total, 0), o.item_count = COALESCE(d.n, 0) "
+            "WHERE o.order_id IN ({2})".format(orders, details, in_list),
+            tuple(order_ids) + tuple(order_ids),
+        )
+        conn.commit()
+        last = order_ids[-1]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    store.init_database(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
@@ -0,0 +1,58 @@
+import pymysql
+import base64
+import hashlib
+from be.model import error
+from be.model import db_conn
+from be import tracing
+
+
+@tracing.trace_methods
+class Picture(db_conn.DBConn):
+    def __init__(self):
+        db_conn.DBConn.__init__(self)
+
+    def get_picture(self, picture_id: str) -> (int, str, bytes):
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                "SELECT data FROM book_picture WHERE picture_id = %s", (picture_id,)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return error.error_non_exist_picture_id(picture_id) + (b"",)
+        except pymysql.Error as e:
+            return 528, "{}".format(str(e)), b""
+        except BaseException as e:
+            return 530, "{}".format(str(e)), b""
+        return 200, "ok", row[0]
+
+
+def store_pictures(cursor, infos: [dict]):
+    # 图片按内容哈希去重存入 book_picture，book_info 中只保留哈希引用
+    blobs = {}
+    for info in infos:
+        # 已经是 picture_ids 形式的书籍信息保持不变
+        if "pictures" not in info:
+            continue
+        picture_ids = []
+        for picture in info.pop("pictures") or []:
+            data = base64.b64decode(picture)
+            picture_id = hashlib.sha256(data).hexdigest()
+            blobs[picture_id] = data
+            picture_ids.append(picture_id)
+        info["picture_ids"] = picture_ids
+    if len(blobs) == 0:
+        return
+    cursor.execute(
+        "SELECT picture_id FROM book_picture WHERE picture_id IN ({})".format(
+            ", ".join(["%s"] * len(blobs))
+        ),
+        tuple(blobs.keys()),
+    )
+    for row in cursor.fetchall():
+        blobs.pop(row[0], None)
+    if len(blobs) > 0:
+        cursor.executemany(
+            "INSERT IGNORE INTO book_picture(picture_id, data) VALUES (%s, %s)",
+            list(blobs.items()),
+        )
@@ -1,9 +1,24 @@
 import pymysql
+import json
 import time
+from be.model import archive
 from be.model import error
 from be.model import db_conn
+from be import tracing
+from be.model import picture
 
 
+# 卖家订单列表每页最多返回的条数
+MAX_ORDER_PAGE = 100
+# 批量发货一次最多处理的订单数
+MAX_SHIP_BATCH = 500
+ORDER_COLUMNS = (
+    "order_id, user_id, status, created_at, paid_at, shipped_at, received_at, "
+    "cancel_reason, total_price, item_count"
+)
+
+
+@tracing.trace_methods
 class Seller(db_conn.DBConn):
     def __init__(self):
         db_conn.DBConn.__init__(self)
@@ -24,46 +39,52 @@ class Seller(db_conn.DBConn):
             if self.book_id_exist(store_id, book_id):
                 return error.error_exist_book_id(book_id)
 
-            self.conn.cursor().execute(
-                "INSERT into store(store_id, book_id, book_info, stock_level)"
-                "VALUES (%s, %s, %s, %s)",
-                (store_id, book_id, book_json_str, stock_level),
+            info = json.loads(book_json_str)
+            self._add_catalog(
+                [(store_id, book_id, info, stock_level)], self.conn.cursor()
+            )
+            self.conn.commit()
+        except pymysql.Error as e:
+            return 528, "{}".format(str(e))
+        except BaseException as e:
+            return 530, "{}".format(str(e))
+        return 200, "ok"
+
+    def add_books(self, user_id: str, store_id: str, books: [(str, str, int)]):
+        # books: [(book_id, book_json_str, stock_level)]，整批在一个事务内写入
+        try:
+            if not self.user_id_exist(user_id):
+                return error.error_non_exist_user_id(user_id)
+            if not self.store_id_exist(store_id):
+                return error.error_non_exist_store_id(store_id)
+            if len(books) == 0:
+                return 200, "ok"
+
+            book_ids = []
+            for book_id, _, _ in books:
+                if not book_id:
+                    return error.error_and_message(530, "invalid book_info")
+                if book_id in book_ids:
+                    return error.error_exist_book_id(book_id)
+                book_ids.append(book_id)
+            cursor = self.conn.cursor()
+            cursor.execute(
+                "SELECT book_id FROM store WHERE store_id = %s AND book_id IN ({})".format(
+                    ", ".join(["%s"] * len(book_ids))
+                ),
+                (store_id, *book_ids),
+            )
+            row = cursor.fetchone()
+            if row is not None:
+                return error.error_exist_book_id(row[0])
+
+            self._add_catalog(
+                [
+                    (store_id, book_id, json.loads(book_json_str), stock_level)
+                    for book_id, book_json_str, stock_level in books
+                ],
+                cursor,
             )
-            # 维护搜索表，抽取可索引字段
-            try:
-                import json
-
-                info = json.loads(book_json_str)
-                tags = info.get("tags", [])
-                if isinstance(tags, str):
-                    tags_text = tags
-                else:
-                    tags_text = " ".join(tags)
-                catalog = info.get("catalog", "")
-
-                # SQLite 的 INSERT OR REPLACE 改为 MySQL 的 REPLACE INTO
-                self.conn.cursor().execute(
-                    "REPLACE INTO book_search("
-                    "store_id, book_id, title, author, publisher, original_title, "
-                    "translator, book_intro, content, catalog, tags_text)"
-                    "VALUES(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-                    (
-                        store_id,
-                        book_id,
-                        info.get("title", ""),
-                        info.get("author", ""),
-                        info.get("publisher", ""),
-                        info.get("original_title", ""),
-                        info.get("translator", ""),
-                        info.get("book_intro", ""),
-                        info.get("content", ""),
-                        catalog,
-                        tags_text,
-                    ),
-                )
-            except Exception as e:
-                # 搜索表非核心流程，异常不影响主事务
-                pass
             self.conn.commit()
         except pymysql.Error as e:
             return 528, "{}".format(str(e))
@@ -71,6 +92,53 @@ class Seller(db_conn.DBConn):
             return 530, "{}".format(str(e))
         return 200, "ok"
 
+    def _add_catalog(self, rows: [(str, str, dict, int)], cursor):
+        # rows: [(store_id, book_id, info, stock_level)]
+        # 书籍元数据只在全局目录 book 中保存一份（已存在时保留原有信息），
+        # store 中只保存库存、价格与上架状态
+        book_ids = list({book_id: None for _, book_id, _, _ in rows}.keys())
+        cursor.execute(
+            "SELECT book_id FROM book WHERE book_id IN ({})".format(
+                ", ".join(["%s"] * len(book_ids))
+            ),
+            tuple(book_ids),
+        )
+        exist = set(row[0] for row in cursor.fetchall())
+        new_books = {}
+        for _, book_id, info, _ in rows:
+            if book_id not in exist and book_id not in new_books:
+                new_books[book_id] = info
+        if len(new_books) > 0:
+            picture.store_pictures(cursor, list(new_books.values()))
+            cursor.executemany(
+                "INSERT IGNORE INTO book(book_id, book_info) VALUES (%s, %s)",
+                [(book_id, json.dumps(info)) for book_id, info in new_books.items()],
+            )
+        cursor.executemany(
+            "INSERT into store(store_id, book_id, stock_level, price, status)"
+            "VALUES (%s, %s, %s, %s, %s)",
+            [
+                (store_id, book_id, stock_level, info.get("price"), "on_sale")
+                for store_id, book_id, info, stock_level in rows
+            ],
+        )
+        # 维护搜索表，抽取可索引字段；每本书只索引一次
+        if len(new_books) > 0:
+            try:
+                self._index_books(list(new_books.items()))
+            except Exception as e:
+                # 搜索表非核心流程，异常不影响主事务
+                pass
+
+    def _index_books(self, rows: [(str, dict)]):
+        self.conn.cursor().executemany(
+            "REPLACE INTO book_search("
+            "book_id, title, author, publisher, original_title, "
+            "translator, book_intro, content, catalog, tags_text)"
+            "VALUES(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            [search_row(book_id, info) for book_id, info in rows],
+        )
+
     def ship_order(self, user_id: str, store_id: str, order_id: str):
         try:
             if not self.user_id_exist(user_id):
@@ -105,6 +173,65 @@ class Seller(db_conn.DBConn):
             return 530, "{}".format(str(e))
         return 200, "ok"
 
+    def ship_orders(self, user_id: str, store_id: str, order_ids: [str]):
+        # 批量发货：只校验一次店铺归属，锁定这批订单后用一条 UPDATE 把已付款的订单改为已发货，
+        # 一次提交；返回每个订单的结果
+        try:
+            if not self.user_id_exist(user_id):
+                return error.error_non_exist_user_id(user_id) + ([],)
+            order_ids = list(dict.fromkeys(order_ids or []))
+            if len(order_ids) > MAX_SHIP_BATCH:
+                return error.error_and_message(
+                    530, "too many orders, at most {}".format(MAX_SHIP_BATCH)
+                ) + ([],)
+            cursor = self.conn.cursor()
+            err = self._check_store_owner(cursor, user_id, store_id)
+            if err is not None:
+                return err + ([],)
+            if len(order_ids) == 0:
+                return 200, "ok", []
+            return self.run_txn(
+                "ship_orders", self._ship_orders, store_id, order_ids
+            )
+        except pymysql.Error as e:
+            return 528, "{}".format(str(e)), []
+        except BaseException as e:
+            return 530, "{}".format(str(e)), []
+
+    def _ship_orders(self, store_id: str, order_ids: [str]):
+        cursor = self.conn.cursor()
+        in_list = ", ".join(["%s"] * len(order_ids))
+        # 按 order_id 顺序加锁，与其他修改订单的事务保持一致
+        cursor.execute(
+            "SELECT order_id, status FROM orders "
+            "WHERE store_id = %s AND order_id IN ({}) "
+            "ORDER BY order_id FOR UPDATE".format(in_list),
+            (store_id,) + tuple(order_ids),
+        )
+        statuses = dict(cursor.fetchall())
+        paid = [order_id for order_id in order_ids if statuses.get(order_id) == "paid"]
+        if len(paid) > 0:
+            cursor.execute(
+                "UPDATE orders SET status = %s, shipped_at = %s "
+                "WHERE store_id = %s AND status = %s AND order_id IN ({})".format(
+                    ", ".join(["%s"] * len(paid))
+                ),
+                ("shipped", time.time(), store_id, "paid") + tuple(paid),
+            )
+        self.conn.commit()
+
+        results = []
+        for order_id in order_ids:
+            status = statuses.get(order_id)
+            if status == "paid":
+                results.append({"order_id": order_id, "code": 200, "status": "shipped"})
+            else:
+                code, message = error.error_invalid_order_id(order_id)
+                results.append(
+                    {"order_id": order_id, "code": code, "message": message, "status": status}
+                )
+        return 200, "ok", results
+
     def add_stock_level(
             self, user_id: str, store_id: str, book_id: str, add_stock_level: int
     ):
@@ -128,6 +255,92 @@ class Seller(db_conn.DBConn):
             return 530, "{}".format(str(e))
         return 200, "ok"
 
+    def _check_store_owner(self, cursor, user_id: str, store_id: str):
+        # 店铺存在且属于 user_id 时返回 None，否则返回错误
+        cursor.execute("SELECT user_id FROM user_store WHERE store_id = %s", (store_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return error.error_non_exist_store_id(store_id)
+        if row[0] != user_id:
+            return error.error_authorization_fail()
+        return None
+
+    def list_orders(
+            self,
+            user_id: str,
+            store_id: str,
+            status: str = None,
+            start_time: float = None,
+            end_time: float = None,
+            after: dict = None,
+            limit: int = 20,
+    ):
+        # 按 (created_at, order_id) 升序做 keyset 分页；after 为上一页返回的 next
+        try:
+            cursor = self.conn.cursor()
+            err = self._check_store_owner(cursor, user_id, store_id)
+            if err is not None:
+                return err + ([], None)
+            limit = max(1, min(int(limit), MAX_ORDER_PAGE))
+
+            where = " WHERE store_id = %s"
+            params = [store_id]
+            if status:
+                where += " AND status = %s"
+                params.append(status)
+            if start_time is not None:
+                where += " AND created_at >= %s"
+                params.append(start_time)
+            if end_time is not None:
+                where += " AND created_at < %s"
+                params.append(end_time)
+            if after:
+                # 行比较与 (store_id, created_at, order_id) 索引的顺序一致，可以直接定位到上一页之后
+                where += " AND (created_at, order_id) > (%s, %s)"
+                params.extend([after["created_at"], after["order_id"]])
+            # 多取一条判断是否还有下一页
+            branch = "(SELECT {} FROM {{}}{} ORDER BY created_at, order_id LIMIT %s)".format(
+                ORDER_COLUMNS, where
+            )
+            params.append(limit + 1)
+            if status and status not in archive.TERMINAL_STATUSES:
+                query = branch.format("orders")
+            else:
+                query = "SELECT {} FROM ({} UNION ALL {}) t ORDER BY created_at, order_id LIMIT %s".format(
+                    ORDER_COLUMNS, branch.format("orders"), branch.format("orders_archive")
+                )
+                params = params + params + [limit + 1]
+            cursor.execute(query, tuple(params))
+            rows = cursor.fetchall()
+        except pymysql.Error as e:
+            return 528, "{}".format(str(e)), [], None
+        except BaseException as e:
+            return 530, "{}".format(str(e)), [], None
+
+        orders = []
+        for row in rows[:limit]:
+            orders.append(
+                {
+                    "order_id": row[0],
+                    "buyer_id": row[1],
+                    "status": row[2],
+                    "created_at": row[3],
+                    "paid_at": row[4],
+                    "shipped_at": row[5],
+                    "received_at": row[6],
+                    "cancel_reason": row[7],
+                    "total_price": row[8],
+                    "item_count": row[9],
+                }
+            )
+        next_after = None
+        if len(rows) > limit:
+            next_after = {
+                "created_at": orders[-1]["created_at"],
+                "order_id": orders[-1]["order_id"],
+            }
+        return 200, "ok", orders, next_after
+
     def create_store(self, user_id: str, store_id: str) -> (int, str):
         try:
             if not self.user_id_exist(user_id):
@@ -143,4 +356,24 @@ class Seller(db_conn.DBConn):
             return 528, "{}".format(str(e))
         except BaseException as e:
             return 530, "{}".format(str(e))
-        return 200, "ok"
\ No newline at end of file
+        return 200, "ok"
+
+
+def search_row(book_id: str, info: dict) -> tuple:
+    tags = info.get("tags", [])
+    if isinstance(tags, str):
+        tags_text = tags
+    else:
+        tags_text = " ".join(tags)
+    return (
+        book_id,
+        info.get("title", ""),
+        info.get("author", ""),
+        info.get("publisher", ""),
+        info.get("original_title", ""),
+        info.get("translator", ""),
+        info.get("book_intro", ""),
+        info.get("content", ""),
+        info.get("catalog", ""),
+        tags_text,
+    )
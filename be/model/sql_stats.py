@@ -0,0 +1,148 @@
+import json
+import logging
+import re
+import threading
+import time
+import pymysql
+from be import tracing
+
+# 执行时间超过该阈值（秒）的语句写入慢查询日志
+SLOW_QUERY_SECONDS = 0.2
+
+slow_query_logger = logging.getLogger("be.slow_query")
+
+_lock = threading.Lock()
+# 语句模板 -> [次数, 总耗时, 最大耗时, 影响/返回行数]
+_stats = {}
+_whitespace = re.compile(r"\s+")
+
+
+def _template(query: str) -> str:
+    # 语句本身就是带 %s 占位符的模板，只需规整空白；IN (%s, %s, ...) 折叠为一个
+    text = _whitespace.sub(" ", query).strip().rstrip(";")
+    return re.sub(r"\(\s*%s(\s*,\s*%s)+\s*\)", "(%s, ...)", text)
+
+
+def _redact(args) -> list:
+    # 慢查询日志中只记录参数的类型与长度，不记录值
+    if args is None:
+        return []
+    if isinstance(args, dict):
+        args = list(args.values())
+    if not isinstance(args, (list, tuple)):
+        args = [args]
+    redacted = []
+    for a in args:
+        if isinstance(a, (str, bytes)):
+            redacted.append("<{}:{}>".format(type(a).__name__, len(a)))
+        else:
+            redacted.append("<{}>".format(type(a).__name__))
+    return redacted
+
+
+def record(query: str, args, elapsed: float, rows: int, many: int = 0):
+    template = _template(query)
+    with _lock:
+        st = _stats.get(template)
+        if st is None:
+            st = [0, 0.0, 0.0, 0]
+            _stats[template] = st
+        st[0] += 1
+        st[1] += elapsed
+        if elapsed > st[2]:
+            st[2] = elapsed
+        if rows is not None and rows > 0:
+            st[3] += rows
+    if elapsed >= SLOW_QUERY_SECONDS:
+        entry = {
+            "event": "slow_query",
+            "statement": template,
+            "seconds": round(elapsed, 6),
+            "rows": rows,
+        }
+        if many:
+            entry["batch"] = many
+        else:
+            entry["params"] = _redact(args)
+        slow_query_logger.warning(json.dumps(entry, ensure_ascii=False))
+
+
+def top(n: int = 20, order: str = "total") -> [dict]:
+    key = {"total": 1, "count": 0, "max": 2, "rows": 3}.get(order, 1)
+    with _lock:
+        items = [(t, list(st)) for t, st in _stats.items()]
+    items.sort(key=lambda item: item[1][key], reverse=True)
+    return [
+        {
+            "statement": t,
+            "count": st[0],
+            "total_seconds": st[1],
+            "avg_seconds": st[1] / st[0] if st[0] else 0.0,
+            "max_seconds": st[2],
+            "rows": st[3],
+        }
+        for t, st in items[:n]
+    ]
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+class _Instrumented:
+    """记录每条语句模板的次数、耗时与行数的游标"""
+
+    _in_many = False
+
+    def execute(self, query, args=None):
+        if self._in_many:
+            return super().execute(query, args)
+        if tracing.is_sampled():
+            with tracing.span(_template(query), "sql"):
+                return self._timed_execute(query, args)
+        return self._timed_execute(query, args)
+
+    def _timed_execute(self, query, args):
+        before = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            record(query, args, time.perf_counter() - before, self._rowcount())
+
+    def _rowcount(self):
+        return self.rowcount
+
+    def executemany(self, query, args):
+        # executemany 内部会改写成多值语句或逐条调用 execute，整批按原模板记录一次
+        if tracing.is_sampled():
+            with tracing.span(_template(query), "sql", batch=len(args) if args else 0):
+                return self._timed_executemany(query, args)
+        return self._timed_executemany(query, args)
+
+    def _timed_executemany(self, query, args):
+        before = time.perf_counter()
+        self._in_many = True
+        try:
+            return super().executemany(query, args)
+        finally:
+            self._in_many = False
+            record(
+                query,
+                None,
+                time.perf_counter() - before,
+                self._rowcount(),
+                len(args) if args else 0,
+            )
+
+
+class InstrumentedCursor(_Instrumented, pymysql.cursors.Cursor):
+    pass
+
+
+class InstrumentedSSCursor(_Instrumented, pymysql.cursors.SSCursor):
+    # 不缓存结果集的游标，行在遍历时才从服务端读取；记录的耗时只包含发出语句到收到首个结果
+
+    def _rowcount(self):
+        # 执行后行数未知，pymysql 把 rowcount 设为 2**64 - 1，不能计入统计
+        return None
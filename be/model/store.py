@@ -2,6 +2,52 @@ import logging
 import os
 import pymysql
 import threading
+import weakref
+from be import metrics
+from be.model import sql_stats
+
+
+SEARCH_TABLE_DDL = (
+    "CREATE TABLE IF NOT EXISTS {}("
+    "book_id VARCHAR(255) PRIMARY KEY, "
+    "title TEXT, author TEXT, publisher TEXT, "
+    "original_title TEXT, translator TEXT, "
+    "book_intro TEXT, content TEXT, "
+    "catalog TEXT, tags_text TEXT)"
+)
+
+
+def create_indexes(cursor):
+    # 创建索引 (MySQL 语法)
+    # 注意：TEXT 类型做索引通常需要指定长度，或者使用全文索引
+    # 这里为了简单，我们只对 Text 的前 255 个字符建索引，或者依赖 LIKE 搜索
+    # 如果需要高性能全文搜索，可以使用 FULLTEXT 索引，这里暂按原逻辑保留普通索引尝试
+    # MySQL 对于 TEXT 列建索引必须指定长度
+    for ddl in [
+        "CREATE INDEX idx_book_search_title ON book_search(title(255))",
+        "CREATE INDEX idx_book_search_author ON book_search(author(255))",
+        "CREATE INDEX idx_book_search_tags ON book_search(tags_text(255))",
+        # 搜索结果按 book_id 关联在售店铺
+        "CREATE INDEX idx_store_book ON store(book_id)",
+        # 买家订单列表按时间倒序；归档任务按状态与时间挑选订单
+        "CREATE INDEX idx_orders_user ON orders(user_id, created_at)",
+        "CREATE INDEX idx_orders_status ON orders(status, created_at)",
+        # 卖家按店铺、状态、时间分页列出订单（InnoDB 二级索引隐含主键 order_id）
+        "CREATE INDEX idx_orders_store ON orders(store_id, status, created_at)",
+        "CREATE INDEX idx_orders_archive_store ON orders_archive(store_id, status, created_at)",
+        # 不按状态过滤时按 (created_at, order_id) 的 keyset 分页，索引直接提供顺序，不需要 filesort
+        "CREATE INDEX idx_orders_store_created ON orders(store_id, created_at, order_id)",
+        "CREATE INDEX idx_orders_archive_store_created "
+        "ON orders_archive(store_id, created_at, order_id)",
+        # 导出按下单时间范围扫描
+        "CREATE INDEX idx_orders_created ON orders(created_at)",
+        "CREATE INDEX idx_orders_archive_created ON orders_archive(created_at)",
+    ]:
+        try:
+            cursor.execute(ddl)
+        except Exception as e:
+            # 索引可能已存在，忽略错误
+            logging.info(f"Index creation info: {e}")
 
 
 class Store:
@@ -27,13 +73,20 @@ class Store:
                     "PRIMARY KEY(user_id, store_id));"
                 )
 
-                # 3. 店铺表 (存储书籍基本信息)
-                # book_info 是 JSON 字符串，MySQL 5.7+ 支持 JSON 类型，这里用 LONGTEXT 兼容性更好
+                # 3. 店铺表：每个店铺每本书一行库存，价格与上架状态；书籍元数据见 book
                 cursor.execute(
                     "CREATE TABLE IF NOT EXISTS store( "
                     "store_id VARCHAR(255), book_id VARCHAR(255), "
-                    "book_info LONGTEXT, stock_level INTEGER,"
-                    " PRIMARY KEY(store_id, book_id))"
+                    "stock_level INTEGER, price INTEGER, "
+                    "status VARCHAR(20) NOT NULL DEFAULT 'on_sale', "
+                    "PRIMARY KEY(store_id, book_id))"
+                )
+
+                # 3.1 全局书目表，每本书只保存一份元数据
+                # book_info 是 JSON 字符串，MySQL 5.7+ 支持 JSON 类型，这里用 LONGTEXT 兼容性更好
+                cursor.execute(
+                    "CREATE TABLE IF NOT EXISTS book( "
+                    "book_id VARCHAR(255) PRIMARY KEY, book_info LONGTEXT)"
                 )
 
                 # 4. 新订单表
@@ -57,7 +110,8 @@ class Store:
                     "order_id VARCHAR(255) PRIMARY KEY, user_id VARCHAR(255), "
                     "store_id VARCHAR(255), status VARCHAR(50), "
                     "created_at DOUBLE, paid_at DOUBLE, "
-                    "shipped_at DOUBLE, received_at DOUBLE, cancel_reason TEXT)"
+                    "shipped_at DOUBLE, received_at DOUBLE, cancel_reason TEXT, "
+                    "total_price BIGINT, item_count INTEGER)"
                 )
 
                 # 7. 历史订单详情表
@@ -68,30 +122,59 @@ class Store:
                     "PRIMARY KEY(order_id, book_id))"
                 )
 
-                # 8. 搜索专用表 (全文检索)
+                # 8. 搜索专用表 (全文检索)，每本书只索引一次，搜索时关联 store 得到在售店铺
+                cursor.execute(SEARCH_TABLE_DDL.format("book_search"))
+
+                # 9. 图片表，按内容的 sha256 去重，book.book_info 中只保存 picture_id
                 cursor.execute(
-                    "CREATE TABLE IF NOT EXISTS book_search("
-                    "store_id VARCHAR(255), book_id VARCHAR(255), "
-                    "title TEXT, author TEXT, publisher TEXT, "
-                    "original_title TEXT, translator TEXT, "
-                    "book_intro TEXT, content TEXT, "
-                    "catalog TEXT, tags_text TEXT, "
-                    "PRIMARY KEY(store_id, book_id))"
+                    "CREATE TABLE IF NOT EXISTS book_picture("
+                    "picture_id CHAR(64) PRIMARY KEY, data LONGBLOB)"
+                )
+
+                # 10. 幂等键表：同一用户同一接口的 Idempotency-Key 只执行一次，保存原始响应供重放
+                cursor.execute(
+                    "CREATE TABLE IF NOT EXISTS idempotency_key("
+                    "user_id VARCHAR(255), endpoint VARCHAR(64), idem_key VARCHAR(255), "
+                    "request_hash CHAR(64), status VARCHAR(16), "
+                    "code INTEGER, response LONGTEXT, expires_at DOUBLE, "
+                    "PRIMARY KEY(user_id, endpoint, idem_key), "
+                    "INDEX idx_idempotency_expires(expires_at))"
+                )
+
+                # 11. 归档订单表：已收货 / 已取消且超过保留期的订单由 archive.archive_orders 移入，
+                # 按下单月份 archive_month（YYYYMM）分区，分区在归档时按需添加
+                cursor.execute(
+                    "CREATE TABLE IF NOT EXISTS orders_archive( "
+                    "order_id VARCHAR(255), user_id VARCHAR(255), "
+                    "store_id VARCHAR(255), status VARCHAR(50), "
+                    "created_at DOUBLE, paid_at DOUBLE, "
+                    "shipped_at DOUBLE, received_at DOUBLE, cancel_reason TEXT, "
+                    "total_price BIGINT, item_count INTEGER, "
+                    "archive_month INTEGER NOT NULL, "
+                    "PRIMARY KEY(order_id, archive_month), "
+                    "INDEX idx_orders_archive_user(user_id, created_at)) "
+                    "PARTITION BY RANGE (archive_month) "
+                    "(PARTITION pmax VALUES LESS THAN MAXVALUE)"
+                )
+
+                # 12. 归档订单详情表，与 orders_archive 按相同月份分区
+                cursor.execute(
+                    "CREATE TABLE IF NOT EXISTS orders_detail_archive( "
+                    "order_id VARCHAR(255), book_id VARCHAR(255), "
+                    "count INTEGER, price INTEGER, "
+                    "archive_month INTEGER NOT NULL, "
+                    "PRIMARY KEY(order_id, book_id, archive_month)) "
+                    "PARTITION BY RANGE (archive_month) "
+                    "(PARTITION pmax VALUES LESS THAN MAXVALUE)"
+                )
+
+                # 13. 已完成的数据迁移，启动时跳过，见 migrate
+                cursor.execute(
+                    "CREATE TABLE IF NOT EXISTS schema_migration("
+                    "name VARCHAR(64) PRIMARY KEY, finished_at DOUBLE)"
                 )
 
-                # 创建索引 (MySQL 语法)
-                # 注意：TEXT 类型做索引通常需要指定长度，或者使用全文索引
-                # 这里为了简单，我们只对 Text 的前 255 个字符建索引，或者依赖 LIKE 搜索
-                # 如果需要高性能全文搜索，可以使用 FULLTEXT 索引，这里暂按原逻辑保留普通索引尝试
-                # MySQL 对于 TEXT 列建索引必须指定长度
-                try:
-                    cursor.execute("CREATE INDEX idx_book_search_title ON book_search(title(255))")
-                    cursor.execute("CREATE INDEX idx_book_search_author ON book_search(author(255))")
-                    cursor.execute("CREATE INDEX idx_book_search_tags ON book_search(tags_text(255))")
-                except Exception as e:
-                    # 索引可能已存在，忽略错误
-                    logging.info(f"Index creation info: {e}")
-                    pass
+                create_indexes(cursor)
 
             conn.commit()
         except pymysql.Error as e:
@@ -99,6 +182,14 @@ class Store:
             # conn.rollback() # 刚连接可能还没事务，视情况而定
 
     def get_db_conn(self) -> pymysql.connections.Connection:
+        conn = self._connect()
+        metrics.db_connections_total.inc()
+        metrics.db_connections_open.inc()
+        # 连接对象被回收时底层 socket 随之关闭
+        weakref.finalize(conn, metrics.db_connections_open.dec)
+        return conn
+
+    def _connect(self) -> pymysql.connections.Connection:
         # === 配置你的 MySQL 连接信息 ===
         return pymysql.connect(
             host='localhost',
@@ -106,7 +197,8 @@ class Store:
             password='123456',  # 你的 MySQL 密码
             database='bookstore',  # 你的数据库名
             charset='utf8mb4',
-            autocommit=False  # 保持手动 commit，符合原有逻辑
+            autocommit=False,  # 保持手动 commit，符合原有逻辑
+            cursorclass=sql_stats.InstrumentedCursor  # 统计每条语句的次数与耗时
         )
 
 
@@ -117,6 +209,15 @@ init_completed_event = threading.Event()
 def init_database(db_path):
     global database_instance
     database_instance = Store(db_path)
+    # 旧版本的库（store 中保存 book_info）在启动时迁移为全局书目 + 库存
+    from be.model import migrate
+
+    conn = database_instance.get_db_conn()
+    try:
+        migrate.migrate_catalog(conn)
+        migrate.migrate_order_totals(conn)
+    finally:
+        conn.close()
 
 
 def get_db_conn():
@@ -3,6 +3,7 @@ import logging
 import pymysql # 改用 pymysql
 from be.model import error
 from be.model import db_conn
+from be import tracing
 
 # 由于测试只需要校验 token 是否匹配并在有效期内，无需引入外部 JWT 依赖，
 # 直接用“随机串:时间戳”的格式生成、校验 token。
@@ -19,6 +20,7 @@ def jwt_decode(encoded_token: str, user_id: str) -> dict:
         raise ValueError("invalid token format")
 
 
+@tracing.trace_methods
 class User(db_conn.DBConn):
     token_lifetime: int = 3600  # 3600 second
 
@@ -0,0 +1,181 @@
+import collections
+import marshal
+import sys
+import threading
+import time
+import tracemalloc
+
+# 按需开启的采样 CPU 分析器与 tracemalloc 快照；未开启时不做任何事，对请求路径没有开销
+
+
+class SamplingProfiler:
+    """定时抓取所有线程的调用栈，输出 collapsed stack 格式（flamegraph.pl 可直接使用）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.interval = 0.005
+        self.started_at = None
+        self.stopped_at = None
+
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, seconds: float = 30.0, interval: float = 0.005) -> bool:
+        with self.lock:
+            if self.running():
+                return False
+            self.stacks = collections.Counter()
+            self.samples = 0
+            self.interval = interval
+            self.started_at = time.time()
+            self.stopped_at = None
+            self.stop_event = threading.Event()
+            self.thread = threading.Thread(
+                target=self._run,
+                args=(seconds, interval),
+                name="sampling-profiler",
+                daemon=True,
+            )
+            self.thread.start()
+            return True
+
+    def stop(self):
+        thread = self.thread
+        if thread is not None:
+            self.stop_event.set()
+            thread.join()
+
+    def wait(self):
+        thread = self.thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self, seconds: float, interval: float):
+        me = threading.get_ident()
+        deadline = time.time() + seconds
+        while not self.stop_event.is_set() and time.time() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+            self.samples = self.samples + 1
+            self.stop_event.wait(interval)
+        self.stopped_at = time.time()
+
+    def collapsed(self) -> str:
+        # 每行为 “根;...;叶 采样次数”
+        return "".join(
+            "{} {}\n".format(
+                ";".join("{} ({}:{})".format(f[2], f[0], f[1]) for f in stack), n
+            )
+            for stack, n in self.stacks.most_common()
+        )
+
+    def pstats(self) -> bytes:
+        # 由采样结果估算 pstats 数据（marshal 格式，可用 pstats.Stats(path) 读取）：
+        # 叶子函数累计自身时间，栈上每个函数累计总时间，时间 = 采样次数 * 采样间隔
+        stats = {}
+        for stack, n in self.stacks.items():
+            seen = set()
+            for i, func in enumerate(stack):
+                cc, nc, tt, ct, callers = stats.get(func, (0, 0, 0.0, 0.0, {}))
+                leaf = i == len(stack) - 1
+                if leaf:
+                    tt = tt + n * self.interval
+                if func not in seen:
+                    seen.add(func)
+                    cc = cc + n
+                    ct = ct + n * self.interval
+                nc = nc + n
+                if i > 0:
+                    caller = stack[i - 1]
+                    c = callers.get(caller, (0, 0, 0.0, 0.0))
+                    callers[caller] = (
+                        c[0] + n,
+                        c[1] + n,
+                        c[2] + (n * self.interval if leaf else 0.0),
+                        c[3] + n * self.interval,
+                    )
+                stats[func] = (cc, nc, tt, ct, callers)
+        return marshal.dumps(stats)
+
+
+cpu_profiler = SamplingProfiler()
+
+MEMORY_GROUPS = ("lineno", "filename", "traceback")
+
+_memory_lock = threading.Lock()
+_last_snapshot = None
+
+
+def memory_snapshot(top: int = 30, group: str = "lineno", frames: int = 10) -> [dict]:
+    # 第一次调用时才开启 tracemalloc；返回当前分配最多的位置，并作为下次 diff 的基线
+    global _last_snapshot
+    if group not in MEMORY_GROUPS:
+        group = "lineno"
+    with _memory_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        snapshot = _take_snapshot()
+        _last_snapshot = snapshot
+    return [
+        {"location": _location(stat.traceback), "size": stat.size, "count": stat.count}
+        for stat in snapshot.statistics(group)[:top]
+    ]
+
+
+def memory_diff(top: int = 30, group: str = "lineno") -> [dict]:
+    # 与上一次快照比较，返回增长最多的位置，并把本次快照作为新的基线
+    global _last_snapshot
+    if group not in MEMORY_GROUPS:
+        group = "lineno"
+    with _memory_lock:
+        if not tracemalloc.is_tracing() or _last_snapshot is None:
+            return None
+        snapshot = _take_snapshot()
+        stats = snapshot.compare_to(_last_snapshot, group)
+        _last_snapshot = snapshot
+    return [
+        {
+            "location": _location(stat.traceback),
+            "size_diff": stat.size_diff,
+            "size": stat.size,
+            "count_diff": stat.count_diff,
+        }
+        for stat in stats[:top]
+    ]
+
+
+def _take_snapshot():
+    # 排除 tracemalloc 自身的分配
+    return tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),)
+    )
+
+
+def _location(traceback) -> str:
+    return " <- ".join(
+        "{}:{}".format(frame.filename, frame.lineno) for frame in traceback
+    )
+
+
+def memory_tracing() -> bool:
+    return tracemalloc.is_tracing()
+
+
+def memory_stop():
+    global _last_snapshot
+    with _memory_lock:
+        _last_snapshot = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
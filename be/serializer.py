@@ -0,0 +1,95 @@
+import decimal
+import json
+from flask import Response
+from flask import request
+from be import metrics
+
+# 所有视图的响应统一经 respond() 编码：有 orjson 时用 orjson，否则用标准库 json；
+# 请求头 Accept 含 application/msgpack 且装有 msgpack 时返回 MessagePack
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+# 部分客户端使用的旧名称
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, "application/x-msgpack")
+
+
+def _default(obj):
+    # 与 jsonify 一致，Decimal（如 MySQL 的 SUM 结果）编码为字符串
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    raise TypeError("Object of type {} is not serializable".format(type(obj).__name__))
+
+
+def _json_dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(
+        obj, ensure_ascii=False, separators=(",", ":"), default=_default
+    ).encode("utf-8")
+
+
+def _msgpack_dumps(obj) -> bytes:
+    return msgpack.packb(obj, use_bin_type=True, default=_default)
+
+
+# mimetype -> 编码函数；按注册顺序参与内容协商，第一个为默认格式
+serializers = {JSON_MIMETYPE: _json_dumps}
+if msgpack is not None:
+    serializers[MSGPACK_MIMETYPE] = _msgpack_dumps
+
+
+def register(mimetype: str, dumps):
+    serializers[mimetype] = dumps
+
+
+def dumps(obj, mimetype: str = JSON_MIMETYPE) -> bytes:
+    return serializers[mimetype](obj)
+
+
+class Encoded:
+    """预先编码的响应体：同一个对象反复返回时（如缓存的结果）每种格式只编码一次"""
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.cache = {}
+
+    def get(self, mimetype: str) -> bytes:
+        data = self.cache.get(mimetype)
+        if data is None:
+            metrics.cache_miss("encoded_response")
+            data = dumps(self.obj, mimetype)
+            self.cache[mimetype] = data
+        else:
+            metrics.cache_hit("encoded_response")
+        return data
+
+
+def negotiate() -> str:
+    # 按 Accept 中的 q 值选择格式（q=0 表示不接受）；质量相同时优先 JSON
+    candidates = list(serializers)
+    if MSGPACK_MIMETYPE in serializers:
+        candidates.append(MSGPACK_MIMETYPES[1])
+    best = request.accept_mimetypes.best_match(candidates, default=JSON_MIMETYPE)
+    if best in MSGPACK_MIMETYPES:
+        return MSGPACK_MIMETYPE
+    return best
+
+
+def respond(obj) -> Response:
+    mimetype = negotiate()
+    if isinstance(obj, Encoded):
+        data = obj.get(mimetype)
+    else:
+        data = dumps(obj, mimetype)
+    response = Response(data, mimetype=mimetype)
+    response.vary.add("Accept")
+    return response
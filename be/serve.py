@@ -6,6 +6,12 @@ from flask import request
 from be.view import auth
 from be.view import seller
 from be.view import buyer
+from be.view import book
+from be.view import metrics as metrics_view
+from be.view import admin
+from be import compression
+from be import metrics
+from be import tracing
 from be.model.store import init_database, init_completed_event
 
 bp_shutdown = Blueprint("shutdown", __name__)
@@ -24,11 +30,35 @@ def be_shutdown():
     return "Server shutting down..."
 
 
+def create_app() -> Flask:
+    app = Flask(__name__)
+    app.register_blueprint(bp_shutdown)
+    app.register_blueprint(auth.bp_auth)
+    app.register_blueprint(seller.bp_seller)
+    app.register_blueprint(buyer.bp_buyer)
+    app.register_blueprint(book.bp_book)
+    app.register_blueprint(metrics_view.bp_metrics)
+    app.register_blueprint(admin.bp_admin)
+    metrics.init_app(app)
+    tracing.init_app(app)
+    compression.init_app(app)
+    return app
+
+
+def be_init() -> Flask:
+    # 初始化数据库并创建 app，不启动 HTTP 服务；进程内测试客户端也使用它
+    this_path = os.path.dirname(__file__)
+    parent_path = os.path.dirname(this_path)
+    init_database(parent_path)
+    app = create_app()
+    init_completed_event.set()
+    return app
+
+
 def be_run():
     this_path = os.path.dirname(__file__)
     parent_path = os.path.dirname(this_path)
     log_file = os.path.join(parent_path, "app.log")
-    init_database(parent_path)
 
     logging.basicConfig(filename=log_file, level=logging.ERROR)
     handler = logging.StreamHandler()
@@ -38,10 +68,5 @@ def be_run():
     handler.setFormatter(formatter)
     logging.getLogger().addHandler(handler)
 
-    app = Flask(__name__)
-    app.register_blueprint(bp_shutdown)
-    app.register_blueprint(auth.bp_auth)
-    app.register_blueprint(seller.bp_seller)
-    app.register_blueprint(buyer.bp_buyer)
-    init_completed_event.set()
+    app = be_init()
     app.run()
@@ -0,0 +1,155 @@
+import contextvars
+import functools
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+
+# 每个请求一个 trace id：优先取请求头 X-Trace-Id，否则生成，并通过响应头返回。
+# 被采样的请求记录视图、模型方法和 SQL 的嵌套耗时，以 Chrome Trace Event（JSON 数组）格式
+# 追加写入 TRACE_FILE，可直接用 chrome://tracing 或 Perfetto 打开
+TRACE_HEADER = "X-Trace-Id"
+SAMPLE_RATE = float(os.environ.get("BOOKSTORE_TRACE_SAMPLE_RATE", "0.01"))
+TRACE_FILE = os.environ.get(
+    "BOOKSTORE_TRACE_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "trace.json"),
+)
+
+_current = contextvars.ContextVar("bookstore_trace", default=None)
+_valid_trace_id = re.compile(r"^[0-9A-Za-z_-]{1,64}$")
+_file_lock = threading.Lock()
+
+
+class Trace:
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.events = []
+        self.tid = threading.get_ident()
+
+
+def current_trace_id() -> str:
+    trace = _current.get()
+    return trace.trace_id if trace is not None else ""
+
+
+def is_sampled() -> bool:
+    trace = _current.get()
+    return trace is not None and trace.sampled
+
+
+def start_trace(trace_id: str = None, sampled: bool = None):
+    if not trace_id or not _valid_trace_id.match(trace_id):
+        trace_id = uuid.uuid4().hex
+    if sampled is None:
+        sampled = random.random() < SAMPLE_RATE
+    trace = Trace(trace_id, sampled)
+    return trace, _current.set(trace)
+
+
+def end_trace(token):
+    trace = _current.get()
+    _current.reset(token)
+    if trace is not None and trace.sampled and trace.events:
+        export(trace)
+    return trace
+
+
+class span:
+    """记录一段耗时；当前请求未被采样时几乎没有开销"""
+
+    def __init__(self, name: str, cat: str = "app", **args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.trace = None
+
+    def __enter__(self):
+        trace = _current.get()
+        if trace is not None and trace.sampled:
+            self.trace = trace
+            self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.trace is not None:
+            end = time.time()
+            args = dict(self.args)
+            args["trace_id"] = self.trace.trace_id
+            if exc_type is not None:
+                args["error"] = exc_type.__name__
+            self.trace.events.append(
+                {
+                    "name": self.name,
+                    "cat": self.cat,
+                    "ph": "X",
+                    "ts": int(self.start * 1e6),
+                    "dur": int((end - self.start) * 1e6),
+                    "pid": os.getpid(),
+                    "tid": self.trace.tid,
+                    "args": args,
+                }
+            )
+        return False
+
+
+def trace_methods(cls):
+    # 为模型类的公有方法加上 span
+    for name, fn in list(vars(cls).items()):
+        if name.startswith("_") or not callable(fn):
+            continue
+        setattr(cls, name, _traced(fn, "{}.{}".format(cls.__name__, name)))
+    return cls
+
+
+def _traced(fn, name):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span(name, "model"):
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def export(trace: Trace, path: str = None):
+    path = path or TRACE_FILE
+    # JSON 数组格式允许省略结尾的 ]，因此可以一直追加
+    with _file_lock:
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, "a", encoding="utf-8") as f:
+            if new_file:
+                f.write("[\n")
+            for event in sorted(trace.events, key=lambda e: e["ts"]):
+                f.write(json.dumps(event, ensure_ascii=False) + ",\n")
+
+
+def init_app(app):
+    from flask import g
+    from flask import request
+
+    @app.before_request
+    def _trace_before():
+        trace, token = start_trace(request.headers.get(TRACE_HEADER))
+        g.trace_token = token
+        g.trace_span = span("{} {}".format(request.method, request.path), "view")
+        g.trace_span.__enter__()
+
+    @app.after_request
+    def _trace_after(response):
+        s = g.get("trace_span")
+        if s is not None:
+            s.args["status"] = response.status_code
+        response.headers[TRACE_HEADER] = current_trace_id()
+        return response
+
+    @app.teardown_request
+    def _trace_teardown(exc):
+        s = g.pop("trace_span", None)
+        if s is not None:
+            s.__exit__(type(exc) if exc is not None else None, exc, None)
+        token = g.pop("trace_token", None)
+        if token is not None:
+            end_trace(token)
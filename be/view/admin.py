@@ -0,0 +1,172 @@
+import os
+import pymysql
+from flask import Blueprint
+from flask import Response
+from flask import request
+from be.serializer import Encoded
+from be.serializer import respond
+from be import profiler
+from be.model import archive
+from be.model import error
+from be.model import export
+from be.model import sql_stats
+from be.model import store
+
+bp_admin = Blueprint("admin", __name__, url_prefix="/admin")
+
+# 设置了 BOOKSTORE_ADMIN_TOKEN 时，管理接口要求请求头 admin-token 与之相同；
+# 未设置时默认拒绝。本地开发与测试可以设置 BOOKSTORE_ADMIN_ALLOW_LOCAL=1 允许本机访问，
+# 服务在反向代理之后时不能开启（所有请求都来自本机）
+ADMIN_TOKEN_ENV = "BOOKSTORE_ADMIN_TOKEN"
+ADMIN_ALLOW_LOCAL_ENV = "BOOKSTORE_ADMIN_ALLOW_LOCAL"
+# 单次 CPU 采样的最长时间（秒）
+MAX_PROFILE_SECONDS = 300
+
+_code, _message = error.error_authorization_fail()
+# 拒绝访问的响应体固定不变，只编码一次
+_authorization_fail = Encoded({"message": _message})
+
+
+def is_admin() -> bool:
+    admin_token = os.environ.get(ADMIN_TOKEN_ENV)
+    if admin_token:
+        return request.headers.get("admin-token") == admin_token
+    if os.environ.get(ADMIN_ALLOW_LOCAL_ENV) == "1":
+        return request.remote_addr in ("127.0.0.1", "::1")
+    return False
+
+
+@bp_admin.before_request
+def check_admin():
+    if not is_admin():
+        return respond(_authorization_fail), _code
+
+
+@bp_admin.route("/sql_stats", methods=["GET"])
+def get_sql_stats():
+    top = request.args.get("top", 20, type=int)
+    order = request.args.get("order", "total")
+    return respond({"message": "ok", "statements": sql_stats.top(top, order)}), 200
+
+
+@bp_admin.route("/sql_stats/reset", methods=["POST"])
+def reset_sql_stats():
+    sql_stats.reset()
+    return respond({"message": "ok"}), 200
+
+
+def _profile_args():
+    seconds = min(request.args.get("seconds", 30, type=float), MAX_PROFILE_SECONDS)
+    interval = max(request.args.get("interval", 0.005, type=float), 0.001)
+    return seconds, interval
+
+
+def _profile_result():
+    fmt = request.args.get("format", "collapsed")
+    if fmt == "pstats":
+        return Response(
+            profiler.cpu_profiler.pstats(),
+            mimetype="application/octet-stream",
+            headers={"Content-Disposition": "attachment; filename=profile.pstats"},
+        )
+    return Response(profiler.cpu_profiler.collapsed(), mimetype="text/plain")
+
+
+@bp_admin.route("/archive_orders", methods=["POST"])
+def archive_orders():
+    days = request.args.get("days", archive.RETENTION_DAYS, type=float)
+    batch = request.args.get("batch", archive.BATCH_SIZE, type=int)
+    store_id = request.args.get("store_id")
+    conn = store.get_db_conn()
+    try:
+        n = archive.archive_orders(conn, days, batch, store_id)
+    except pymysql.Error as e:
+        return respond({"message": str(e)}), 528
+    finally:
+        conn.close()
+    return respond({"message": "ok", "archived": n}), 200
+
+
+def _export(kind: str):
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in export.FORMATS:
+        code, message = error.error_and_message(530, "unknown format {}".format(fmt))
+        return respond({"message": message}), code
+    chunks = export.export(
+        kind,
+        fmt,
+        request.args.get("store_id"),
+        request.args.get("start_time", type=float),
+        request.args.get("end_time", type=float),
+    )
+    # 生成器不依赖请求上下文，由 WSGI 服务器按块（chunked）发送
+    return Response(
+        chunks,
+        mimetype=export.MIMETYPES[fmt],
+        headers={
+            "Content-Disposition": "attachment; filename={}.{}".format(kind, fmt)
+        },
+    )
+
+
+@bp_admin.route("/export/orders", methods=["GET"])
+def export_orders():
+    return _export("orders")
+
+
+@bp_admin.route("/export/inventory", methods=["GET"])
+def export_inventory():
+    return _export("inventory")
+
+
+@bp_admin.route("/profile/cpu", methods=["GET"])
+def profile_cpu():
+    # 阻塞采样 seconds 秒后直接返回结果
+    seconds, interval = _profile_args()
+    if not profiler.cpu_profiler.start(seconds, interval):
+        code, message = error.error_and_message(409, "profiler already running")
+        return respond({"message": message}), code
+    profiler.cpu_profiler.wait()
+    return _profile_result()
+
+
+@bp_admin.route("/profile/cpu/start", methods=["POST"])
+def profile_cpu_start():
+    # 后台采样，最多 seconds 秒后自动停止，结果由 /profile/cpu/stop 取回
+    seconds, interval = _profile_args()
+    if not profiler.cpu_profiler.start(seconds, interval):
+        code, message = error.error_and_message(409, "profiler already running")
+        return respond({"message": message}), code
+    return respond({"message": "ok"}), 200
+
+
+@bp_admin.route("/profile/cpu/stop", methods=["POST"])
+def profile_cpu_stop():
+    profiler.cpu_profiler.stop()
+    return _profile_result()
+
+
+@bp_admin.route("/profile/memory/snapshot", methods=["POST"])
+def profile_memory_snapshot():
+    top = request.args.get("top", 30, type=int)
+    group = request.args.get("group", "lineno")
+    frames = request.args.get("frames", 10, type=int)
+    stats = profiler.memory_snapshot(top, group, frames)
+    return respond({"message": "ok", "stats": stats}), 200
+
+
+@bp_admin.route("/profile/memory/diff", methods=["GET"])
+def profile_memory_diff():
+    top = request.args.get("top", 30, type=int)
+    group = request.args.get("group", "lineno")
+    stats = profiler.memory_diff(top, group)
+    if stats is None:
+        code, message = error.error_and_message(409, "no memory snapshot taken")
+        return respond({"message": message}), code
+    return respond({"message": "ok", "stats": stats}), 200
+
+
+@bp_admin.route("/profile/memory/stop", methods=["POST"])
+def profile_memory_stop():
+    profiler.memory_stop()
+    return respond({"message": "ok"}), 200
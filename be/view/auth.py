@@ -1,6 +1,6 @@
 from flask import Blueprint
 from flask import request
-from flask import jsonify
+from be.serializer import respond
 from be.model import user
 
 bp_auth = Blueprint("auth", __name__, url_prefix="/auth")
@@ -15,7 +15,7 @@ def login():
     code, message, token = u.login(
         user_id=user_id, password=password, terminal=terminal
     )
-    return jsonify({"message": message, "token": token}), code
+    return respond({"message": message, "token": token}), code
 
 
 @bp_auth.route("/logout", methods=["POST"])
@@ -24,7 +24,7 @@ def logout():
     token: str = request.headers.get("token")
     u = user.User()
     code, message = u.logout(user_id=user_id, token=token)
-    return jsonify({"message": message}), code
+    return respond({"message": message}), code
 
 
 @bp_auth.route("/register", methods=["POST"])
@@ -33,7 +33,7 @@ def register():
     password = request.json.get("password", "")
     u = user.User()
     code, message = u.register(user_id=user_id, password=password)
-    return jsonify({"message": message}), code
+    return respond({"message": message}), code
 
 
 @bp_auth.route("/unregister", methods=["POST"])
@@ -42,7 +42,7 @@ def unregister():
     password = request.json.get("password", "")
     u = user.User()
     code, message = u.unregister(user_id=user_id, password=password)
-    return jsonify({"message": message}), code
+    return respond({"message": message}), code
 
 
 @bp_auth.route("/password", methods=["POST"])
@@ -54,4 +54,4 @@ def change_password():
     code, message = u.change_password(
         user_id=user_id, old_password=old_password, new_password=new_password
     )
-    return jsonify({"message": message}), code
+    return respond({"message": message}), code
@@ -0,0 +1,41 @@
+from flask import Blueprint
+from flask import request
+from flask import make_response
+from be.serializer import respond
+from be.model.picture import Picture
+from be import metrics
+
+bp_book = Blueprint("book", __name__, url_prefix="/book")
+
+# 图片按内容哈希寻址，内容不会改变，允许客户端长期缓存
+PICTURE_MAX_AGE = 365 * 24 * 3600
+
+
+def _guess_mimetype(data: bytes) -> str:
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data.startswith(b"GIF8"):
+        return "image/gif"
+    return "application/octet-stream"
+
+
+@bp_book.route("/picture/<picture_id>", methods=["GET"])
+def get_picture(picture_id: str):
+    etag = '"{}"'.format(picture_id)
+    cache_control = "public, max-age={}, immutable".format(PICTURE_MAX_AGE)
+    if request.headers.get("If-None-Match") == etag:
+        metrics.conditional_get_total.inc("picture", "not_modified")
+        response = make_response("", 304)
+    else:
+        metrics.conditional_get_total.inc("picture", "full")
+        p = Picture()
+        code, message, data = p.get_picture(picture_id)
+        if code != 200:
+            return respond({"message": message}), code
+        response = make_response(data, 200)
+        response.headers["Content-Type"] = _guess_mimetype(data)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
@@ -1,10 +1,59 @@
+import hashlib
+import json
+import logging
+import pymysql
 from flask import Blueprint
 from flask import request
-from flask import jsonify
+from be.serializer import respond
 from be.model.buyer import Buyer
+from be.model.user import User
+from be.model.idempotency import Idempotency
 
 bp_buyer = Blueprint("buyer", __name__, url_prefix="/buyer")
 
+# 带该请求头的 new_order / payment 请求，同一用户同一个键只执行一次，重复请求重放原响应
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def _idempotent(endpoint: str, user_id: str, handle, authorize=None):
+    # handle() 执行请求并返回 (响应体, 状态码)；authorize() 返回 (状态码, 消息)，
+    # 重放之前先重新鉴权，不参与摘要的凭据（密码）错误时不能拿到已保存的结果
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        body, code = handle()
+        return respond(body), code
+    # 同一个键必须对应相同的请求体；密码不参与摘要，因此 401 结果不保存
+    fields = {k: v for k, v in request.json.items() if k != "password"}
+    request_hash = hashlib.sha256(
+        json.dumps(fields, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    idem = Idempotency()
+    code, message, replay = idem.begin(user_id, endpoint, key, request_hash)
+    if code != 200:
+        return respond({"message": message}), code
+    if replay is not None:
+        if authorize is not None:
+            auth_code, auth_message = authorize()
+            if auth_code != 200:
+                return respond({"message": auth_message}), auth_code
+        code, body = replay
+        response = respond(body)
+        response.headers[REPLAYED_HEADER] = "true"
+        return response, code
+    body, code = handle()
+    finish_code, finish_message = idem.finish(
+        user_id, endpoint, key, request_hash, code, body
+    )
+    if finish_code != 200:
+        # 请求已经执行，照常返回结果；键保持占用直到 PENDING_TTL 过期
+        logging.error(
+            "idempotency key {} of {} {} not recorded: {}".format(
+                key, user_id, endpoint, finish_message
+            )
+        )
+    return respond(body), code
+
 
 @bp_buyer.route("/new_order", methods=["POST"])
 def new_order():
@@ -17,9 +66,12 @@ def new_order():
         count = book.get("count")
         id_and_count.append((book_id, count))
 
-    b = Buyer()
-    code, message, order_id = b.new_order(user_id, store_id, id_and_count)
-    return jsonify({"message": message, "order_id": order_id}), code
+    def handle():
+        b = Buyer()
+        code, message, order_id = b.new_order(user_id, store_id, id_and_count)
+        return {"message": message, "order_id": order_id}, code
+
+    return _idempotent("new_order", user_id, handle)
 
 
 @bp_buyer.route("/payment", methods=["POST"])
@@ -27,9 +79,19 @@ def payment():
     user_id: str = request.json.get("user_id")
     order_id: str = request.json.get("order_id")
     password: str = request.json.get("password")
-    b = Buyer()
-    code, message = b.payment(user_id, password, order_id)
-    return jsonify({"message": message}), code
+
+    def handle():
+        b = Buyer()
+        code, message = b.payment(user_id, password, order_id)
+        return {"message": message}, code
+
+    def authorize():
+        try:
+            return User().check_password(user_id, password)
+        except pymysql.Error as e:
+            return 528, "{}".format(str(e))
+
+    return _idempotent("payment", user_id, handle, authorize)
 
 
 @bp_buyer.route("/add_funds", methods=["POST"])
@@ -39,7 +101,7 @@ def add_funds():
     add_value = request.json.get("add_value")
     b = Buyer()
     code, message = b.add_funds(user_id, password, add_value)
-    return jsonify({"message": message}), code
+    return respond({"message": message}), code
 
 
 @bp_buyer.route("/cancel", methods=["POST"])
@@ -48,7 +110,7 @@ def cancel_order():
     order_id: str = request.json.get("order_id")
     b = Buyer()
     code, message = b.cancel_order(user_id, order_id)
-    return jsonify({"message": message}), code
+    return respond({"message": message}), code
 
 
 @bp_buyer.route("/orders", methods=["POST"])
@@ -57,9 +119,10 @@ def list_orders():
     status: str = request.json.get("status")
     page: int = request.json.get("page", 1)
     page_size: int = request.json.get("page_size", 10)
+    with_items: bool = bool(request.json.get("with_items", False))
     b = Buyer()
-    code, message, orders = b.list_orders(user_id, status, page, page_size)
-    return jsonify({"message": message, "orders": orders}), code
+    code, message, orders = b.list_orders(user_id, status, page, page_size, with_items)
+    return respond({"message": message, "orders": orders}), code
 
 
 @bp_buyer.route("/receive", methods=["POST"])
@@ -68,7 +131,7 @@ def receive_order():
     order_id: str = request.json.get("order_id")
     b = Buyer()
     code, message = b.receive_order(user_id, order_id)
-    return jsonify({"message": message}), code
+    return respond({"message": message}), code
 
 
 @bp_buyer.route("/search", methods=["POST"])
@@ -80,4 +143,4 @@ def search_book():
     page_size: int = request.json.get("page_size", 10)
     b = Buyer()
     code, message, books = b.search_book(keyword, scope, store_id, page, page_size)
-    return jsonify({"message": message, "books": books}), code
+    return respond({"message": message, "books": books}), code
@@ -0,0 +1,12 @@
+from flask import Blueprint
+from flask import Response
+from be import metrics
+
+bp_metrics = Blueprint("metrics", __name__)
+
+
+@bp_metrics.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(
+        metrics.registry.render(), mimetype="text/plain; version=0.0.4"
+    )
@@ -1,6 +1,7 @@
 from flask import Blueprint
 from flask import request
-from flask import jsonify
+from be.serializer import respond
+from be.model import error
 from be.model import seller
 import json
 
@@ -13,7 +14,7 @@ def seller_create_store():
     store_id: str = request.json.get("store_id")
     s = seller.Seller()
     code, message = s.create_store(user_id, store_id)
-    return jsonify({"message": message}), code
+    return respond({"message": message}), code
 
 
 @bp_seller.route("/add_book", methods=["POST"])
@@ -28,7 +29,32 @@ def seller_add_book():
         user_id, store_id, book_info.get("id"), json.dumps(book_info), stock_level
     )
 
-    return jsonify({"message": message}), code
+    return respond({"message": message}), code
+
+
+@bp_seller.route("/add_books", methods=["POST"])
+def seller_add_books():
+    user_id: str = request.json.get("user_id")
+    store_id: str = request.json.get("store_id")
+    books: [] = request.json.get("books", [])
+    if not isinstance(books, list):
+        code, message = error.error_and_message(530, "books must be a list")
+        return respond({"message": message}), code
+    id_info_and_stock = []
+    for book in books:
+        book_info = book.get("book_info") if isinstance(book, dict) else None
+        if not isinstance(book_info, dict) or not book_info.get("id"):
+            code, message = error.error_and_message(530, "invalid book_info")
+            return respond({"message": message}), code
+        stock_level = book.get("stock_level", 0)
+        id_info_and_stock.append(
+            (book_info.get("id"), json.dumps(book_info), stock_level)
+        )
+
+    s = seller.Seller()
+    code, message = s.add_books(user_id, store_id, id_info_and_stock)
+
+    return respond({"message": message}), code
 
 
 @bp_seller.route("/add_stock_level", methods=["POST"])
@@ -41,7 +67,7 @@ def add_stock_level():
     s = seller.Seller()
     code, message = s.add_stock_level(user_id, store_id, book_id, add_num)
 
-    return jsonify({"message": message}), code
+    return respond({"message": message}), code
 
 
 @bp_seller.route("/ship_order", methods=["POST"])
@@ -51,4 +77,30 @@ def ship_order():
     order_id: str = request.json.get("order_id")
     s = seller.Seller()
     code, message = s.ship_order(user_id, store_id, order_id)
-    return jsonify({"message": message}), code
+    return respond({"message": message}), code
+
+
+@bp_seller.route("/ship_orders", methods=["POST"])
+def ship_orders():
+    user_id: str = request.json.get("user_id")
+    store_id: str = request.json.get("store_id")
+    order_ids: [str] = request.json.get("order_ids", [])
+    s = seller.Seller()
+    code, message, results = s.ship_orders(user_id, store_id, order_ids)
+    return respond({"message": message, "results": results}), code
+
+
+@bp_seller.route("/orders", methods=["POST"])
+def list_orders():
+    user_id: str = request.json.get("user_id")
+    store_id: str = request.json.get("store_id")
+    status: str = request.json.get("status")
+    start_time: float = request.json.get("start_time")
+    end_time: float = request.json.get("end_time")
+    after: dict = request.json.get("after")
+    limit: int = request.json.get("limit", 20)
+    s = seller.Seller()
+    code, message, orders, next_after = s.list_orders(
+        user_id, store_id, status, start_time, end_time, after, limit
+    )
+    return respond({"message": message, "orders": orders, "next": next_after}), code
@@ -0,0 +1,48 @@
+import bisect
+import itertools
+import random
+
+
+class Chooser:
+    """在 [0, n) 中按给定分布选取下标，下标越小越“热”
+
+    支持的配置（dict）：
+    - {"dist": "uniform"}
+    - {"dist": "zipf", "s": 1.1}：第 k 个元素的概率正比于 1 / (k + 1) ** s
+    - {"dist": "hotset", "hot_fraction": 0.1, "hot_prob": 0.9}：
+      前 hot_fraction 的元素承担 hot_prob 的访问，其余均匀分担剩下的访问
+    """
+
+    def __init__(self, n: int, spec: dict = None):
+        self.n = n
+        self.spec = dict(spec or {"dist": "uniform"})
+        self.dist = self.spec.get("dist", "uniform")
+        self.cdf = None
+        if self.dist == "zipf":
+            s = float(self.spec.get("s", 1.0))
+            weights = [1.0 / (k + 1) ** s for k in range(n)]
+            self.cdf = list(itertools.accumulate(weights))
+        elif self.dist == "hotset":
+            self.hot_n = max(1, int(n * float(self.spec.get("hot_fraction", 0.1))))
+            self.hot_prob = float(self.spec.get("hot_prob", 0.9))
+        elif self.dist != "uniform":
+            raise ValueError("unknown distribution {}".format(self.dist))
+
+    def choose(self) -> int:
+        if self.dist == "zipf":
+            x = random.random() * self.cdf[-1]
+            return min(bisect.bisect_left(self.cdf, x), self.n - 1)
+        if self.dist == "hotset" and self.hot_n < self.n:
+            if random.random() < self.hot_prob:
+                return random.randrange(self.hot_n)
+            return random.randrange(self.hot_n, self.n)
+        return random.randrange(self.n)
+
+    def describe(self) -> str:
+        if self.dist == "zipf":
+            return "zipf(s={})".format(self.spec.get("s", 1.0))
+        if self.dist == "hotset":
+            return "hotset({}/{})".format(
+                self.spec.get("hot_fraction", 0.1), self.spec.get("hot_prob", 0.9)
+            )
+        return "uniform"
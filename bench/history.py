@@ -0,0 +1,124 @@
+import json
+import os
+import statistics
+import subprocess
+import time
+
+_project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+DEFAULT_RESULT_PATH = os.path.join(_project_root, "bench_results.jsonl")
+
+# 相对基线均值允许的吞吐下降比例与 p95 延迟上升比例
+TPS_TOLERANCE = 0.2
+LATENCY_TOLERANCE = 0.3
+# 与基线均值的偏离还须超过 Z_SCORE 倍标准差才算显著
+Z_SCORE = 2.0
+# 参与比较的基线最多取最近的几次，操作样本数少于 MIN_COUNT 时不比较
+BASELINE_WINDOW = 5
+MIN_COUNT = 30
+
+
+def git_revision() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=_project_root,
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+        if out.returncode == 0:
+            return out.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return "unknown"
+
+
+def make_record(result: dict, label: str = "") -> dict:
+    return {
+        "time": time.time(),
+        "revision": git_revision(),
+        "label": label,
+        "config": result["config"],
+        "elapsed": result["elapsed"],
+        "ops": result["ops"],
+    }
+
+
+def save(record: dict, path: str = DEFAULT_RESULT_PATH):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, sort_keys=True) + "\n")
+
+
+def load(path: str = DEFAULT_RESULT_PATH) -> [dict]:
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+def find_baseline(record: dict, records: [dict], baseline: str = "last") -> [dict]:
+    # 只与配置相同的历史结果比较；baseline 为 last 时取最近几次，
+    # 否则取 label 相同或 revision 以其为前缀的结果
+    same = [r for r in records if r["config"] == record["config"]]
+    if baseline != "last":
+        same = [
+            r
+            for r in same
+            if r.get("label") == baseline or r["revision"].startswith(baseline)
+        ]
+    return same[-BASELINE_WINDOW:]
+
+
+def _significant(value: float, samples: [float], tolerance: float, higher_is_worse):
+    mean = statistics.mean(samples)
+    std = statistics.stdev(samples) if len(samples) > 1 else 0.0
+    if higher_is_worse:
+        return value > mean * (1 + tolerance) and value > mean + Z_SCORE * std
+    return value < mean * (1 - tolerance) and value < mean - Z_SCORE * std
+
+
+def compare(
+    record: dict,
+    baselines: [dict],
+    tps_tolerance: float = TPS_TOLERANCE,
+    latency_tolerance: float = LATENCY_TOLERANCE,
+) -> [str]:
+    regressions = []
+    if len(baselines) == 0:
+        return regressions
+    for name, st in sorted(record["ops"].items()):
+        base = [b["ops"][name] for b in baselines if name in b["ops"]]
+        base = [b for b in base if b["count"] >= MIN_COUNT]
+        if st["count"] < MIN_COUNT or len(base) == 0:
+            continue
+        tps = [b["tps"] for b in base]
+        if _significant(st["tps"], tps, tps_tolerance, False):
+            regressions.append(
+                "{} tps {:.1f} < baseline {:.1f}".format(
+                    name, st["tps"], statistics.mean(tps)
+                )
+            )
+        p95 = [b["p95"] for b in base]
+        if _significant(st["p95"], p95, latency_tolerance, True):
+            regressions.append(
+                "{} p95 {:.4f} > baseline {:.4f}".format(
+                    name, st["p95"], statistics.mean(p95)
+                )
+            )
+    return regressions
+
+
+def check(
+    record: dict,
+    records: [dict],
+    baseline: str = "last",
+    tps_tolerance: float = TPS_TOLERANCE,
+    latency_tolerance: float = LATENCY_TOLERANCE,
+) -> [str]:
+    baselines = find_baseline(record, records, baseline)
+    return compare(record, baselines, tps_tolerance, latency_tolerance)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# 不经过 Flask 和 HTTP，直接调用 be.model 的微基准，用于区分模型层与传输层的开销
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import uuid
+from fe.access import book
+from be.model import store
+from be.model.user import User
+from be.model.buyer import Buyer
+from be.model.seller import Seller
+
+
+class MicroBench:
+    def __init__(self, book_num: int = 50, large: bool = False):
+        self.uuid = str(uuid.uuid1())
+        self.seller_id = "micro_seller_{}".format(self.uuid)
+        self.buyer_id = "micro_buyer_{}".format(self.uuid)
+        self.store_id = "micro_store_{}".format(self.uuid)
+        self.password = "micro_password"
+        self.book_num = book_num
+        self.large = large
+        self.book_ids = []
+        self.keywords = []
+        self.buyer = None
+        self.seller = None
+        self.n_added = 0
+
+    def seed(self):
+        if store.database_instance is None:
+            project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+            store.init_database(project_root)
+        u = User()
+        assert u.register(self.seller_id, self.password)[0] == 200
+        assert u.register(self.buyer_id, self.password)[0] == 200
+        self.seller = Seller()
+        self.buyer = Buyer()
+        assert self.seller.create_store(self.seller_id, self.store_id)[0] == 200
+        books = book.BookDB(self.large).get_book_info(0, self.book_num)
+        for bk in books:
+            code, _ = self.seller.add_book(
+                self.seller_id, self.store_id, bk.id, _to_json(bk), 10 ** 8
+            )
+            assert code == 200
+            self.book_ids.append(bk.id)
+            if bk.title:
+                self.keywords.append(bk.title.split(" ")[0])
+        if len(self.keywords) == 0:
+            self.keywords.append("book")
+        assert self.buyer.add_funds(self.buyer_id, self.password, 10 ** 12)[0] == 200
+
+    def _order(self, i: int):
+        book_id = self.book_ids[i % len(self.book_ids)]
+        code, _, order_id = self.buyer.new_order(
+            self.buyer_id, self.store_id, [(book_id, 1)]
+        )
+        assert code == 200
+        return order_id
+
+    def _next_book(self):
+        self.n_added = self.n_added + 1
+        bk = book.Book()
+        bk.id = "micro_{}_{}".format(self.uuid, self.n_added)
+        bk.title = "Micro Book {}".format(self.n_added)
+        bk.price = 100
+        return bk
+
+    def cases(self) -> dict:
+        # 名称 -> (setup(i) -> args, fn(*args) -> code)；只有 fn 计入耗时
+        return {
+            "new_order": (
+                lambda i: ([(self.book_ids[i % len(self.book_ids)], 1)],),
+                lambda items: self.buyer.new_order(
+                    self.buyer_id, self.store_id, items
+                )[0],
+            ),
+            "payment": (
+                lambda i: (self._order(i),),
+                lambda order_id: self.buyer.payment(
+                    self.buyer_id, self.password, order_id
+                )[0],
+            ),
+            "cancel_order": (
+                lambda i: (self._order(i),),
+                lambda order_id: self.buyer.cancel_order(self.buyer_id, order_id)[0],
+            ),
+            "search_book": (
+                lambda i: (self.keywords[i % len(self.keywords)],),
+                lambda keyword: self.buyer.search_book(keyword)[0],
+            ),
+            "list_orders": (
+                lambda i: (),
+                lambda: self.buyer.list_orders(self.buyer_id)[0],
+            ),
+            "add_book": (
+                lambda i: (self._next_book(),),
+                lambda bk: self.seller.add_book(
+                    self.seller_id, self.store_id, bk.id, _to_json(bk), 10
+                )[0],
+            ),
+        }
+
+    def run_case(self, name: str, warmup: int, repeat: int, number: int) -> dict:
+        setup, fn = self.cases()[name]
+        for i in range(0, warmup):
+            fn(*setup(i))
+        samples = []
+        failed = 0
+        for r in range(0, repeat):
+            elapsed = 0.0
+            for n in range(0, number):
+                args = setup(warmup + r * number + n)
+                before = time.perf_counter()
+                code = fn(*args)
+                elapsed = elapsed + time.perf_counter() - before
+                if code != 200:
+                    failed = failed + 1
+            samples.append(elapsed / number)
+        return summarize(samples, failed)
+
+    def run(self, names=None, warmup: int = 5, repeat: int = 5, number: int = 20):
+        results = {}
+        for name in names or self.cases().keys():
+            results[name] = self.run_case(name, warmup, repeat, number)
+            logging.info(
+                "MICRO={} MEAN:{:.6f} MEDIAN:{:.6f} MIN:{:.6f} STDEV:{:.6f} FAILED:{}".format(
+                    name,
+                    results[name]["mean"],
+                    results[name]["median"],
+                    results[name]["min"],
+                    results[name]["stdev"],
+                    results[name]["failed"],
+                )
+            )
+        return results
+
+
+def _to_json(bk: book.Book) -> str:
+    return json.dumps(bk.__dict__)
+
+
+def summarize(samples: [float], failed: int = 0) -> dict:
+    # samples 为每轮的单次调用平均耗时（秒）
+    return {
+        "rounds": len(samples),
+        "mean": statistics.mean(samples),
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "failed": failed,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="in-process be.model microbenchmarks")
+    parser.add_argument("cases", nargs="*", help="case names, default all")
+    parser.add_argument("--books", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    mb = MicroBench(args.books)
+    mb.seed()
+    results = mb.run(args.cases or None, args.warmup, args.repeat, args.number)
+    return 1 if any(r["failed"] for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
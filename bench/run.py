@@ -1,22 +1,153 @@
+#!/usr/bin/env python3
+import argparse
+import logging
+import multiprocessing
+import queue as queue_module
+import random
+import sys
+import time
+from fe import conf
+from fe.bench import history
 from fe.bench.workload import Workload
 from fe.bench.session import Session
 
+# 父进程等待子进程结果时检查子进程是否存活的间隔（秒）
+WORKER_POLL_INTERVAL = 1
 
-def run_bench():
-    wl = Workload()
-    wl.gen_database()
 
+def run_sessions(wl: Workload, session_num: int, barrier=None) -> (float, float):
     sessions = []
-    for i in range(0, wl.session):
+    for i in range(0, session_num):
         ss = Session(wl)
         sessions.append(ss)
 
+    # 所有进程都准备好会话（含登录）后再同时开始计时
+    if barrier is not None:
+        barrier.wait()
+    start = time.time()
     for ss in sessions:
         ss.start()
 
     for ss in sessions:
         ss.join()
+    return start, time.time()
+
+
+def bench_worker(dataset: dict, session_num: int, seed: int, barrier, queue):
+    random.seed(seed)
+    try:
+        wl = Workload(dataset["skew"])
+        wl.load_dataset(dataset)
+        start, end = run_sessions(wl, session_num, barrier)
+        queue.put((wl.op_stats, start, end))
+    except BaseException as e:
+        logging.error("bench worker failed: {}".format(e))
+        barrier.abort()
+        queue.put(None)
+
+
+def run_bench(skew: dict = None, process_num: int = None):
+    wl = Workload(skew)
+    wl.gen_database()
+
+    if process_num is None:
+        process_num = getattr(conf, "Process_Num", 1)
+    process_num = max(1, min(process_num, wl.session))
+    if process_num == 1:
+        start, end = run_sessions(wl, wl.session)
+        return make_result(wl, process_num, end - start)
+
+    # 多进程驱动：每个进程运行一部分会话，结果在父进程合并为一份报告
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(process_num)
+    queue = ctx.Queue()
+    dataset = wl.dataset()
+    workers = []
+    for i in range(0, process_num):
+        session_num = wl.session // process_num
+        if i < wl.session % process_num:
+            session_num = session_num + 1
+        p = ctx.Process(
+            target=bench_worker,
+            args=(dataset, session_num, random.random() + i, barrier, queue),
+        )
+        p.start()
+        workers.append(p)
+
+    results = _collect(queue, workers, barrier)
+    for p in workers:
+        p.join()
+    if any(r is None for r in results):
+        raise RuntimeError("bench worker failed")
+
+    for op_stats, start, end in results:
+        wl.update_op_stat(op_stats)
+    start = min(r[1] for r in results)
+    end = max(r[2] for r in results)
+    return make_result(wl, process_num, end - start)
+
+
+def _collect(queue, workers, barrier) -> list:
+    # 每个进程放入一个结果；进程异常退出（未放入结果）时中止其余进程，避免父进程一直等待
+    results = []
+    while len(results) < len(workers):
+        try:
+            results.append(queue.get(timeout=WORKER_POLL_INTERVAL))
+        except queue_module.Empty:
+            if any(p.exitcode not in (None, 0) for p in workers):
+                barrier.abort()
+                for p in workers:
+                    p.terminate()
+                    p.join()
+                raise RuntimeError("bench worker exited without result")
+    return results
+
+
+def make_result(wl: Workload, process_num: int, elapsed: float) -> dict:
+    config = wl.config()
+    config["process_num"] = process_num
+    return {"elapsed": elapsed, "config": config, "ops": wl.report(elapsed)}
+
+
+def run_skew_sweep(levels: [dict]) -> [dict]:
+    # 依次在每个倾斜程度下运行一次 bench，便于对比 new_order 的冲突率与重试率
+    results = []
+    for skew in levels:
+        results.append({"skew": skew, "summary": run_bench(skew)})
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="run bench and check for regressions")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--results", default=history.DEFAULT_RESULT_PATH)
+    parser.add_argument(
+        "--baseline", default="last", help="'last', a git revision prefix or a label"
+    )
+    parser.add_argument("--label", default="")
+    parser.add_argument("--tps-tolerance", type=float, default=history.TPS_TOLERANCE)
+    parser.add_argument(
+        "--latency-tolerance", type=float, default=history.LATENCY_TOLERANCE
+    )
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    result = run_bench(process_num=args.processes)
+    record = history.make_record(result, args.label)
+    regressions = history.check(
+        record,
+        history.load(args.results),
+        args.baseline,
+        args.tps_tolerance,
+        args.latency_tolerance,
+    )
+    if not args.no_save:
+        history.save(record, args.results)
+    for r in regressions:
+        logging.error("REGRESSION {}".format(r))
+    return 1 if regressions else 0
 
 
-# if __name__ == "__main__":
-#    run_bench()
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,11 @@
 from fe.bench.workload import Workload
 from fe.bench.workload import NewOrder
 from fe.bench.workload import Payment
+from fe.bench.workload import CancelOrder
+from fe.bench.workload import ShipOrder
+from fe.bench.workload import ReceiveOrder
+from fe.bench.stats import StatsTable
+from fe.access import transport
 import time
 import threading
 
@@ -9,39 +14,100 @@ class Session(threading.Thread):
     def __init__(self, wl: Workload):
         threading.Thread.__init__(self)
         self.workload = wl
-        self.new_order_request = []
-        self.payment_request = []
+        self.procedure = []
         self.payment_i = 0
         self.new_order_i = 0
         self.payment_ok = 0
         self.new_order_ok = 0
         self.time_new_order = 0
         self.time_payment = 0
+        # 依赖前序操作结果的订单池：(buyer, store_id, order_id)
+        self.pending_orders = []
+        self.paid_orders = []
+        self.shipped_orders = []
+        self.op_stats = StatsTable()
         self.thread = None
         self.gen_procedure()
 
     def gen_procedure(self):
+        # 不依赖其他订单的操作提前生成好（包括登录），依赖订单状态的操作只记录类型，
+        # 运行时从订单池中取订单
         for i in range(0, self.workload.procedure_per_session):
-            new_order = self.workload.get_new_order()
-            self.new_order_request.append(new_order)
+            op = self.workload.get_operation()
+            if op == "new_order":
+                self.procedure.append((op, self.workload.get_new_order()))
+            elif op == "search":
+                self.procedure.append((op, self.workload.get_search()))
+            elif op == "list_orders":
+                self.procedure.append((op, self.workload.get_list_orders()))
+            else:
+                self.procedure.append((op, None))
 
     def run(self):
         self.run_gut()
 
+    def bind(self, op, request):
+        if request is not None:
+            return request
+        if op == "payment" and self.pending_orders:
+            buyer, store_id, order_id = self.pending_orders.pop(0)
+            self.paid_orders.append((buyer, store_id, order_id))
+            return Payment(buyer, order_id)
+        if op == "cancel" and self.pending_orders:
+            buyer, store_id, order_id = self.pending_orders.pop()
+            return CancelOrder(buyer, order_id)
+        if op == "ship" and self.paid_orders:
+            buyer, store_id, order_id = self.paid_orders.pop(0)
+            self.shipped_orders.append((buyer, store_id, order_id))
+            return ShipOrder(self.workload.get_seller(store_id), store_id, order_id)
+        if op == "receive" and self.shipped_orders:
+            buyer, store_id, order_id = self.shipped_orders.pop(0)
+            return ReceiveOrder(buyer, order_id)
+        return None
+
     def run_gut(self):
-        for new_order in self.new_order_request:
+        for i, (op, request) in enumerate(self.procedure):
+            request = self.bind(op, request)
+            if request is None:
+                # 订单池中没有可用订单，记为跳过
+                self.op_stats.skip(op)
+                continue
+            wire_before, body_before = transport.received()
             before = time.time()
-            ok, order_id = new_order.run()
+            result = request.run()
             after = time.time()
-            self.time_new_order = self.time_new_order + after - before
-            self.new_order_i = self.new_order_i + 1
-            if ok:
-                self.new_order_ok = self.new_order_ok + 1
-                payment = Payment(new_order.buyer, order_id)
-                self.payment_request.append(payment)
-            if self.new_order_i % 100 ==0 or self.new_order_i == len(
-                self.new_order_request
-            ):
+            wire_after, body_after = transport.received()
+            if op == "new_order":
+                ok, order_id = result
+                new_order_stats = self.op_stats.get(op)
+                new_order_stats.conflicts += request.conflicts
+                new_order_stats.retries += request.retries
+                self.time_new_order = self.time_new_order + after - before
+                self.new_order_i = self.new_order_i + 1
+                if ok:
+                    self.new_order_ok = self.new_order_ok + 1
+                    self.pending_orders.append(
+                        (request.buyer, request.store_id, order_id)
+                    )
+            else:
+                ok = result
+                if op == "payment":
+                    self.time_payment = self.time_payment + after - before
+                    self.payment_i = self.payment_i + 1
+                    if ok:
+                        self.payment_ok = self.payment_ok + 1
+                    else:
+                        self.paid_orders.pop()
+                elif op == "ship" and not ok:
+                    self.shipped_orders.pop()
+            self.op_stats.record(
+                op,
+                ok,
+                after - before,
+                wire_after - wire_before,
+                body_after - body_before,
+            )
+            if (i + 1) % 100 == 0 or i + 1 == len(self.procedure):
                 self.workload.update_stat(
                     self.new_order_i,
                     self.payment_i,
@@ -50,12 +116,4 @@ class Session(threading.Thread):
                     self.time_new_order,
                     self.time_payment,
                 )
-                for payment in self.payment_request:
-                    before = time.time()
-                    ok = payment.run()
-                    after = time.time()
-                    self.time_payment = self.time_payment + after - before
-                    self.payment_i = self.payment_i + 1
-                    if ok:
-                        self.payment_ok = self.payment_ok + 1
-                self.payment_request = []
+        self.workload.update_op_stat(self.op_stats)
@@ -0,0 +1,118 @@
+import bisect
+
+# 延迟直方图的桶上界（秒），按约 1.25 倍递增，覆盖 0.1ms ~ 60s；
+# 固定桶便于多个线程/进程的直方图直接按位相加合并
+BUCKET_BOUNDS = []
+_b = 0.0001
+while _b < 60:
+    BUCKET_BOUNDS.append(round(_b, 6))
+    _b = _b * 1.25
+BUCKET_BOUNDS.append(float("inf"))
+
+
+class OpStats:
+    """单个操作类型的计数、耗时与延迟直方图"""
+
+    def __init__(self):
+        self.count = 0
+        self.ok = 0
+        # 依赖的订单不可用而未发出的请求数
+        self.skipped = 0
+        # 冲突（数据库锁冲突返回的 528）次数与客户端重试次数
+        self.conflicts = 0
+        self.retries = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.buckets = [0] * len(BUCKET_BOUNDS)
+        # 收到的响应字节数：线路上的（可能压缩）与解压后的
+        self.wire_bytes = 0
+        self.body_bytes = 0
+
+    def record(self, ok: bool, elapsed: float, wire_bytes: int = 0, body_bytes: int = 0):
+        self.count = self.count + 1
+        self.wire_bytes = self.wire_bytes + wire_bytes
+        self.body_bytes = self.body_bytes + body_bytes
+        if ok:
+            self.ok = self.ok + 1
+        self.total_time = self.total_time + elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, elapsed)] += 1
+
+    def merge(self, other: "OpStats"):
+        self.count = self.count + other.count
+        self.ok = self.ok + other.ok
+        self.skipped = self.skipped + other.skipped
+        self.conflicts = self.conflicts + other.conflicts
+        self.retries = self.retries + other.retries
+        self.total_time = self.total_time + other.total_time
+        self.max_time = max(self.max_time, other.max_time)
+        self.wire_bytes = self.wire_bytes + other.wire_bytes
+        self.body_bytes = self.body_bytes + other.body_bytes
+        for i, n in enumerate(other.buckets):
+            self.buckets[i] += n
+
+    def percentile(self, p: float) -> float:
+        if self.count == 0:
+            return 0.0
+        target = self.count * p / 100.0
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen = seen + n
+            if seen >= target and n > 0:
+                # 最后一个桶没有上界，用观测到的最大值代替
+                return min(BUCKET_BOUNDS[i], self.max_time)
+        return self.max_time
+
+    def summary(self, elapsed: float) -> dict:
+        attempts = self.count + self.retries
+        return {
+            "count": self.count,
+            "ok": self.ok,
+            "skipped": self.skipped,
+            "conflicts": self.conflicts,
+            "retries": self.retries,
+            "conflict_rate": self.conflicts / attempts if attempts else 0.0,
+            "retry_rate": self.retries / self.count if self.count else 0.0,
+            "tps": self.count / elapsed if elapsed > 0 else 0.0,
+            "avg": self.total_time / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max_time,
+            "wire_bytes": self.wire_bytes,
+            "body_bytes": self.body_bytes,
+            "avg_wire_bytes": self.wire_bytes / self.count if self.count else 0.0,
+            "compression_ratio": (
+                self.body_bytes / self.wire_bytes if self.wire_bytes else 0.0
+            ),
+        }
+
+
+class StatsTable:
+    """操作名 -> OpStats 的集合"""
+
+    def __init__(self):
+        self.ops = {}
+
+    def get(self, name: str) -> OpStats:
+        stats = self.ops.get(name)
+        if stats is None:
+            stats = OpStats()
+            self.ops[name] = stats
+        return stats
+
+    def record(
+        self, name: str, ok: bool, elapsed: float, wire_bytes: int = 0, body_bytes: int = 0
+    ):
+        self.get(name).record(ok, elapsed, wire_bytes, body_bytes)
+
+    def skip(self, name: str):
+        self.get(name).skipped += 1
+
+    def merge(self, other: "StatsTable"):
+        for name, stats in other.ops.items():
+            self.get(name).merge(stats)
+
+    def summary(self, elapsed: float) -> dict:
+        return {name: stats.summary(elapsed) for name, stats in sorted(self.ops.items())}
@@ -1,23 +1,62 @@
 import logging
+import time
 import uuid
 import random
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from fe.access import book
 from fe.access.new_seller import register_new_seller
 from fe.access.new_buyer import register_new_buyer
 from fe.access.buyer import Buyer
+from fe.access.seller import Seller
+from fe.bench.stats import StatsTable
+from fe.bench.distribution import Chooser
 from fe import conf
 
+# 各操作类型的默认权重，按线上流量比例：搜索与订单列表占大头
+DEFAULT_OP_WEIGHTS = {
+    "search": 40,
+    "list_orders": 20,
+    "new_order": 15,
+    "payment": 12,
+    "cancel": 3,
+    "ship": 6,
+    "receive": 4,
+}
+
+# 书籍、店铺、买家的选取分布，默认均匀；配置格式见 distribution.Chooser
+DEFAULT_SKEW = {
+    "book": {"dist": "uniform"},
+    "store": {"dist": "uniform"},
+    "buyer": {"dist": "uniform"},
+}
+
 
 class NewOrder:
     def __init__(self, buyer: Buyer, store_id, book_id_and_count):
         self.buyer = buyer
         self.store_id = store_id
         self.book_id_and_count = book_id_and_count
+        self.max_retry = getattr(conf, "New_Order_Retry", 3)
+        self.code = None
+        self.conflicts = 0
+        self.retries = 0
 
     def run(self) -> (bool, str):
-        code, order_id = self.buyer.new_order(self.store_id, self.book_id_and_count)
-        return code == 200, order_id
+        # 528 为数据库错误（死锁、锁等待超时等），视为冲突并退避重试；
+        # 各次重试使用同一个幂等键，已成功的下单不会被重复执行
+        idempotency_key = uuid.uuid4().hex
+        for attempt in range(0, self.max_retry + 1):
+            self.code, order_id = self.buyer.new_order(
+                self.store_id, self.book_id_and_count, idempotency_key
+            )
+            if self.code != 528:
+                break
+            self.conflicts = self.conflicts + 1
+            if attempt < self.max_retry:
+                self.retries = self.retries + 1
+                time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+        return self.code == 200, order_id
 
 
 class Payment:
@@ -30,13 +69,84 @@ class Payment:
         return code == 200
 
 
+class Search:
+    def __init__(self, buyer: Buyer, keyword, scope="global", store_id=None):
+        self.buyer = buyer
+        self.keyword = keyword
+        self.scope = scope
+        self.store_id = store_id
+
+    def run(self) -> bool:
+        code, _ = self.buyer.search(self.keyword, self.scope, self.store_id)
+        return code == 200
+
+
+class ListOrders:
+    def __init__(self, buyer: Buyer, status=None):
+        self.buyer = buyer
+        self.status = status
+
+    def run(self) -> bool:
+        code, _ = self.buyer.list_orders(self.status)
+        return code == 200
+
+
+class CancelOrder:
+    def __init__(self, buyer: Buyer, order_id):
+        self.buyer = buyer
+        self.order_id = order_id
+
+    def run(self) -> bool:
+        code = self.buyer.cancel_order(self.order_id)
+        return code == 200
+
+
+class ShipOrder:
+    def __init__(self, seller: Seller, store_id, order_id):
+        self.seller = seller
+        self.store_id = store_id
+        self.order_id = order_id
+
+    def run(self) -> bool:
+        code = self.seller.ship_order(self.store_id, self.order_id)
+        return code == 200
+
+
+class ReceiveOrder:
+    def __init__(self, buyer: Buyer, order_id):
+        self.buyer = buyer
+        self.order_id = order_id
+
+    def run(self) -> bool:
+        code = self.buyer.receive_order(self.order_id)
+        return code == 200
+
+
+class Progress:
+    def __init__(self, name: str, total: int):
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.step_size = max(1, total // 10)
+
+    def step(self):
+        self.done = self.done + 1
+        if self.done % self.step_size == 0 or self.done == self.total:
+            logging.info("load {}: {}/{}".format(self.name, self.done, self.total))
+
+
 class Workload:
-    def __init__(self):
+    def __init__(self, skew: dict = None):
         self.uuid = str(uuid.uuid1())
         self.book_ids = {}
         self.buyer_ids = []
         self.store_ids = []
-        self.book_db = book.BookDB(conf.Use_Large_DB)
+        self.store_owner = {}
+        self.buyers = {}
+        self.sellers = {}
+        self.book_db = book.BookDB(
+            conf.Use_Large_DB, getattr(conf, "Book_DB_Read_Only", None)
+        )
         self.row_count = self.book_db.get_book_count()
 
         self.book_num_per_store = conf.Book_Num_Per_Store
@@ -49,7 +159,21 @@ class Workload:
         self.stock_level = conf.Default_Stock_Level
         self.user_funds = conf.Default_User_Funds
         self.batch_size = conf.Data_Batch_Size
+        self.load_workers = getattr(conf, "Load_Workers", 8)
         self.procedure_per_session = conf.Request_Per_Session
+        self.op_weights = dict(getattr(conf, "Op_Weights", DEFAULT_OP_WEIGHTS))
+        # 搜索关键词语料：conf 中未配置时，在加载数据时从书名与标签中收集
+        self.search_keywords = list(getattr(conf, "Search_Keywords", []))
+        self._collect_keywords = len(self.search_keywords) == 0
+        self._keyword_set = set(self.search_keywords)
+        self.op_stats = StatsTable()
+        self.skew = dict(DEFAULT_SKEW)
+        self.skew.update(getattr(conf, "Skew", {}))
+        if skew:
+            self.skew.update(skew)
+        self.buyer_chooser = Chooser(self.buyer_num, self.skew["buyer"])
+        self.store_chooser = None
+        self.book_choosers = {}
 
         self.n_new_order = 0
         self.n_payment = 0
@@ -79,44 +203,163 @@ class Workload:
 
     def gen_database(self):
         logging.info("load data")
-        for i in range(1, self.seller_num + 1):
-            user_id, password = self.to_seller_id_and_password(i)
-            seller = register_new_seller(user_id, password)
-            for j in range(1, self.store_num_per_user + 1):
-                store_id = self.to_store_id(i, j)
-                code = seller.create_store(store_id)
-                assert code == 200
-                self.store_ids.append(store_id)
-                self.book_ids[store_id] = []
-                row_no = 0
-
-                while row_no < self.book_num_per_store:
-                    books = self.book_db.get_book_info(row_no, self.batch_size)
-                    if len(books) == 0:
-                        break
-                    for bk in books:
-                        code = seller.add_book(store_id, self.stock_level, bk)
-                        assert code == 200
-                        self.book_ids[store_id].append(bk.id)
-                    row_no = row_no + len(books)
-        logging.info("seller data loaded.")
-        for k in range(1, self.buyer_num + 1):
-            user_id, password = self.to_buyer_id_and_password(k)
-            buyer = register_new_buyer(user_id, password)
-            buyer.add_funds(self.user_funds)
-            self.buyer_ids.append(user_id)
+        # 所有店铺加载同一批书籍，只从 BookDB 读取一次
+        books = list(
+            self.book_db.iter_books(self.batch_size, self.book_num_per_store)
+        )
+        self.book_db.report()
+        if self._collect_keywords:
+            for bk in books:
+                self.add_keywords(bk)
+            # 全部收集完后只排序一次
+            self.search_keywords = sorted(self._keyword_set)
+
+        # id 只由编号决定，与并发完成顺序无关，保证多次运行数据一致
+        with ThreadPoolExecutor(self.load_workers) as pool:
+            sellers = list(
+                pool.map(self.load_seller, range(1, self.seller_num + 1))
+            )
+            stores = []
+            for i, seller in enumerate(sellers, 1):
+                for j in range(1, self.store_num_per_user + 1):
+                    store_id = self.to_store_id(i, j)
+                    stores.append((seller, store_id))
+                    self.store_ids.append(store_id)
+                    self.store_owner[store_id] = i
+                    self.book_ids[store_id] = [bk.id for bk in books]
+            progress = Progress("store", len(stores))
+            for _ in pool.map(
+                lambda item: self.load_store_books(item[0], item[1], books), stores
+            ):
+                progress.step()
+            logging.info("seller data loaded.")
+
+            progress = Progress("buyer", self.buyer_num)
+            for user_id in pool.map(self.load_buyer, range(1, self.buyer_num + 1)):
+                self.buyer_ids.append(user_id)
+                progress.step()
         logging.info("buyer data loaded.")
+        if len(self.search_keywords) == 0:
+            self.search_keywords = ["book"]
+        self.store_chooser = Chooser(len(self.store_ids), self.skew["store"])
+
+    def load_seller(self, no: int) -> Seller:
+        user_id, password = self.to_seller_id_and_password(no)
+        seller = register_new_seller(user_id, password)
+        for j in range(1, self.store_num_per_user + 1):
+            code = seller.create_store(self.to_store_id(no, j))
+            assert code == 200
+        return seller
+
+    def load_store_books(self, seller: Seller, store_id, books: [book.Book]):
+        for i in range(0, len(books), self.batch_size):
+            code = seller.add_books(
+                store_id, self.stock_level, books[i : i + self.batch_size]
+            )
+            assert code == 200
+
+    def load_buyer(self, no: int) -> str:
+        user_id, password = self.to_buyer_id_and_password(no)
+        buyer = register_new_buyer(user_id, password)
+        buyer.add_funds(self.user_funds)
+        return user_id
+
+    def dataset(self) -> dict:
+        # 已生成数据的快照，交给工作进程复用，避免重复加载
+        return {
+            "uuid": self.uuid,
+            "store_ids": self.store_ids,
+            "store_owner": self.store_owner,
+            "book_ids": self.book_ids,
+            "buyer_ids": self.buyer_ids,
+            "search_keywords": self.search_keywords,
+            "skew": self.skew,
+        }
+
+    def load_dataset(self, data: dict):
+        self.uuid = data["uuid"]
+        self.store_ids = data["store_ids"]
+        self.store_owner = data["store_owner"]
+        self.book_ids = data["book_ids"]
+        self.buyer_ids = data["buyer_ids"]
+        self.search_keywords = data["search_keywords"]
+        self.skew = data["skew"]
+        self.buyer_chooser = Chooser(self.buyer_num, self.skew["buyer"])
+        self.store_chooser = Chooser(len(self.store_ids), self.skew["store"])
+
+    def add_keywords(self, bk: book.Book):
+        # 只加入集合；search_keywords 由调用方在收集完后统一排序生成
+        if bk.title:
+            self._keyword_set.add(bk.title.split(" ")[0])
+        for tag in bk.tags:
+            self._keyword_set.add(tag.strip())
+        self._keyword_set.discard("")
+
+    def get_buyer(self, no: int) -> Buyer:
+        # 每个买家只登录一次，多个操作共用同一个访问对象
+        b = self.buyers.get(no)
+        if b is None:
+            buyer_id, buyer_password = self.to_buyer_id_and_password(no)
+            b = Buyer(url_prefix=conf.URL, user_id=buyer_id, password=buyer_password)
+            self.buyers[no] = b
+        return b
+
+    def get_seller(self, store_id) -> Seller:
+        no = self.store_owner[store_id]
+        s = self.sellers.get(no)
+        if s is None:
+            seller_id, seller_password = self.to_seller_id_and_password(no)
+            s = Seller(conf.URL, seller_id, seller_password)
+            self.sellers[no] = s
+        return s
+
+    def choose_buyer_no(self) -> int:
+        return self.buyer_chooser.choose() + 1
+
+    def choose_book_no(self, store_id) -> int:
+        # 各店铺按相同顺序加载书籍，因此热门书在每个店铺中都是相同的下标
+        n = len(self.book_ids[store_id])
+        chooser = self.book_choosers.get(n)
+        if chooser is None:
+            chooser = Chooser(n, self.skew["book"])
+            self.book_choosers[n] = chooser
+        return chooser.choose()
+
+    def describe_skew(self) -> str:
+        return "book={} store={} buyer={}".format(
+            Chooser(1, self.skew["book"]).describe(),
+            Chooser(1, self.skew["store"]).describe(),
+            self.buyer_chooser.describe(),
+        )
+
+    def get_operation(self) -> str:
+        names = [name for name, w in self.op_weights.items() if w > 0]
+        weights = [self.op_weights[name] for name in names]
+        return random.choices(names, weights)[0]
+
+    def get_search(self) -> Search:
+        b = self.get_buyer(self.choose_buyer_no())
+        keyword = random.choice(self.search_keywords)
+        # 约四分之一的搜索限定在单个店铺内
+        if random.random() < 0.25:
+            store_id = self.store_ids[self.store_chooser.choose()]
+            return Search(b, keyword, "store", store_id)
+        return Search(b, keyword)
+
+    def get_list_orders(self) -> ListOrders:
+        b = self.get_buyer(self.choose_buyer_no())
+        status = random.choice([None, None, "pending", "paid", "shipped"])
+        return ListOrders(b, status)
 
     def get_new_order(self) -> NewOrder:
-        n = random.randint(1, self.buyer_num)
-        buyer_id, buyer_password = self.to_buyer_id_and_password(n)
-        store_no = int(random.uniform(0, len(self.store_ids) - 1))
+        n = self.choose_buyer_no()
+        store_no = self.store_chooser.choose()
         store_id = self.store_ids[store_no]
         books = random.randint(1, 10)
         book_id_and_count = []
         book_temp = []
         for i in range(0, books):
-            book_no = int(random.uniform(0, len(self.book_ids[store_id]) - 1))
+            book_no = self.choose_book_no(store_id)
             book_id = self.book_ids[store_id][book_no]
             if book_id in book_temp:
                 continue
@@ -124,7 +367,7 @@ class Workload:
                 book_temp.append(book_id)
                 count = random.randint(1, 10)
                 book_id_and_count.append((book_id, count))
-        b = Buyer(url_prefix=conf.URL, user_id=buyer_id, password=buyer_password)
+        b = self.get_buyer(n)
         new_ord = NewOrder(b, store_id, book_id_and_count)
         return new_ord
 
@@ -192,3 +435,65 @@ class Workload:
         self.n_payment_past = self.n_payment
         self.n_new_order_ok_past = self.n_new_order_ok
         self.n_payment_ok_past = self.n_payment_ok
+
+    def update_op_stat(self, op_stats: StatsTable):
+        with self.lock:
+            self.op_stats.merge(op_stats)
+
+    def config(self) -> dict:
+        # 影响结果可比性的配置，随结果一起保存
+        return {
+            "large_db": conf.Use_Large_DB,
+            "seller_num": self.seller_num,
+            "store_num_per_user": self.store_num_per_user,
+            "book_num_per_store": self.book_num_per_store,
+            "buyer_num": self.buyer_num,
+            "session": self.session,
+            "request_per_session": self.procedure_per_session,
+            "op_weights": self.op_weights,
+            "skew": self.skew,
+        }
+
+    def report(self, elapsed: float) -> dict:
+        summary = self.op_stats.summary(elapsed)
+        logging.info("SKEW {}".format(self.describe_skew()))
+        for name, st in summary.items():
+            logging.info(
+                "OP={} N:{} OK:{} SKIP:{} TPS:{:.1f} AVG:{:.4f} P50:{:.4f} P95:{:.4f} P99:{:.4f} MAX:{:.4f}".format(
+                    name,
+                    st["count"],
+                    st["ok"],
+                    st["skipped"],
+                    st["tps"],
+                    st["avg"],
+                    st["p50"],
+                    st["p95"],
+                    st["p99"],
+                    st["max"],
+                )
+            )
+        wire = sum(st["wire_bytes"] for st in summary.values())
+        body = sum(st["body_bytes"] for st in summary.values())
+        for name, st in summary.items():
+            logging.info(
+                "BYTES OP={} WIRE:{} BODY:{} AVG_WIRE:{:.0f} RATIO:{:.2f}".format(
+                    name,
+                    st["wire_bytes"],
+                    st["body_bytes"],
+                    st["avg_wire_bytes"],
+                    st["compression_ratio"],
+                )
+            )
+        logging.info(
+            "BYTES TOTAL WIRE:{} BODY:{} RATIO:{:.2f}".format(
+                wire, body, body / wire if wire else 0.0
+            )
+        )
+        st = summary.get("new_order")
+        if st is not None:
+            logging.info(
+                "NEW_ORDER CONFLICT_RATE:{:.4f} RETRY_RATE:{:.4f} CONFLICTS:{} RETRIES:{}".format(
+                    st["conflict_rate"], st["retry_rate"], st["conflicts"], st["retries"]
+                )
+            )
+        return summary
@@ -1,5 +1,7 @@
 #!/bin/sh
 export PYTHONPATH=`pwd`
+# 测试会调用 /admin 接口，只允许本机访问
+export BOOKSTORE_ADMIN_ALLOW_LOCAL=1
 coverage run --timid --branch --source fe,be --concurrency=thread -m pytest -v --ignore=fe/data
 coverage combine
 coverage report
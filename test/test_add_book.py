@@ -3,6 +3,8 @@ import pytest
 from fe import conf
 from fe.access.new_seller import register_new_seller
 from fe.access import book
+from fe.access import transport
+from urllib.parse import urljoin
 import uuid
 
 
@@ -43,6 +45,29 @@ class TestAddBook:
             code = self.seller.add_book(self.store_id, 0, b)
             assert code != 200
 
+    def test_add_books_ok(self):
+        code = self.seller.add_books(self.store_id, 0, self.books)
+        assert code == 200
+
+    def test_add_books_error_exist_book_id(self):
+        code = self.seller.add_book(self.store_id, 0, self.books[0])
+        assert code == 200
+        code = self.seller.add_books(self.store_id, 0, self.books)
+        assert code != 200
+
+    def test_add_books_invalid_payload(self):
+        url = urljoin(self.seller.url_prefix, "add_books")
+        headers = {"token": self.seller.token}
+        for books in (
+            "not a list",
+            [{"stock_level": 1}],
+            [{"book_info": "not a dict"}],
+            [{"book_info": {"title": "no id"}}],
+        ):
+            json = {"user_id": self.seller_id, "store_id": self.store_id, "books": books}
+            r = transport.post(url, headers=headers, json=json)
+            assert r.status_code == 530
+
     def test_error_non_exist_user_id(self):
         for b in self.books:
             # non exist user id
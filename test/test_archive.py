@@ -0,0 +1,61 @@
+import uuid
+from urllib.parse import urljoin
+
+import pytest
+
+from fe import conf
+from fe.access import transport
+from fe.test.gen_book_data import GenBook
+from fe.access.new_buyer import register_new_buyer
+from be.model import archive
+
+
+class TestArchiveMonth:
+    def test_month_of(self):
+        assert archive.month_of(0) == 197001
+        assert archive.month_of(1767225600) == 202601
+        assert archive._next_month(202612) == 202701
+        assert archive._next_month(202603) == 202604
+
+
+class TestArchive:
+    @pytest.fixture(autouse=True)
+    def pre_run_initialization(self):
+        self.seller_id = "test_archive_seller_{}".format(str(uuid.uuid1()))
+        self.store_id = "test_archive_store_{}".format(str(uuid.uuid1()))
+        self.buyer_id = "test_archive_buyer_{}".format(str(uuid.uuid1()))
+        gen_book = GenBook(self.seller_id, self.store_id)
+        ok, self.buy_book_id_list = gen_book.gen(
+            non_exist_book_id=False, low_stock_level=False, max_book_count=5
+        )
+        assert ok
+        self.buyer = register_new_buyer(self.buyer_id, self.buyer_id)
+        yield
+
+    def test_list_orders_spans_archive(self):
+        code, cancelled_id = self.buyer.new_order(self.store_id, self.buy_book_id_list)
+        assert code == 200
+        assert self.buyer.cancel_order(cancelled_id) == 200
+        code, pending_id = self.buyer.new_order(self.store_id, self.buy_book_id_list)
+        assert code == 200
+
+        # 只归档本测试店铺的订单，不影响其他测试在共享数据库中创建的订单
+        r = transport.post(
+            urljoin(
+                conf.URL, "admin/archive_orders?days=0&store_id={}".format(self.store_id)
+            ),
+            json={},
+        )
+        assert r.status_code == 200
+        assert r.json()["archived"] == 1
+
+        code, orders = self.buyer.list_orders()
+        assert code == 200
+        assert [o["order_id"] for o in orders] == [pending_id, cancelled_id]
+        code, orders = self.buyer.list_orders(status="cancelled")
+        assert code == 200
+        assert [o["order_id"] for o in orders] == [cancelled_id]
+        code, orders = self.buyer.list_orders(page=2, page_size=1)
+        assert [o["order_id"] for o in orders] == [cancelled_id]
+        # 已归档的订单不能再修改
+        assert self.buyer.cancel_order(cancelled_id) != 200
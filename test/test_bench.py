@@ -1,8 +1,23 @@
+from fe import conf
+from fe.bench import history
 from fe.bench.run import run_bench
 
 
-def test_bench():
+def test_bench(tmp_path):
     try:
-        run_bench()
+        result = run_bench()
     except Exception as e:
         assert 200 == 100, "test_bench过程出现异常"
+
+    record = history.make_record(result)
+    # 基线从 Bench_Baseline_Path（默认为 bench.run 追加写入的历史文件）只读加载；
+    # 本次结果只写入 Bench_Result_Path，未配置时写入临时文件，不改动基线
+    baseline_path = getattr(conf, "Bench_Baseline_Path", history.DEFAULT_RESULT_PATH)
+    path = getattr(conf, "Bench_Result_Path", None) or str(
+        tmp_path / "bench_results.jsonl"
+    )
+    regressions = history.check(
+        record, history.load(baseline_path), getattr(conf, "Bench_Baseline", "last")
+    )
+    history.save(record, path)
+    assert regressions == [], "性能回退: {}".format("; ".join(regressions))
@@ -0,0 +1,41 @@
+from fe.bench import history
+
+
+def _record(tps: float, p95: float, count: int = 100, label: str = "") -> dict:
+    return {
+        "time": 0,
+        "revision": "abc123",
+        "label": label,
+        "config": {"session": 1},
+        "elapsed": 1.0,
+        "ops": {"new_order": {"count": count, "tps": tps, "p95": p95}},
+    }
+
+
+class TestBenchHistory:
+    def test_save_and_load(self, tmp_path):
+        path = str(tmp_path / "results.jsonl")
+        assert history.load(path) == []
+        history.save(_record(100, 0.01), path)
+        history.save(_record(110, 0.01), path)
+        records = history.load(path)
+        assert [r["ops"]["new_order"]["tps"] for r in records] == [100, 110]
+
+    def test_no_regression_within_noise(self):
+        records = [_record(100, 0.010), _record(104, 0.011), _record(96, 0.009)]
+        assert history.check(_record(90, 0.012), records) == []
+
+    def test_tps_and_latency_regression(self):
+        records = [_record(100, 0.010), _record(101, 0.010), _record(99, 0.010)]
+        regressions = history.check(_record(50, 0.030), records)
+        assert len(regressions) == 2
+
+    def test_baseline_filters(self):
+        records = [_record(100, 0.01, label="base"), _record(50, 0.01)]
+        other = _record(50, 0.01)
+        other["config"] = {"session": 2}
+        # 配置不同的结果不参与比较
+        assert history.check(other, records) == []
+        assert history.check(_record(50, 0.01), records, "base") != []
+        # 样本过少时不做判断
+        assert history.check(_record(50, 0.01, count=5), records, "base") == []
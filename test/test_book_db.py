@@ -0,0 +1,69 @@
+from fe import conf
+from fe.access import book
+
+
+class TestBookDB:
+    def test_iter_books_matches_paging(self):
+        db = book.BookDB(conf.Use_Large_DB)
+        count = min(db.get_book_count(), 120)
+        paged = []
+        while len(paged) < count:
+            batch = db.get_book_info(len(paged), min(7, count - len(paged)))
+            assert len(batch) > 0
+            paged.extend(batch)
+        streamed = list(db.iter_books(batch_size=7, limit=count))
+        assert [b.id for b in streamed] == [b.id for b in paged]
+        assert [b.id for b in streamed] == sorted(b.id for b in streamed)
+
+    def test_random_access_and_count(self):
+        db = book.BookDB(conf.Use_Large_DB)
+        count = db.get_book_count()
+        assert len(list(db.iter_books(batch_size=100))) == count
+        # 非顺序的 start 也要返回正确的页
+        first = db.get_book_info(0, 3)
+        third = db.get_book_info(2, 1)
+        assert third[0].id == first[2].id
+        db.close()
+
+    def test_read_only(self):
+        # 先以读写模式保证库已初始化
+        book.BookDB(conf.Use_Large_DB, read_only=False).close()
+        db = book.BookDB(conf.Use_Large_DB, read_only=True)
+        assert db.read_only
+        books = list(db.iter_books(batch_size=10, limit=20))
+        assert len(books) == min(20, db.get_book_count())
+        assert db.read_rows == len(books)
+        assert db.conn.execute("PRAGMA query_only").fetchone()[0] == 1
+        db.close()
+
+    def _pictures(self, db, start):
+        # 每本书的图片数量随机（可能为 0），多读几次直到带上图片
+        for _ in range(0, 50):
+            pictures = db.get_book_info(start, 1)[0].pictures
+            if len(pictures) > 0:
+                return pictures
+        raise AssertionError("no pictures returned")
+
+    def test_picture_encoded_once(self):
+        db = book.BookDB(conf.Use_Large_DB, read_only=False)
+        first, second = db.get_book_info(0, 2)
+        try:
+            # 同一连接内可以读到未提交的修改，测试结束后回滚，不改动数据文件
+            for b in (first, second):
+                db.conn.execute(
+                    "UPDATE book SET picture = ? WHERE id = ?", (b"\x89PNG-bytes", b.id)
+                )
+            a = self._pictures(db, 0)
+            assert a[0] == "iVBORy1ieXRlcw=="
+            # 不同书籍的相同图片共用同一个编码结果
+            hits = db.picture_cache_hits
+            assert self._pictures(db, 1)[0] is a[0]
+            assert db.picture_cache_hits > hits
+            # 图片内容变化后返回新的编码
+            db.conn.execute(
+                "UPDATE book SET picture = ? WHERE id = ?", (b"changed", first.id)
+            )
+            assert self._pictures(db, 0)[0] == "Y2hhbmdlZA=="
+        finally:
+            db.conn.rollback()
+            db.close()
@@ -0,0 +1,54 @@
+import gzip
+
+from flask import Flask
+from flask import Response
+
+from be import compression
+from fe.access import transport
+
+
+def _client(body: bytes, mimetype="application/json", streamed=False):
+    app = Flask(__name__)
+    compression.init_app(app)
+
+    @app.route("/body")
+    def view():
+        if streamed:
+            return Response((body[i:i + 1000] for i in range(0, len(body), 1000)), mimetype=mimetype)
+        return Response(body, mimetype=mimetype)
+
+    return app.test_client()
+
+
+class TestCompression:
+    def test_negotiate(self):
+        assert compression.negotiate("gzip, deflate") == "gzip"
+        assert compression.negotiate("gzip;q=0, identity") is None
+        assert compression.negotiate("") is None
+        assert compression.negotiate("*") in compression.compressors
+
+    def test_threshold_and_gzip(self):
+        small = _client(b'{"message":"ok"}')
+        r = small.get("/body", headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in r.headers
+        assert "Accept-Encoding" in r.headers.get("Vary")
+
+        body = b'{"books":"' + b"long book content " * 2000 + b'"}'
+        r = _client(body).get("/body", headers={"Accept-Encoding": "gzip"})
+        assert r.headers.get("Content-Encoding") == "gzip"
+        assert len(r.get_data()) < len(body)
+        assert gzip.decompress(r.get_data()) == body
+        assert transport.decompress("gzip", r.get_data()) == body
+
+        r = _client(body, mimetype="image/png").get("/body", headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in r.headers
+
+    def test_streamed(self, monkeypatch):
+        body = b"x" * 300000
+        monkeypatch.setattr(compression, "STREAM_SIZE", 1024)
+        r = _client(body).get("/body", headers={"Accept-Encoding": "gzip"})
+        assert r.headers.get("Content-Encoding") == "gzip"
+        assert gzip.decompress(r.get_data()) == body
+        r = _client(body, streamed=True).get("/body", headers={"Accept-Encoding": "gzip"})
+        assert r.headers.get("Content-Encoding") == "gzip"
+        assert gzip.decompress(r.get_data()) == body
@@ -0,0 +1,115 @@
+import csv
+import io
+import json
+import time
+import uuid
+from urllib.parse import urljoin
+
+import pytest
+
+from fe import conf
+from fe.access import book
+from fe.access import transport
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+from be.model import export
+
+
+def _order(order_id, items):
+    order = dict.fromkeys(export.ORDER_FIELDS)
+    order.update({"order_id": order_id, "archived": False, "items": items})
+    return order
+
+
+class TestExportEncode:
+    def test_ndjson_chunks(self, monkeypatch):
+        monkeypatch.setattr(export, "CHUNK_SIZE", 256)
+        item = {"book_id": "b", "count": 1, "price": 10}
+        records = [_order("o{}".format(i), [item]) for i in range(50)]
+        chunks = list(export.encode(iter(records), "ndjson", "orders"))
+        assert len(chunks) > 1
+        lines = b"".join(chunks).decode("utf-8").splitlines()
+        assert [json.loads(line)["order_id"] for line in lines] == [
+            r["order_id"] for r in records
+        ]
+
+    def test_csv_one_row_per_item(self):
+        records = [
+            _order(
+                "o1",
+                [
+                    {"book_id": "b1", "count": 1, "price": 10},
+                    {"book_id": "b2", "count": 2, "price": 20},
+                ],
+            ),
+            _order("o2", []),
+        ]
+        data = b"".join(export.encode(iter(records), "csv", "orders")).decode("utf-8")
+        rows = list(csv.DictReader(io.StringIO(data)))
+        assert [(r["order_id"], r["book_id"]) for r in rows] == [
+            ("o1", "b1"),
+            ("o1", "b2"),
+            ("o2", ""),
+        ]
+
+    def test_archive_join_prunes_partitions(self):
+        query, _ = export._order_query(
+            "orders_archive", "orders_detail_archive", True, None, None, None
+        )
+        assert "d.archive_month = o.archive_month" in query
+        query, _ = export._order_query("orders", "orders_detail", False, None, None, None)
+        assert "archive_month" not in query
+
+
+class TestExport:
+    @pytest.fixture(autouse=True)
+    def pre_run_initialization(self):
+        self.seller_id = "test_export_seller_{}".format(str(uuid.uuid1()))
+        self.store_id = "test_export_store_{}".format(str(uuid.uuid1()))
+        self.buyer_id = "test_export_buyer_{}".format(str(uuid.uuid1()))
+        self.seller = register_new_seller(self.seller_id, self.seller_id)
+        assert self.seller.create_store(self.store_id) == 200
+        self.book = book.BookDB(conf.Use_Large_DB).get_book_info(0, 1)[0]
+        assert self.seller.add_book(self.store_id, 100, self.book) == 200
+        self.buyer = register_new_buyer(self.buyer_id, self.buyer_id)
+        self.start = time.time()
+        self.order_ids = []
+        for _ in range(0, 3):
+            code, order_id = self.buyer.new_order(self.store_id, [(self.book.id, 2)])
+            assert code == 200
+            self.order_ids.append(order_id)
+        yield
+
+    def test_export_orders(self):
+        url = urljoin(
+            conf.URL,
+            "admin/export/orders?store_id={}&start_time={}".format(
+                self.store_id, self.start - 1
+            ),
+        )
+        r = transport.get(url)
+        assert r.status_code == 200
+        orders = [json.loads(line) for line in r.content.decode("utf-8").splitlines()]
+        assert [o["order_id"] for o in orders] == self.order_ids
+        for o in orders:
+            assert o["items"] == [
+                {"book_id": self.book.id, "count": 2, "price": self.book.price}
+            ]
+
+    def test_export_inventory_csv(self):
+        url = urljoin(
+            conf.URL,
+            "admin/export/inventory?format=csv&store_id={}".format(self.store_id),
+        )
+        r = transport.get(url)
+        assert r.status_code == 200
+        rows = list(csv.DictReader(io.StringIO(r.content.decode("utf-8"))))
+        # 三个订单各扣减 2 本库存
+        assert [(row["book_id"], row["stock_level"]) for row in rows] == [
+            (self.book.id, "94")
+        ]
+
+    def test_unknown_format(self):
+        r = transport.get(urljoin(conf.URL, "admin/export/orders?format=xml"))
+        assert r.status_code == 530
+
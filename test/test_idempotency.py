@@ -0,0 +1,74 @@
+import uuid
+from urllib.parse import urljoin
+
+import pytest
+
+from fe import conf
+from fe.access import book
+from fe.access import transport
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+
+
+class TestIdempotency:
+    @pytest.fixture(autouse=True)
+    def pre_run_initialization(self):
+        self.seller_id = "test_idempotency_seller_{}".format(str(uuid.uuid1()))
+        self.store_id = "test_idempotency_store_{}".format(str(uuid.uuid1()))
+        self.buyer_id = "test_idempotency_buyer_{}".format(str(uuid.uuid1()))
+        seller = register_new_seller(self.seller_id, self.seller_id)
+        assert seller.create_store(self.store_id) == 200
+        self.book = book.BookDB(conf.Use_Large_DB).get_book_info(0, 1)[0]
+        # 库存只够下一单，重复执行会因库存不足失败
+        assert seller.add_book(self.store_id, 1, self.book) == 200
+        self.buyer = register_new_buyer(self.buyer_id, self.buyer_id)
+        assert self.buyer.add_funds(10 ** 8) == 200
+        yield
+
+    def _post(self, path, json, key):
+        url = urljoin(self.buyer.url_prefix, path)
+        headers = {"token": self.buyer.token, "Idempotency-Key": key}
+        return transport.post(url, headers=headers, json=json)
+
+    def test_new_order_replayed(self):
+        key = uuid.uuid4().hex
+        code, order_id = self.buyer.new_order(self.store_id, [(self.book.id, 1)], key)
+        assert code == 200
+        code, replayed_id = self.buyer.new_order(self.store_id, [(self.book.id, 1)], key)
+        assert code == 200
+        assert replayed_id == order_id
+        # 新的键会真正执行，库存已经用完
+        code, _ = self.buyer.new_order(self.store_id, [(self.book.id, 1)])
+        assert code == 517
+
+    def test_payment_replayed(self):
+        code, order_id = self.buyer.new_order(self.store_id, [(self.book.id, 1)])
+        assert code == 200
+        key = uuid.uuid4().hex
+        assert self.buyer.payment(order_id, key) == 200
+        json = {
+            "user_id": self.buyer_id,
+            "password": self.buyer_id,
+            "order_id": order_id,
+        }
+        r = self._post("payment", json, key)
+        assert r.status_code == 200
+        assert r.headers.get("Idempotent-Replayed") == "true"
+        # 不带相同的键则按正常流程执行，订单已支付
+        assert self.buyer.payment(order_id) != 200
+        # 重放前重新校验密码，错误的密码拿不到已保存的结果
+        json["password"] = self.buyer_id + "_x"
+        r = self._post("payment", json, key)
+        assert r.status_code == 401
+        assert r.headers.get("Idempotent-Replayed") is None
+
+    def test_key_reused_with_different_request(self):
+        key = uuid.uuid4().hex
+        code, order_id = self.buyer.new_order(self.store_id, [(self.book.id, 1)], key)
+        assert code == 200
+        json = {
+            "user_id": self.buyer_id,
+            "store_id": self.store_id,
+            "books": [{"id": self.book.id, "count": 2}],
+        }
+        assert self._post("new_order", json, key).status_code == 422
@@ -0,0 +1,110 @@
+import threading
+import uuid
+
+import pymysql
+import pytest
+
+from fe import conf
+from fe.access import book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+from be import metrics
+from be.model import db_conn
+
+
+class _Conn:
+    def __init__(self):
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks = self.rollbacks + 1
+
+
+def _txn():
+    t = db_conn.DBConn.__new__(db_conn.DBConn)
+    t.conn = _Conn()
+    return t
+
+
+class TestRunTxn:
+    def test_retry_deadlock_then_succeed(self, monkeypatch):
+        monkeypatch.setattr(db_conn, "TXN_BACKOFF_BASE", 0.0)
+        attempts = []
+
+        def fn():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise pymysql.err.OperationalError(1213, "Deadlock found")
+            return 200, "ok"
+
+        t = _txn()
+        before = metrics.db_txn_retries_total.get("test_txn", "1213")
+        assert t.run_txn("test_txn", fn) == (200, "ok")
+        assert len(attempts) == 3
+        assert t.conn.rollbacks == 2
+        assert metrics.db_txn_retries_total.get("test_txn", "1213") == before + 2
+
+    def test_retry_bounded(self, monkeypatch):
+        monkeypatch.setattr(db_conn, "TXN_BACKOFF_BASE", 0.0)
+
+        def fn():
+            raise pymysql.err.OperationalError(1205, "Lock wait timeout exceeded")
+
+        t = _txn()
+        with pytest.raises(pymysql.err.OperationalError):
+            t.run_txn("test_txn_exhausted", fn)
+        assert t.conn.rollbacks == db_conn.TXN_MAX_RETRIES + 1
+        assert metrics.db_txn_retry_exhausted_total.get("test_txn_exhausted") == 1
+
+    def test_other_errors_not_retried(self):
+        attempts = []
+
+        def fn():
+            attempts.append(1)
+            raise pymysql.err.IntegrityError(1062, "Duplicate entry")
+
+        with pytest.raises(pymysql.err.IntegrityError):
+            _txn().run_txn("test_txn_other", fn)
+        assert len(attempts) == 1
+
+    def test_failed_result_rolled_back(self):
+        t = _txn()
+        assert t.run_txn("test_txn_fail", lambda: (518, "invalid"))[0] == 518
+        assert t.conn.rollbacks == 1
+
+
+class TestLockOrder:
+    @pytest.fixture(autouse=True)
+    def pre_run_initialization(self):
+        self.seller_id = "test_lock_order_seller_{}".format(str(uuid.uuid1()))
+        self.store_id = "test_lock_order_store_{}".format(str(uuid.uuid1()))
+        self.seller = register_new_seller(self.seller_id, self.seller_id)
+        assert self.seller.create_store(self.store_id) == 200
+        self.books = book.BookDB(conf.Use_Large_DB).get_book_info(0, 4)
+        for bk in self.books:
+            assert self.seller.add_book(self.store_id, 10 ** 6, bk) == 200
+        yield
+
+    def test_overlapping_orders_in_opposite_order(self):
+        # 两个买家以相反顺序购买相同的书并取消，不应因死锁失败
+        ids = [bk.id for bk in self.books]
+        codes = []
+
+        def run(items):
+            buyer_id = "test_lock_order_buyer_{}".format(str(uuid.uuid1()))
+            b = register_new_buyer(buyer_id, buyer_id)
+            for i in range(0, 20):
+                code, order_id = b.new_order(self.store_id, items)
+                codes.append(code)
+                if code == 200 and i % 2 == 0:
+                    codes.append(b.cancel_order(order_id))
+
+        threads = [
+            threading.Thread(target=run, args=([(i, 1) for i in ids],)),
+            threading.Thread(target=run, args=([(i, 1) for i in reversed(ids)],)),
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert codes and all(code == 200 for code in codes)
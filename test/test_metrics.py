@@ -0,0 +1,30 @@
+import uuid
+from urllib.parse import urljoin
+
+from fe import conf
+from fe.access import auth
+from fe.access import transport
+from be import metrics
+
+
+class TestMetrics:
+    def test_endpoint_counts_requests(self):
+        user_id = "test_metrics_user_{}".format(str(uuid.uuid1()))
+        assert auth.Auth(conf.URL).register(user_id, user_id) == 200
+        r = transport.get(urljoin(conf.URL, "metrics"))
+        assert r.status_code == 200
+        text = r.content.decode("utf-8")
+        assert 'http_requests_total{method="POST",route="/auth/register",status="200"}' in text
+        assert "http_request_duration_seconds_bucket" in text
+        assert "db_connections_total" in text
+
+    def test_render_histogram(self):
+        h = metrics.Histogram("test_seconds", "test.", ("route",), buckets=(0.1, 1.0))
+        h.observe("/a", value=0.05)
+        h.observe("/a", value=0.5)
+        h.observe("/a", value=5)
+        lines = h.render()
+        assert 'test_seconds_bucket{route="/a",le="0.1"} 1' in lines
+        assert 'test_seconds_bucket{route="/a",le="1.0"} 2' in lines
+        assert 'test_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+        assert 'test_seconds_count{route="/a"} 3' in lines
@@ -0,0 +1,25 @@
+import pytest
+
+from fe.bench.micro import MicroBench, summarize
+
+
+class TestMicroBench:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.mb = MicroBench(book_num=5)
+        self.mb.seed()
+        yield
+
+    def test_all_cases(self):
+        results = self.mb.run(warmup=1, repeat=2, number=2)
+        assert set(results.keys()) == set(self.mb.cases().keys())
+        for name, r in results.items():
+            assert r["failed"] == 0, name
+            assert r["rounds"] == 2
+            assert r["min"] <= r["median"] <= r["max"]
+
+
+def test_summarize():
+    r = summarize([0.1, 0.3, 0.2])
+    assert r["median"] == 0.2
+    assert r["min"] == 0.1 and r["max"] == 0.3
@@ -52,6 +52,26 @@ class TestOrderFlow:
         target = [o for o in orders if o["order_id"] == order_id][0]
         assert target["status"] == "received"
 
+    def test_order_totals_and_items(self):
+        order_id = self._new_order()
+        code, orders = self.buyer.list_orders()
+        assert code == 200
+        target = [o for o in orders if o["order_id"] == order_id][0]
+        assert target["total_price"] == self.total_price
+        assert target["item_count"] == 2
+        assert "items" not in target
+
+        code, orders = self.buyer.list_orders(with_items=True)
+        assert code == 200
+        target = [o for o in orders if o["order_id"] == order_id][0]
+        assert target["items"] == [
+            {"book_id": self.book.id, "count": 2, "price": self.single_price}
+        ]
+
+        # 付款按保存的总价扣款，余额恰好足够
+        assert self.buyer.add_funds(self.total_price) == 200
+        assert self.buyer.payment(order_id) == 200
+
     def test_cancel_pending(self):
         order_id = self._new_order()
         assert self.buyer.cancel_order(order_id) == 200
@@ -0,0 +1,59 @@
+import base64
+import hashlib
+import uuid
+import pytest
+
+from fe.access.book import Book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+from be.model import picture
+
+
+class TestStorePictures:
+    def test_keeps_existing_picture_ids(self):
+        # 已经迁移过的书籍信息没有 pictures，不能丢失原有的 picture_ids
+        info = {"id": "b1", "picture_ids": ["abc"]}
+        picture.store_pictures(None, [info])
+        assert info["picture_ids"] == ["abc"]
+
+
+class TestPicture:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.seller_id = "test_picture_seller_{}".format(str(uuid.uuid1()))
+        self.password = self.seller_id
+        self.seller = register_new_seller(self.seller_id, self.password)
+        self.data = b"\x89PNG picture " + self.seller_id.encode()
+        self.picture_id = hashlib.sha256(self.data).hexdigest()
+        self.store_ids = []
+        for i in range(0, 2):
+            store_id = "test_picture_store_{}_{}".format(i, str(uuid.uuid1()))
+            assert self.seller.create_store(store_id) == 200
+            self.store_ids.append(store_id)
+        self.buyer = register_new_buyer(
+            "test_picture_buyer_{}".format(str(uuid.uuid1())), self.password
+        )
+        yield
+
+    def _book(self) -> Book:
+        bk = Book()
+        bk.id = "picture_book_{}".format(str(uuid.uuid1()))
+        bk.title = "Picture Book"
+        bk.price = 100
+        encoded = base64.b64encode(self.data).decode("utf-8")
+        bk.pictures = [encoded, encoded]
+        return bk
+
+    def test_picture_shared_and_cached(self):
+        bk = self._book()
+        for store_id in self.store_ids:
+            assert self.seller.add_book(store_id, 1, bk) == 200
+        code, content, etag = self.buyer.get_picture(self.picture_id)
+        assert code == 200
+        assert content == self.data
+        code, content, _ = self.buyer.get_picture(self.picture_id, etag)
+        assert code == 304
+
+    def test_non_exist_picture(self):
+        code, _, _ = self.buyer.get_picture(self.picture_id + "x")
+        assert code != 200
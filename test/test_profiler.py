@@ -0,0 +1,59 @@
+import pstats
+import tempfile
+import time
+from urllib.parse import urljoin
+
+from fe import conf
+from fe.access import transport
+from be import profiler
+
+
+def _busy(seconds):
+    end = time.time() + seconds
+    n = 0
+    while time.time() < end:
+        n = n + 1
+    return n
+
+
+class TestProfiler:
+    def test_sampling_profiler_collapsed_and_pstats(self):
+        p = profiler.SamplingProfiler()
+        assert p.start(seconds=5, interval=0.001)
+        assert not p.start(seconds=5)
+        _busy(0.2)
+        p.stop()
+        assert not p.running()
+        assert p.samples > 0
+        lines = p.collapsed().splitlines()
+        assert any("_busy" in line for line in lines)
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+        with tempfile.NamedTemporaryFile(suffix=".pstats") as f:
+            f.write(p.pstats())
+            f.flush()
+            stats = pstats.Stats(f.name)
+        assert any(func[2] == "_busy" for func in stats.stats)
+
+    def test_memory_snapshot_and_diff(self):
+        profiler.memory_stop()
+        assert not profiler.memory_tracing()
+        assert profiler.memory_diff() is None
+        assert isinstance(profiler.memory_snapshot(top=5), list)
+        keep = [bytearray(1024) for _ in range(1000)]
+        diff = profiler.memory_diff(top=10)
+        assert any("test_profiler.py" in d["location"] for d in diff)
+        profiler.memory_stop()
+        assert not profiler.memory_tracing()
+        del keep
+
+    def test_admin_endpoints(self):
+        r = transport.get(urljoin(conf.URL, "admin/profile/cpu?seconds=0.2"))
+        assert r.status_code == 200
+        r = transport.post(urljoin(conf.URL, "admin/profile/memory/snapshot?top=5"), json={})
+        assert r.status_code == 200
+        r = transport.get(urljoin(conf.URL, "admin/profile/memory/diff?top=5"))
+        assert r.status_code == 200
+        assert "stats" in r.json()
+        r = transport.post(urljoin(conf.URL, "admin/profile/memory/stop"), json={})
+        assert r.status_code == 200
@@ -65,3 +65,38 @@ class TestSearchIndexed:
         assert code == 200
         # page2 may be empty if only one match; ensure page1 at least exists and page2 doesn't crash
         assert len(res_page2) in (0, 1)
+
+
+class TestSharedCatalog:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.seller_id = f"seller_catalog_{uuid.uuid1()}"
+        self.password = "pwd_" + self.seller_id
+        self.seller = register_new_seller(self.seller_id, self.password)
+        self.store_a = f"store_catalog_a_{uuid.uuid1()}"
+        self.store_b = f"store_catalog_b_{uuid.uuid1()}"
+        assert self.seller.create_store(self.store_a) == 200
+        assert self.seller.create_store(self.store_b) == 200
+        self.keyword = f"catalogkw{uuid.uuid1().hex}"
+        self.book_id = f"catalog_{uuid.uuid1()}"
+        bk = _make_book(self.book_id, "Shared " + self.keyword)
+        assert self.seller.add_book(self.store_a, 2, bk) == 200
+        bk.price = 2000
+        assert self.seller.add_book(self.store_b, 2, bk) == 200
+        self.buyer = register_new_buyer(f"buyer_catalog_{uuid.uuid1()}", self.password)
+        yield
+
+    def test_search_lists_every_store(self):
+        code, res = self.buyer.search(self.keyword)
+        assert code == 200
+        assert sorted(b["store_id"] for b in res) == sorted([self.store_a, self.store_b])
+        assert all(b["id"] == self.book_id for b in res)
+
+    def test_price_per_store(self):
+        code, order_id = self.buyer.new_order(self.store_b, [(self.book_id, 1)])
+        assert code == 200
+        assert self.buyer.add_funds(1999) == 200
+        # 店铺 B 的价格为 2000，余额不足
+        assert self.buyer.payment(order_id) != 200
+        assert self.buyer.add_funds(1) == 200
+        assert self.buyer.payment(order_id) == 200
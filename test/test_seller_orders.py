@@ -0,0 +1,162 @@
+import time
+import uuid
+
+import pytest
+
+from fe import conf
+from fe.access import book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+
+
+class TestSellerOrders:
+    @pytest.fixture(autouse=True)
+    def pre_run_initialization(self):
+        self.seller_id = "test_seller_orders_seller_{}".format(str(uuid.uuid1()))
+        self.store_id = "test_seller_orders_store_{}".format(str(uuid.uuid1()))
+        self.buyer_id = "test_seller_orders_buyer_{}".format(str(uuid.uuid1()))
+        self.seller = register_new_seller(self.seller_id, self.seller_id)
+        assert self.seller.create_store(self.store_id) == 200
+        self.book = book.BookDB(conf.Use_Large_DB).get_book_info(0, 1)[0]
+        assert self.seller.add_book(self.store_id, 100, self.book) == 200
+        self.buyer = register_new_buyer(self.buyer_id, self.buyer_id)
+        assert self.buyer.add_funds(10 ** 8) == 200
+        self.start = time.time()
+        self.created = []
+        self.paid = []
+        for i in range(0, 5):
+            code, order_id = self.buyer.new_order(self.store_id, [(self.book.id, 1)])
+            assert code == 200
+            self.created.append(order_id)
+            if i % 2 == 0:
+                assert self.buyer.payment(order_id) == 200
+                self.paid.append(order_id)
+        yield
+
+    def test_filter_and_keyset_paging(self):
+        seen = []
+        after = None
+        while True:
+            code, orders, after = self.seller.list_orders(
+                self.store_id, status="paid", after=after, limit=2
+            )
+            assert code == 200
+            assert all(o["status"] == "paid" for o in orders)
+            seen.extend(o["order_id"] for o in orders)
+            if after is None:
+                break
+        assert seen == self.paid
+
+        code, orders, after = self.seller.list_orders(self.store_id, limit=100)
+        assert code == 200
+        assert after is None
+        # 按下单时间升序
+        assert [o["order_id"] for o in orders] == self.created
+        assert orders[0]["buyer_id"] == self.buyer_id
+        assert orders[0]["item_count"] == 1
+
+    def test_paging_without_status(self):
+        # 不按状态过滤时逐页读取，结果按下单时间升序且不重复、不遗漏
+        seen = []
+        after = None
+        pages = 0
+        while True:
+            code, orders, after = self.seller.list_orders(
+                self.store_id, after=after, limit=2
+            )
+            assert code == 200
+            assert len(orders) <= 2
+            seen.extend(o["order_id"] for o in orders)
+            pages = pages + 1
+            if after is None:
+                break
+            assert after["order_id"] == orders[-1]["order_id"]
+        assert seen == self.created
+        assert pages == 3
+
+    def test_time_range(self):
+        code, orders, _ = self.seller.list_orders(self.store_id, end_time=self.start)
+        assert code == 200
+        assert orders == []
+        code, orders, _ = self.seller.list_orders(
+            self.store_id, start_time=self.start, end_time=time.time() + 1
+        )
+        assert code == 200
+        assert len(orders) == 5
+
+    def test_not_owner(self):
+        other_id = "test_seller_orders_other_{}".format(str(uuid.uuid1()))
+        other = register_new_seller(other_id, other_id)
+        code, _, _ = other.list_orders(self.store_id)
+        assert code == 401
+        code, _, _ = self.seller.list_orders(self.store_id + "_x")
+        assert code != 200
+
+    def test_ship_orders(self):
+        missing = self.created[0] + "_x"
+        order_ids = self.created + [missing, self.paid[0]]
+        code, results = self.seller.ship_orders(self.store_id, order_ids)
+        assert code == 200
+        outcome = {r["order_id"]: r for r in results}
+        assert len(results) == len(self.created) + 1
+        for order_id in self.created:
+            if order_id in self.paid:
+                assert outcome[order_id]["code"] == 200
+                assert outcome[order_id]["status"] == "shipped"
+            else:
+                assert outcome[order_id]["code"] == 518
+                assert outcome[order_id]["status"] == "pending"
+        assert outcome[missing]["code"] == 518
+        assert outcome[missing]["status"] is None
+
+        code, orders, _ = self.seller.list_orders(self.store_id, status="shipped")
+        assert [o["order_id"] for o in orders] == self.paid
+        # 再次发货时已不是已付款状态
+        code, results = self.seller.ship_orders(self.store_id, self.paid)
+        assert code == 200
+        assert all(r["code"] == 518 for r in results)
+
+    def test_ship_orders_not_owner(self):
+        other_id = "test_seller_orders_other_{}".format(str(uuid.uuid1()))
+        other = register_new_seller(other_id, other_id)
+        code, results = other.ship_orders(self.store_id, self.paid)
+        assert code == 401
+        code, orders, _ = self.seller.list_orders(self.store_id, status="paid")
+        assert [o["order_id"] for o in orders] == self.paid
+
+    def test_ship_orders_mixed(self):
+        # 另一家店铺的已付款订单
+        other_id = "test_seller_orders_other_{}".format(str(uuid.uuid1()))
+        other_store = "test_seller_orders_other_store_{}".format(str(uuid.uuid1()))
+        other = register_new_seller(other_id, other_id)
+        assert other.create_store(other_store) == 200
+        assert other.add_book(other_store, 10, self.book) == 200
+        code, foreign = self.buyer.new_order(other_store, [(self.book.id, 1)])
+        assert code == 200
+        assert self.buyer.payment(foreign) == 200
+
+        shipped, valid = self.paid[0], self.paid[1]
+        pending = self.created[1]
+        assert self.seller.ship_order(self.store_id, shipped) == 200
+
+        code, results = self.seller.ship_orders(
+            self.store_id, [shipped, valid, foreign, pending]
+        )
+        assert code == 200
+        outcome = {r["order_id"]: r for r in results}
+        assert outcome[valid]["code"] == 200
+        assert outcome[shipped]["code"] == 518
+        assert outcome[shipped]["status"] == "shipped"
+        assert outcome[foreign]["code"] == 518
+        assert outcome[foreign]["status"] is None
+        assert outcome[pending]["code"] == 518
+        assert outcome[pending]["status"] == "pending"
+
+        code, orders, _ = self.seller.list_orders(self.store_id, limit=100)
+        statuses = {o["order_id"]: o["status"] for o in orders}
+        assert statuses[shipped] == "shipped"
+        assert statuses[valid] == "shipped"
+        assert statuses[pending] == "pending"
+        # 其他店铺的订单不受影响
+        code, orders, _ = other.list_orders(other_store)
+        assert [(o["order_id"], o["status"]) for o in orders] == [(foreign, "paid")]
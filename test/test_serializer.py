@@ -0,0 +1,75 @@
+import decimal
+import json
+
+import pytest
+from flask import Flask
+
+from be import metrics
+from be import serializer
+from fe.access import transport
+
+
+def _app(payload):
+    app = Flask(__name__)
+
+    @app.route("/payload")
+    def view():
+        return serializer.respond(payload), 200
+
+    return app.test_client()
+
+
+class TestSerializer:
+    def test_json_default(self):
+        client = _app({"message": "ok", "price": decimal.Decimal("12.50"), "title": "书"})
+        r = client.get("/payload")
+        assert r.status_code == 200
+        assert r.mimetype == "application/json"
+        assert "Accept" in r.headers.get("Vary")
+        body = transport.decode(r.headers.get("Content-Type"), r.get_data())
+        assert body == {"message": "ok", "price": "12.50", "title": "书"}
+
+    def test_encoded_passthrough(self, monkeypatch):
+        encoded = serializer.Encoded({"message": "ok"})
+        calls = []
+        dumps = serializer.serializers[serializer.JSON_MIMETYPE]
+        monkeypatch.setitem(
+            serializer.serializers,
+            serializer.JSON_MIMETYPE,
+            lambda obj: calls.append(obj) or dumps(obj),
+        )
+        client = _app(encoded)
+        assert json.loads(client.get("/payload").get_data()) == {"message": "ok"}
+        assert json.loads(client.get("/payload").get_data()) == {"message": "ok"}
+        assert len(calls) == 1
+
+    def test_msgpack_negotiation(self):
+        pytest.importorskip("msgpack")
+        client = _app({"message": "ok", "books": [{"id": "1", "tags": ["a", "b"]}]})
+        r = client.get("/payload", headers={"Accept": "application/x-msgpack"})
+        assert r.mimetype == serializer.MSGPACK_MIMETYPE
+        body = transport.decode(r.headers.get("Content-Type"), r.get_data())
+        assert body["books"][0]["tags"] == ["a", "b"]
+
+    def test_negotiation_honours_q_values(self):
+        pytest.importorskip("msgpack")
+        client = _app({"message": "ok"})
+        r = client.get("/payload", headers={"Accept": "application/msgpack;q=0, */*"})
+        assert r.mimetype == serializer.JSON_MIMETYPE
+        r = client.get(
+            "/payload",
+            headers={"Accept": "application/json;q=0.5, application/msgpack"},
+        )
+        assert r.mimetype == serializer.MSGPACK_MIMETYPE
+        r = client.get("/payload", headers={"Accept": "text/html"})
+        assert r.mimetype == serializer.JSON_MIMETYPE
+
+    def test_encoded_cache_metrics(self):
+        encoded = serializer.Encoded({"message": "ok"})
+        hits = metrics.cache_requests_total.get("encoded_response", "hit")
+        misses = metrics.cache_requests_total.get("encoded_response", "miss")
+        client = _app(encoded)
+        client.get("/payload")
+        client.get("/payload")
+        assert metrics.cache_requests_total.get("encoded_response", "miss") == misses + 1
+        assert metrics.cache_requests_total.get("encoded_response", "hit") == hits + 1
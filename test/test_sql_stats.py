@@ -0,0 +1,38 @@
+import logging
+import uuid
+from urllib.parse import urljoin
+
+from fe import conf
+from fe.access import auth
+from fe.access import transport
+from be.model import sql_stats
+
+
+class TestSqlStats:
+    def test_admin_endpoint_lists_statements(self):
+        user_id = "test_sql_stats_user_{}".format(str(uuid.uuid1()))
+        assert auth.Auth(conf.URL).register(user_id, user_id) == 200
+        r = transport.get(urljoin(conf.URL, "admin/sql_stats?top=100"))
+        assert r.status_code == 200
+        statements = r.json()["statements"]
+        assert any(s["statement"].startswith("INSERT into user") for s in statements)
+        totals = [s["total_seconds"] for s in statements]
+        assert totals == sorted(totals, reverse=True)
+
+    def test_template_and_slow_log(self, caplog, monkeypatch):
+        sql_stats.reset()
+        monkeypatch.setattr(sql_stats, "SLOW_QUERY_SECONDS", 0.0)
+        with caplog.at_level(logging.WARNING, logger="be.slow_query"):
+            sql_stats.record(
+                "SELECT a FROM t\n  WHERE id IN (%s, %s, %s);", ("x", "secret", 1), 0.5, 3
+            )
+        top = sql_stats.top(1)
+        assert top[0]["statement"] == "SELECT a FROM t WHERE id IN (%s, ...)"
+        assert top[0]["rows"] == 3
+        assert "secret" not in caplog.text
+        assert "<str:6>" in caplog.text
+
+    def test_unbuffered_cursor_skips_row_count(self):
+        # 不缓存结果集的游标执行后 rowcount 无意义，不能计入行数
+        assert sql_stats.InstrumentedSSCursor(None)._rowcount() is None
+        assert sql_stats.InstrumentedCursor(None)._rowcount() == -1
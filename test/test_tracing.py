@@ -0,0 +1,50 @@
+import json
+import uuid
+from urllib.parse import urljoin
+
+from fe import conf
+from fe.access import transport
+from be import tracing
+
+
+class TestTracing:
+    def test_trace_id_header(self):
+        url = urljoin(conf.URL, "auth/register")
+        user_id = "test_tracing_user_{}".format(str(uuid.uuid1()))
+        r = transport.post(
+            url,
+            headers={tracing.TRACE_HEADER: "trace-abc-1"},
+            json={"user_id": user_id, "password": user_id},
+        )
+        assert r.status_code == 200
+        assert r.headers.get(tracing.TRACE_HEADER) == "trace-abc-1"
+        # 没有传入时由服务端生成
+        r = transport.post(url, json={"user_id": user_id, "password": user_id})
+        assert r.headers.get(tracing.TRACE_HEADER)
+
+    def test_nested_spans_exported(self, tmp_path):
+        trace, token = tracing.start_trace("t1", sampled=True)
+        with tracing.span("view", "view"):
+            with tracing.span("model", "model"):
+                with tracing.span("SELECT 1", "sql"):
+                    pass
+        tracing._current.reset(token)
+        path = str(tmp_path / "trace.json")
+        tracing.export(trace, path)
+        tracing.export(trace, path)
+        text = open(path).read()
+        # 结尾的 ] 可省略，补上后应是合法 JSON
+        events = json.loads(text.rstrip().rstrip(",") + "]")
+        assert len(events) == 6
+        view = [e for e in events if e["name"] == "view"][0]
+        sql = [e for e in events if e["name"] == "SELECT 1"][0]
+        assert view["ts"] <= sql["ts"]
+        assert sql["ts"] + sql["dur"] <= view["ts"] + view["dur"]
+        assert all(e["args"]["trace_id"] == "t1" for e in events)
+
+    def test_unsampled_records_nothing(self):
+        trace, token = tracing.start_trace(sampled=False)
+        with tracing.span("view"):
+            pass
+        tracing._current.reset(token)
+        assert trace.events == []
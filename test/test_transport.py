@@ -0,0 +1,17 @@
+import uuid
+
+from fe import conf
+from fe.access import auth
+
+
+class TestFlaskTransport:
+    def test_register_login_in_process(self, monkeypatch):
+        monkeypatch.setattr(conf, "Transport", "flask", raising=False)
+        user_id = "test_transport_user_{}".format(str(uuid.uuid1()))
+        a = auth.Auth(conf.URL)
+        assert a.register(user_id, user_id) == 200
+        code, token = a.login(user_id, user_id, "my terminal")
+        assert code == 200
+        assert token
+        code, _ = a.login(user_id, user_id + "_x", "my terminal")
+        assert code == 401